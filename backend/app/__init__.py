@@ -30,6 +30,7 @@ def create_app(config_class=Config):
 
     from app.routes import auth_bp, users_bp, bills_bp, transactions_bp, wallets_bp, cards_bp, documents_bp, assistant_bp, orderbook_bp, goals_bp, dashboard_bp, insights_bp, whatif_bp, optimizer_bp, portfolio_bp, experiences_bp
     from app.routes.notifications import notifications_bp
+    from app.routes.admin import admin_bp
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
     app.register_blueprint(insights_bp, url_prefix="/api/insights")
@@ -45,7 +46,27 @@ def create_app(config_class=Config):
     app.register_blueprint(orderbook_bp, url_prefix="/api/orderbook")
     app.register_blueprint(portfolio_bp, url_prefix="/api/portfolio")
     app.register_blueprint(notifications_bp, url_prefix="/api/notifications")
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
     app.register_blueprint(whatif_bp, url_prefix="/api/whatif")
     app.register_blueprint(optimizer_bp, url_prefix="/api/optimizer")
 
+    # Per-group in-flight / p95 tracking that decides when optional AI work is shed
+    from app.services import load_shedder
+    load_shedder.init_app(app)
+
     return app
+
+
+def warm_up():
+    """
+    Warm per-process caches and clients off the request path. Called by the
+    serving process only (gunicorn.conf.py post_worker_init, run.py), so CLI
+    runs such as `flask db upgrade` do not start the background work.
+    """
+    from app.services.allocation_frontier import warm as warm_allocation_frontier
+    from app.services.llm_gateway import warm as warm_llm_gateway
+
+    # Precompute the optimizer's efficient frontier
+    warm_allocation_frontier()
+    # Gemini client and connection, built in this worker
+    warm_llm_gateway()
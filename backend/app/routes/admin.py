@@ -0,0 +1,38 @@
+from flask import Blueprint, current_app, jsonify, request
+
+from app.services import circuit_breaker, load_shedder
+
+admin_bp = Blueprint("admin", __name__)
+
+
+def _authorized() -> bool:
+    token = request.headers.get("X-Admin-Token") or request.args.get("token")
+    expected = current_app.config.get("ADMIN_TOKEN")
+    return bool(expected) and token == expected
+
+
+@admin_bp.route("/breakers", methods=["GET"])  # GET /api/admin/breakers
+def breakers():
+    """Circuit breaker state, rolling-window counts and thresholds per AI provider."""
+    if not _authorized():
+        return jsonify({"error": "unauthorized"}), 401
+    return jsonify(circuit_breaker.snapshot())
+
+
+@admin_bp.route("/breakers/<provider>/reset", methods=["POST"])  # POST /api/admin/breakers/<provider>/reset
+def reset_breaker(provider):
+    """Force a provider's breaker closed (e.g. after an outage is known to be over)."""
+    if not _authorized():
+        return jsonify({"error": "unauthorized"}), 401
+    if provider not in circuit_breaker.PROVIDERS:
+        return jsonify({"error": f"unknown provider: {provider}"}), 404
+    circuit_breaker.reset(provider)
+    return jsonify({"status": "ok", "provider": provider, "state": circuit_breaker.state(provider)})
+
+
+@admin_bp.route("/load", methods=["GET"])  # GET /api/admin/load
+def load():
+    """This worker's load-shedding level, pressure and per-group in-flight / p95 latency."""
+    if not _authorized():
+        return jsonify({"error": "unauthorized"}), 401
+    return jsonify(load_shedder.snapshot())
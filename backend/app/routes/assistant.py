@@ -1,8 +1,11 @@
+import json
 import os
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.routes.auth import get_current_user_id
+from app.services import circuit_breaker
 from app.services.backboard_ingest import ingest_user_context_to_backboard
-from app.services.orchestrator import chat as orchestrator_chat
+from app.services.llm_cache import stats as llm_cache_stats_data
+from app.services.orchestrator import chat as orchestrator_chat, chat_stream as orchestrator_chat_stream
 from app.services.eleven_service import stream_speech, transcribe_audio
 from app.services.audio_service import convert_audio
 from app.models import User
@@ -24,15 +27,11 @@ def _detect_audio_format(filename: str, content_type: str) -> str:
     return "webm"
 
 
-@assistant_bp.route("/chat", methods=["POST"])
-def chat():
-    uid = get_current_user_id()
-    if not uid:
-        return jsonify({"error": "Not authenticated"}), 401
-    data = request.get_json() or {}
+def _chat_inputs(uid: int, data: dict) -> dict | None:
+    """Orchestrator kwargs for a chat request body, or None if there is no message."""
     message = (data.get("message") or data.get("text") or data.get("question") or "").strip()
     if not message:
-        return jsonify({"error": "message required"}), 400
+        return None
     messages = data.get("messages")
     if not isinstance(messages, list):
         messages = None
@@ -54,9 +53,66 @@ def chat():
     page = context.get("page") if isinstance(context, dict) else None
     if not page and route:
         page = (route or "").replace("/", "").strip() or "dashboard"
-    api_key = os.environ.get("BACKBOARD_API_KEY", "")
-    out = orchestrator_chat(message, uid, api_key, mode=mode, messages=messages, finance_payload=finance_payload, page=page)
-    return jsonify(out)
+    return {
+        "message": message,
+        "user_id": uid,
+        "api_key": os.environ.get("BACKBOARD_API_KEY", ""),
+        "mode": mode,
+        "messages": messages,
+        "finance_payload": finance_payload,
+        "page": page,
+    }
+
+
+@assistant_bp.route("/chat", methods=["POST"])
+def chat():
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    inputs = _chat_inputs(uid, request.get_json() or {})
+    if inputs is None:
+        return jsonify({"error": "message required"}), 400
+    return jsonify(orchestrator_chat(**inputs))
+
+
+def _sse(event: str, payload: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@assistant_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Server-Sent Events variant of /chat, relaying Backboard's tokens as they arrive:
+      token  {"text": piece}            incremental answer text
+      error  {"error": message}         Backboard failed (always followed by done)
+      done   {"text": ..., "action": ...}  the same body /chat returns
+    """
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    inputs = _chat_inputs(uid, request.get_json() or {})
+    if inputs is None:
+        return jsonify({"error": "message required"}), 400
+
+    def generate():
+        for event, payload in orchestrator_chat_stream(**inputs):
+            yield _sse(event, payload)
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Disable proxy buffering (nginx / Vite dev proxy) so tokens flush immediately
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@assistant_bp.route("/llm-cache-stats", methods=["GET"])
+def llm_cache_stats():
+    """LLM response cache hit/miss/bypass counters per task (per process and cluster-wide via Valkey)."""
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    return jsonify(llm_cache_stats_data())
 
 
 @assistant_bp.route("/refresh-memory", methods=["POST"])
@@ -80,6 +136,8 @@ def stt():
         return jsonify({"error": "Not authenticated"}), 401
     if not os.environ.get("ELEVENLABS_API_KEY", ""):
         return jsonify({"error": "Set ELEVENLABS_API_KEY for STT"}), 503
+    if circuit_breaker.is_open("elevenlabs"):
+        return jsonify({"error": "Speech service temporarily unavailable"}), 503
     audio_file = request.files.get("audio")
     if not audio_file:
         return jsonify({"error": "audio file required"}), 400
@@ -119,6 +177,8 @@ def tts():
         return jsonify({"error": "text required"}), 400
     if not os.environ.get("ELEVENLABS_API_KEY", ""):
         return jsonify({"error": "Set ELEVENLABS_API_KEY for TTS"}), 503
+    if circuit_breaker.is_open("elevenlabs"):
+        return jsonify({"error": "Speech service temporarily unavailable"}), 503
     voice_id = (data.get("voice_id") or "").strip() or None
     try:
         audio_stream = stream_with_context(stream_speech(text, voice_id=voice_id))
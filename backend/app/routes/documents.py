@@ -4,6 +4,7 @@ from app import db
 from app.routes.auth import get_current_user_id
 from app.models import DocumentRef, Bill, Transaction
 from app.services.invoice_parser import parse_invoice_with_gemini
+from app.services.llm_gateway import backboard_ingest as gateway_ingest, document_id, response_json
 import os
 import uuid
 import json
@@ -16,18 +17,9 @@ def backboard_ingest(file_content, file_name, doc_type, api_key):
     if not api_key:
         return f"stub-{uuid.uuid4().hex[:12]}"
     try:
-        import requests
-        url = os.environ.get("BACKBOARD_INGEST_URL", "https://api.backboard.io/v1/documents")
-        r = requests.post(
-            url,
-            headers={"Authorization": f"Bearer {api_key}"},
-            files={"file": (file_name or "upload", file_content)},
-            data={"type": doc_type},
-            timeout=30,
-        )
+        r = gateway_ingest(api_key, file_name or "upload", file_content, fields={"type": doc_type})
         if r.ok:
-            data = r.json()
-            return data.get("id") or data.get("document_id") or f"bk-{uuid.uuid4().hex[:12]}"
+            return document_id(response_json(r)) or f"bk-{uuid.uuid4().hex[:12]}"
     except Exception:
         pass
     return f"stub-{uuid.uuid4().hex[:12]}"
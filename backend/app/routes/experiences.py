@@ -2,6 +2,7 @@
 from flask import Blueprint, jsonify, request
 from app.routes.auth import get_current_user_id
 from app.models import User, Transaction, Bill
+from app.services import load_shedder
 from app.services.experiences import generate_experiences
 from datetime import datetime
 
@@ -83,11 +84,15 @@ def get_experiences():
     location = request.args.get("location", "")
     total_cents, spent_cents, remaining_cents = _compute_short_term_budget(uid)
 
-    try:
-        experiences, ai_status = generate_experiences(uid, location.strip() or None, remaining_cents)
-    except Exception:
-        experiences = []
-        ai_status = "api_error"
+    degraded = load_shedder.should_shed("experiences")
+    if degraded:
+        experiences, ai_status = [], "degraded"
+    else:
+        try:
+            experiences, ai_status = generate_experiences(uid, location.strip() or None, remaining_cents)
+        except Exception:
+            experiences = []
+            ai_status = "api_error"
 
     tiers = {"free": [], "$": [], "$$": [], "$$$": []}
     for exp in experiences:
@@ -100,6 +105,7 @@ def get_experiences():
     return jsonify({
         "experiences": experiences,
         "ai_status": ai_status,
+        "degraded": degraded,
         "budget": {
             "total_cents": total_cents,
             "spent_cents": spent_cents,
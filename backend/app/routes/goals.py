@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify
 from datetime import date
 from app import db
 from app.routes.auth import get_current_user_id
-from app.models import Goal
+from app.models import Goal, User
+from app.services.goal_forecast import data_version, estimate_monthly_budget_cents, forecast_goals
+from app.services.mc_executor import SimulationBusy, SimulationTimeout, run_job
+from app.services.scenario_cache import canonical_regime, get_or_compute
 
 goals_bp = Blueprint("goals", __name__)
 
@@ -49,6 +52,75 @@ def create_goal():
     return jsonify(g.to_dict()), 201
 
 
+@goals_bp.route("/forecast", methods=["GET"])
+def forecast():
+    """
+    Hit probability and expected completion date for every goal, simulated
+    together under a market regime. Optional query params: regime, simulations,
+    monthlyBudget (dollars; defaults to an estimate from recent transactions).
+    Cached per data version (goals, partition config, budget) and day.
+    """
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    user = User.query.get(uid)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    try:
+        simulations = max(100, min(int(request.args.get("simulations", 500)), 5000))
+        budget = request.args.get("monthlyBudget")
+        budget_cents = int(round(float(budget) * 100)) if budget is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid input"}), 400
+    if budget_cents is None:
+        budget_cents = estimate_monthly_budget_cents(uid)
+    budget_cents = max(budget_cents, 0)
+    regime = canonical_regime(request.args.get("regime"))
+
+    goals = [
+        {
+            "id": g.id,
+            "name": g.name,
+            "target_cents": g.target_cents,
+            "saved_cents": g.saved_cents or 0,
+            "category": g.category,
+            "deadline": g.deadline.isoformat() if g.deadline else None,
+        }
+        for g in Goal.query.filter_by(user_id=uid).order_by(Goal.id).all()
+    ]
+    cfg = user.get_partition_config()
+    today = date.today()
+    params = {
+        "user_id": uid,
+        "version": data_version(goals, cfg, budget_cents),
+        "regime": regime,
+        "simulations": simulations,
+        "as_of": today.isoformat(),
+    }
+    try:
+        forecasts, cache_info = get_or_compute(
+            "goals",
+            params,
+            lambda seed: run_job(
+                forecast_goals, goals, cfg, budget_cents, regime, simulations, seed=seed, today=today
+            ),
+        )
+    except SimulationBusy:
+        return jsonify({"error": "Simulation capacity exhausted, retry shortly"}), 503, {"Retry-After": "1"}
+    except SimulationTimeout:
+        return jsonify({"error": "Simulation timed out"}), 504
+    return jsonify(
+        {
+            "goals": forecasts,
+            "regime": regime,
+            "monthly_budget": budget_cents / 100,
+            "simulations": simulations,
+            "as_of": today.isoformat(),
+            "cache": cache_info,
+        }
+    )
+
+
 @goals_bp.route("/<int:goal_id>", methods=["GET", "PATCH", "DELETE"])
 def goal_detail(goal_id):
     uid = get_current_user_id()
@@ -1,10 +1,17 @@
-"""AI-powered financial insights for the hero section."""
-import os
-import json
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+"""AI-powered financial insights for the hero section.
+
+Insights are served from the per-user cache (stale-while-revalidate, see
+insights_cache); only a user's first load waits on Gemini, and never longer
+than GEMINI_TIMEOUT_SECONDS.
+"""
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from flask import Blueprint, jsonify
 from app.routes.auth import get_current_user_id
 from app.models import User, Transaction, Bill, Goal
+from app.services.llm_client import parse_json_text
+from app.services import insights_cache, load_shedder
+from app.services.llm_cache import data_version
+from app.services.llm_gateway import gemini_generate
 from datetime import datetime
 
 insights_bp = Blueprint("insights", __name__)
@@ -14,28 +21,43 @@ GEMINI_TIMEOUT_SECONDS = 15
 
 def _call_gemini_for_insights(context: str) -> list[dict]:
     """Call Gemini with user context, return list of {type, text, category}."""
-    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or os.environ.get("BACKBOARD_API_KEY")
-    if not api_key:
-        return []
-    try:
-        from google import genai
-        client = genai.Client(api_key=api_key)
-        prompt = (
-            "Given this user's financial picture, provide 2-3 short, actionable insights. "
-            "Respond with valid JSON array only, no markdown. "
-            'Format: [{"type": "suggestion", "text": "insight text", "category": "bills"|"investments"|"goals"|"general"}]. '
-            "Be concise (one sentence per insight). "
-            "Context:\n" + context
-        )
-        response = client.models.generate_content(model="gemini-1.5-flash", contents=prompt)
-        text = (response.text or "").strip()
-        text = text.removeprefix("```json").removeprefix("```").strip().removesuffix("```").strip()
-        out = json.loads(text)
-        if isinstance(out, list):
-            return out[:5]
-        return []
-    except Exception:
-        return []
+    prompt = (
+        "Given this user's financial picture, provide 2-3 short, actionable insights. "
+        "Respond with valid JSON array only, no markdown. "
+        'Format: [{"type": "suggestion", "text": "insight text", "category": "bills"|"investments"|"goals"|"general"}]. '
+        "Be concise (one sentence per insight). "
+        "Context:\n" + context
+    )
+    out = parse_json_text(gemini_generate(prompt, timeout=GEMINI_TIMEOUT_SECONDS) or "")
+    if isinstance(out, list):
+        return out[:5]
+    return []
+
+
+def _fallback_insights(total_spend: int, bill_total: int, goals: list) -> list[dict]:
+    """Rule-based insights from the same figures the LLM sees (served when AI work is shed)."""
+    insights = []
+    if bill_total > 0:
+        insights.append({
+            "type": "suggestion",
+            "text": f"You have ${bill_total / 100:.2f} in unpaid bills; schedule them before discretionary spending.",
+            "category": "bills",
+        })
+    open_goals = [g for g in goals if g.target_cents and g.saved_cents < g.target_cents]
+    if open_goals:
+        g = min(open_goals, key=lambda g: g.saved_cents / g.target_cents)
+        insights.append({
+            "type": "suggestion",
+            "text": f"\"{g.name}\" is {g.saved_cents / g.target_cents:.0%} funded; a small automatic transfer keeps it moving.",
+            "category": "goals",
+        })
+    if total_spend > 0:
+        insights.append({
+            "type": "suggestion",
+            "text": f"You've spent ${total_spend / 100:.2f} this month; review your top category for easy savings.",
+            "category": "general",
+        })
+    return insights[:3]
 
 
 @insights_bp.route("/", methods=["GET"])
@@ -74,14 +96,31 @@ def get_insights():
     if goals:
         context_lines.append("Goal names: " + ", ".join(g.name for g in goals[:5]))
     context = "\n".join(context_lines)
-    executor = ThreadPoolExecutor(max_workers=1)
-    try:
-        future = executor.submit(_call_gemini_for_insights, context)
-        insights = future.result(timeout=GEMINI_TIMEOUT_SECONDS)
-    except FuturesTimeoutError:
-        insights = []
-    except Exception:
-        insights = []
-    finally:
-        executor.shutdown(wait=False)
-    return jsonify({"insights": insights})
+    version = data_version(uid, context)
+    entry = insights_cache.get(uid)
+    fallback = _fallback_insights(total_spend, bill_total, goals)
+
+    if load_shedder.should_shed("insights"):
+        # Whatever we already have, however old, and no new Gemini work
+        insights = entry["insights"] if entry else fallback
+        return jsonify({"insights": insights, "degraded": True, "stale": entry is None or insights_cache.is_stale(entry, version)})
+
+    if entry is not None:
+        stale = insights_cache.is_stale(entry, version)
+        if stale:
+            insights_cache.refresh(uid, version, lambda: _call_gemini_for_insights(context))
+        return jsonify({"insights": entry["insights"], "degraded": False, "stale": stale})
+
+    # First load: wait (bounded) for the refresh; on timeout it keeps running and fills the cache
+    future = insights_cache.refresh(uid, version, lambda: _call_gemini_for_insights(context))
+    insights = []
+    if future is not None:
+        try:
+            insights = future.result(timeout=GEMINI_TIMEOUT_SECONDS)
+        except FuturesTimeoutError:
+            pass
+        except Exception:
+            pass
+    if not insights:
+        return jsonify({"insights": fallback, "degraded": False, "stale": True})
+    return jsonify({"insights": insights, "degraded": False, "stale": False})
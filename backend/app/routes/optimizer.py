@@ -1,12 +1,20 @@
-"""Smart Allocation Optimizer: AI portfolio coach for staking vs liquidity vs stable yield."""
+"""Smart Allocation Optimizer: efficient-frontier allocation across staking vs liquidity vs stable yield, explained by AI."""
 import json
-import os
-from math import sqrt
 
 from flask import Blueprint, jsonify, request
 
 from app.routes.auth import get_current_user_id
-from app.services.llm_client import json_from_groq
+from app.services.allocation_frontier import (
+    ASSET_PARAMS,
+    DRAWDOWN_MONTHS,
+    DRAWDOWN_PATHS,
+    DRAWDOWN_QUANTILE,
+    GRID_STEP_PCT,
+    RISK_BUDGETS,
+    evaluate,
+    get_frontier,
+)
+from app.services.llm_hedge import hedged_call, json_providers
 
 optimizer_bp = Blueprint("optimizer", __name__)
 
@@ -16,97 +24,37 @@ def _base_asset_params():
     Simple baseline assumptions for expected return and volatility (annualized) by bucket.
     Values are illustrative, not advice.
     """
-    return {
-        "staked": {"exp_return": 0.10, "vol": 0.60},
-        "liquid": {"exp_return": 0.02, "vol": 0.10},
-        "stable": {"exp_return": 0.05, "vol": 0.20},
-    }
+    return {k: dict(v) for k, v in ASSET_PARAMS.items()}
 
 
 def _compute_portfolio_metrics(alloc: dict) -> dict:
-    """Compute naive expected return and a simple volatility proxy for a 3-bucket allocation."""
-    params = _base_asset_params()
-    w_staked = (alloc.get("staked_pct", 0) or 0) / 100.0
-    w_liquid = (alloc.get("liquid_pct", 0) or 0) / 100.0
-    w_stable = (alloc.get("stable_pct", 0) or 0) / 100.0
-
-    er = (
-        w_staked * params["staked"]["exp_return"]
-        + w_liquid * params["liquid"]["exp_return"]
-        + w_stable * params["stable"]["exp_return"]
+    """Expected return, volatility and Monte Carlo drawdown risk for a 3-bucket allocation."""
+    return evaluate(
+        alloc.get("staked_pct", 0) or 0,
+        alloc.get("liquid_pct", 0) or 0,
+        alloc.get("stable_pct", 0) or 0,
     )
-    # Simplified risk: weighted vol with zero correlation assumption
-    vol = sqrt(
-        (w_staked * params["staked"]["vol"]) ** 2
-        + (w_liquid * params["liquid"]["vol"]) ** 2
-        + (w_stable * params["stable"]["vol"]) ** 2
-    )
-    # Rough drawdown proxy (~2.5x vol, purely illustrative)
-    drawdown = 2.5 * vol
-    return {
-        "expected_return": er,
-        "risk_vol": vol,
-        "risk_drawdown": drawdown,
-    }
 
 
-def _fallback_optimize(current: dict, risk_profile: str) -> dict:
-    """Deterministic heuristic if LLM is unavailable."""
-    cur_metrics = _compute_portfolio_metrics(current)
-    staked = current.get("staked_pct", 0)
-    liquid = current.get("liquid_pct", 0)
-    stable = current.get("stable_pct", 0)
-
-    if risk_profile == "conservative":
-        # More to stable / liquid, less staked
-        target = {
-            "staked_pct": max(staked - 10, 10),
-            "liquid_pct": min(liquid + 5, 40),
-            "stable_pct": 100,
-        }
-        target["stable_pct"] = max(0, target["stable_pct"] - target["staked_pct"] - target["liquid_pct"])
-    elif risk_profile == "aggressive":
-        # Tilt into staked
-        target = {
-            "staked_pct": min(staked + 12, 80),
-            "liquid_pct": max(liquid, 10),
-            "stable_pct": 100,
-        }
-        target["stable_pct"] = max(0, target["stable_pct"] - target["staked_pct"] - target["liquid_pct"])
-    else:
-        # Balanced: moderate staked, some stable
-        total = staked + liquid + stable
-        if total <= 0:
-            target = {"staked_pct": 50, "liquid_pct": 20, "stable_pct": 30}
-        else:
-            target = {
-                "staked_pct": min(max(staked, 40), 70),
-                "liquid_pct": min(max(liquid, 10), 30),
-                "stable_pct": 100,
-            }
-            target["stable_pct"] = max(0, target["stable_pct"] - target["staked_pct"] - target["liquid_pct"])
-
-    opt_metrics = _compute_portfolio_metrics(target)
-    explanation = (
-        "Based on your risk profile, this allocation tilts more into yield sources "
-        "with better risk-adjusted return while keeping a liquid buffer for volatility."
+def _fallback_explanation(current: dict, optimized: dict, risk_profile: str) -> str:
+    """Deterministic explanation when no LLM is available."""
+    budget = RISK_BUDGETS[risk_profile]
+    alloc = optimized["allocation"]
+    return (
+        f"Under the {risk_profile} risk profile (bad-year drawdown budget ~{budget:.0%}), the highest expected return "
+        f"sits at {alloc['staked_pct']:.1f}% staked, {alloc['liquid_pct']:.1f}% liquid and {alloc['stable_pct']:.1f}% stable: "
+        f"{optimized['expected_return']:.1%} a year with a ~{optimized['risk']:.0%} drawdown in a bad year, "
+        f"versus {current['expected_return']:.1%} and ~{current['risk']:.0%} for your current split."
     )
-    return {
-        "current": {
-            "allocation": current,
-            **cur_metrics,
-        },
-        "optimized": {
-            "allocation": target,
-            **opt_metrics,
-        },
-        "explanation": explanation,
-    }
 
 
 @optimizer_bp.route("/optimize", methods=["POST"])
 def optimize():
-    """Optimize staking vs liquid vs stable yield allocation using LLM (Groq/Gemini) plus simple metrics."""
+    """
+    Optimize staking vs liquid vs stable yield allocation: the best point on the
+    precomputed efficient frontier for the risk profile's drawdown budget. An LLM
+    (Groq/Gemini) only writes the explanation, with a deterministic fallback.
+    """
     uid = get_current_user_id()
     if not uid:
         return jsonify({"error": "Not authenticated"}), 401
@@ -136,138 +84,69 @@ def optimize():
     }
 
     cur_metrics = _compute_portfolio_metrics(current_norm)
-
-    provider = (os.environ.get("LLM_PROVIDER") or "").lower().strip()
-
-    metrics = {
-        "current_allocation": current_norm,
-        "current_expected_return": cur_metrics["expected_return"],
-        "current_risk_vol": cur_metrics["risk_vol"],
-        "current_risk_drawdown": cur_metrics["risk_drawdown"],
-        "risk_profile": risk_profile,
+    table = get_frontier()
+    best = table.point(table.best[risk_profile])
+    result = {
+        "current": {
+            "allocation": current_norm,
+            "expected_return": cur_metrics["expected_return"],
+            "risk": cur_metrics["risk_drawdown"],
+            "risk_vol": cur_metrics["risk_vol"],
+        },
+        "optimized": {
+            "allocation": best["allocation"],
+            "expected_return": best["expected_return"],
+            "risk": best["risk_drawdown"],
+            "risk_vol": best["risk_vol"],
+        },
+        "risk_budget": RISK_BUDGETS[risk_profile],
     }
+    result["explanation"] = _llm_explanation(result, risk_profile) or _fallback_explanation(
+        result["current"], result["optimized"], risk_profile
+    )
+    return jsonify(result)
+
 
+def _llm_explanation(result: dict, risk_profile: str) -> str | None:
+    """2-3 sentence explanation of an already chosen allocation (Groq and Gemini, hedged), or None."""
     system_prompt = (
-        "You are a crypto portfolio optimizer for a retail user interface. "
-        "You act like a reinforcement-learning style policy optimizer but respond once per request. "
-        "Your goal is to maximize expected growth while respecting a drawdown constraint based on risk profile: "
-        "conservative ~20% max drawdown, balanced ~30%, aggressive ~40%+. "
-        "You must propose a new allocation across staked, liquid, and stable yield buckets."
+        "You are a crypto portfolio coach for a retail user interface. "
+        "A deterministic optimizer has already chosen the allocation across staked, liquid and stable yield buckets "
+        "by maximizing expected return within a drawdown budget for the user's risk profile. "
+        "Do not change the numbers; explain the choice."
     )
     user_prompt = (
-        "Here is the current state as JSON:\n"
-        f"{json.dumps(metrics)}\n\n"
-        "Propose a new allocation in JSON only (no markdown) with structure:\n"
-        "{\n"
-        '  "optimized_allocation": {\n'
-        '    "staked_pct": number,\n'
-        '    "liquid_pct": number,\n'
-        '    "stable_pct": number\n'
-        "  },\n"
-        '  "expected_return_current": number,  // annual, you may reuse or adjust\n'
-        '  "expected_return_optimized": number,\n'
-        '  "risk_current": number,  // drawdown or vol proxy\n'
-        '  "risk_optimized": number,\n'
-        '  "explanation": string  // 2-3 sentences: why you chose this, where risk moved\n'
-        "}\n"
-        "Percentages should sum to ~100. Follow the risk profile constraint: do not exceed the drawdown budget."
+        "Here is the optimizer output as JSON (risk = 90th percentile 12-month max drawdown):\n"
+        f"{json.dumps({**result, 'risk_profile': risk_profile})}\n\n"
+        'Return JSON only (no markdown): {"explanation": string}  // 2-3 sentences: why this split, where risk moved'
     )
 
-    # Groq path when selected
-    if provider == "groq":
-        out = json_from_groq(system_prompt, user_prompt)
-        if isinstance(out, dict) and isinstance(out.get("optimized_allocation"), dict):
-            opt_alloc = out["optimized_allocation"]
-            result = {
-                "current": {
-                    "allocation": current_norm,
-                    "expected_return": out.get("expected_return_current", cur_metrics["expected_return"]),
-                    "risk": out.get("risk_current", cur_metrics["risk_drawdown"]),
-                },
-                "optimized": {
-                    "allocation": {
-                        "staked_pct": opt_alloc.get("staked_pct", current_norm["staked_pct"]),
-                        "liquid_pct": opt_alloc.get("liquid_pct", current_norm["liquid_pct"]),
-                        "stable_pct": opt_alloc.get("stable_pct", current_norm["stable_pct"]),
-                    },
-                    "expected_return": out.get("expected_return_optimized"),
-                    "risk": out.get("risk_optimized"),
-                },
-                "explanation": out.get("explanation", ""),
-            }
-            return jsonify(result)
+    out, _ = hedged_call(json_providers(system_prompt, user_prompt), _valid_explanation)
+    return str(out["explanation"]).strip() if out else None
 
-    # Gemini / Backboard path if keys present
-    api_key = (
-        os.environ.get("GEMINI_API_KEY")
-        or os.environ.get("GOOGLE_API_KEY")
-        or os.environ.get("BACKBOARD_API_KEY")
-    )
-    if api_key:
-        try:
-            import google.generativeai as genai
 
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            prompt = (
-                system_prompt
-                + "\n\n"
-                + user_prompt
-                + "\n\nRespond with JSON only, no markdown."
-            )
-            response = model.generate_content(prompt)
-            text = (response.text or "").strip()
-            if text.startswith("```"):
-                text = text.lstrip("`")
-                if text.lower().startswith("json"):
-                    text = text[4:]
-                if "```" in text:
-                    text = text.split("```", 1)[0]
-                text = text.strip()
-            out = json.loads(text)
-            if isinstance(out, dict) and isinstance(out.get("optimized_allocation"), dict):
-                opt_alloc = out["optimized_allocation"]
-                result = {
-                    "current": {
-                        "allocation": current_norm,
-                        "expected_return": out.get("expected_return_current", cur_metrics["expected_return"]),
-                        "risk": out.get("risk_current", cur_metrics["risk_drawdown"]),
-                    },
-                    "optimized": {
-                        "allocation": {
-                            "staked_pct": opt_alloc.get("staked_pct", current_norm["staked_pct"]),
-                            "liquid_pct": opt_alloc.get("liquid_pct", current_norm["liquid_pct"]),
-                            "stable_pct": opt_alloc.get("stable_pct", current_norm["stable_pct"]),
-                        },
-                        "expected_return": out.get("expected_return_optimized"),
-                        "risk": out.get("risk_optimized"),
-                    },
-                    "explanation": out.get("explanation", ""),
-                }
-                return jsonify(result)
-        except Exception:
-            pass
+def _valid_explanation(out) -> bool:
+    return isinstance(out, dict) and isinstance(out.get("explanation"), str) and bool(out["explanation"].strip())
+
 
-    # Fallback deterministic optimizer
-    result = _fallback_optimize(current_norm, risk_profile)
-    # Map into the same shape
+@optimizer_bp.route("/frontier", methods=["GET"])
+def frontier():
+    """Precomputed efficient frontier (expected return vs drawdown) and the best point per risk profile."""
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    f = get_frontier()
     return jsonify(
         {
-            "current": {
-                "allocation": result["current"]["allocation"],
-                "expected_return": result["current"]["expected_return"],
-                "risk": result["current"]["risk_drawdown"]
-                if "risk_drawdown" in result["current"]
-                else _compute_portfolio_metrics(result["current"]["allocation"])["risk_drawdown"],
-            },
-            "optimized": {
-                "allocation": result["optimized"]["allocation"],
-                "expected_return": result["optimized"]["expected_return"],
-                "risk": result["optimized"]["risk_drawdown"]
-                if "risk_drawdown" in result["optimized"]
-                else _compute_portfolio_metrics(result["optimized"]["allocation"])["risk_drawdown"],
+            "frontier": [f.point(i) for i in f.efficient],
+            "best": {profile: f.point(i) for profile, i in f.best.items()},
+            "risk_budgets": RISK_BUDGETS,
+            "assumptions": {
+                "assets": _base_asset_params(),
+                "grid_step_pct": GRID_STEP_PCT,
+                "drawdown_quantile": DRAWDOWN_QUANTILE,
+                "drawdown_months": DRAWDOWN_MONTHS,
+                "drawdown_paths": DRAWDOWN_PATHS,
             },
-            "explanation": result["explanation"],
         }
     )
-
@@ -5,6 +5,8 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.routes.auth import get_current_user_id
 from app.models import PortfolioItem, Transaction, Goal
+from app.services import circuit_breaker
+from app.services.llm_cache import bypass_requested
 from app.services.portfolio_llm import _parse_json_response
 from app.services.orchestrator import chat as orchestrator_chat
 
@@ -96,6 +98,8 @@ def gen_description(item_id):
     api_key = os.environ.get("BACKBOARD_API_KEY", "")
     if not api_key:
         return jsonify({"error": "LLM unavailable. Set BACKBOARD_API_KEY to enable."}), 503
+    if circuit_breaker.is_open("backboard"):
+        return jsonify({"error": "LLM temporarily unavailable. Try again shortly."}), 503
     finance_payload = {
         "portfolio_task": "description",
         "title": item.title or "",
@@ -103,7 +107,9 @@ def gen_description(item_id):
         "existing_description": item.description or "",
     }
     message = f"Generate a portfolio description for: {item.title}"
-    out = orchestrator_chat(message, uid, api_key, finance_payload=finance_payload)
+    out = orchestrator_chat(
+        message, uid, api_key, finance_payload=finance_payload, bypass_cache=bypass_requested(request.headers)
+    )
     desc = (out.get("text") or "").strip()
     if not desc:
         return jsonify({"error": "LLM unavailable. Set BACKBOARD_API_KEY to enable."}), 503
@@ -122,11 +128,13 @@ def get_allocation():
     goal = (data.get("goal") or "").strip() or "general growth and retirement"
     risk = (data.get("risk_tolerance") or "balanced").strip()
     api_key = os.environ.get("BACKBOARD_API_KEY", "")
-    if not api_key:
+    if not api_key or circuit_breaker.is_open("backboard"):
         return jsonify(DEFAULT_ALLOCATION)
     finance_payload = {"portfolio_task": "allocation", "goal": goal, "risk_tolerance": risk}
     message = f"Generate portfolio allocation for goal: {goal}, risk tolerance: {risk}"
-    out = orchestrator_chat(message, uid, api_key, finance_payload=finance_payload)
+    out = orchestrator_chat(
+        message, uid, api_key, finance_payload=finance_payload, bypass_cache=bypass_requested(request.headers)
+    )
     text = out.get("text") or ""
     parsed = _parse_json_response(text)
     if parsed and "categories" in parsed:
@@ -181,7 +189,7 @@ def get_spending_analysis():
     goals_summary = "\n".join(goals_lines) if goals_lines else "No goals set."
 
     api_key = os.environ.get("BACKBOARD_API_KEY", "")
-    if not api_key:
+    if not api_key or circuit_breaker.is_open("backboard"):
         result = _spending_fallback(tx_dicts)
     else:
         finance_payload = {
@@ -190,7 +198,9 @@ def get_spending_analysis():
             "goals_summary": goals_summary,
         }
         message = "Analyze spending and suggest reductions to redirect savings toward goals."
-        out = orchestrator_chat(message, uid, api_key, finance_payload=finance_payload)
+        out = orchestrator_chat(
+            message, uid, api_key, finance_payload=finance_payload, bypass_cache=bypass_requested(request.headers)
+        )
         text = out.get("text") or ""
         parsed = _parse_json_response(text)
         if parsed and "suggestions" in parsed:
@@ -5,13 +5,40 @@ import os
 import random
 from statistics import quantiles
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 from app.routes.auth import get_current_user_id
-from app.services.llm_client import json_from_groq
+from app.services import load_shedder
+from app.services.llm_cache import bypass_requested, cached as llm_cached
+from app.services.llm_hedge import hedged_call, json_providers, stats as llm_stats
+from app.services.montecarlo import (
+    REGIMES,
+    RETURNS_MODELS,
+    regime_params as _regime_params,
+    simulate,
+    simulate_grid,
+    simulate_regimes_chunked,
+)
+from app.services.mc_executor import EXACT_MAX_SIMULATIONS, SimulationBusy, SimulationTimeout, run_job, run_regimes
+from app.services.historical_returns import ReturnsDatasetError, dataset_version
+from app.services.mc_sampling import GAUSSIAN_ONLY_MODES, SAMPLING_MODES
+from app.services.scenario_cache import (
+    cache_key,
+    canonical_regime,
+    get_or_compute,
+    quantize_money,
+    quantize_scenario,
+    stats as cache_stats,
+)
+from app.services.scenario_solver import solve_contribution
 
 whatif_bp = Blueprint("whatif", __name__)
 
+MAX_SIMULATIONS = 200_000
+# Adaptive stopping: target p50 standard error relative to |p50|
+MIN_TOLERANCE = 0.0005
+MAX_TOLERANCE = 0.1
+
 
 def _percentiles(values, probs):
     if not values:
@@ -25,31 +52,56 @@ def _percentiles(values, probs):
     return out
 
 
-def _regime_params(regime: str):
-    """Return (annual_return, annual_vol) for a given market regime."""
-    key = (regime or "").lower().strip()
-    if key in ("bull", "bull_cycle"):
-        return 0.15, 0.25
-    if key in ("bear", "bear_cycle"):
-        return -0.05, 0.35
-    if key in ("high_vol", "high_volatility"):
-        return 0.07, 0.40
-    if key in ("crypto_winter", "winter"):
-        return -0.15, 0.70
-    # balanced / default
-    return 0.07, 0.15
-
-
 def _run_monte_carlo(
     monthly_investment: float,
     extra_loan_payment: float,
     horizon_years: int,
     simulations: int = 500,
     regime: str | None = None,
+    engine: str = "numpy",
+    seed=None,
 ):
     """
     Simple Monte Carlo on top of the deterministic loan/investment structure
     used in the frontend, with stochastic returns.
+
+    engine="numpy" (default) runs the vectorized engine in app.services.montecarlo;
+    engine="chunked" runs it block by block into mergeable sketches (bounded memory);
+    engine="python" runs the original per-step loop, kept as the reference.
+    """
+    if engine == "python":
+        return _run_monte_carlo_reference(
+            monthly_investment, extra_loan_payment, horizon_years, simulations, regime
+        )
+    if engine == "chunked":
+        return simulate_regimes_chunked(
+            monthly_investment, extra_loan_payment, horizon_years, [regime or "balanced"], simulations, seed
+        )[(regime or "balanced").lower().strip()]
+    annual_return, annual_vol = _regime_params(regime or "balanced")
+    return simulate(
+        monthly_investment=monthly_investment,
+        extra_loan_payment=extra_loan_payment,
+        horizon_years=horizon_years,
+        simulations=simulations,
+        annual_return=annual_return,
+        annual_vol=annual_vol,
+        seed=seed,
+    )
+
+
+def _run_monte_carlo_reference(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    simulations: int = 500,
+    regime: str | None = None,
+    normals=None,
+):
+    """
+    Pure-Python reference loop, one random.gauss draw per path and month.
+
+    Pass `normals` (indexable as normals[sim][month]) to replay the exact draws
+    given to the vectorized engine when checking the two for equivalence.
     """
     months = horizon_years * 12
 
@@ -64,7 +116,7 @@ def _run_monte_carlo(
     recovery_samples = []
     max_drawdowns = []
 
-    for _ in range(simulations):
+    for sim in range(simulations):
         invest_balance = 0.0
         loan_balance = 10_000.0  # mirrors LOAN_PRINCIPAL in frontend
         liquid_reserve = 3_000.0  # simple liquidity proxy
@@ -76,7 +128,7 @@ def _run_monte_carlo(
 
         for _m in range(1, months + 1):
             # Random monthly return draw
-            z = random.gauss(0, 1)
+            z = random.gauss(0, 1) if normals is None else float(normals[sim][_m - 1])
             r = monthly_drift + monthly_vol * z
 
             # Loan payments
@@ -189,6 +241,113 @@ def _run_monte_carlo(
     }
 
 
+def _run_multi_regime(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    seed=None,
+    sampling: str = "standard",
+    tolerance: float | None = None,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+):
+    """
+    Run several regimes in one pass over a single shared normal matrix
+    (common random numbers). Returns {regime: result}. Runs on the simulation
+    process pool; large path counts are split into seeded blocks across it.
+    `sampling` picks a variance-reduction mode and `tolerance` enables adaptive
+    stopping (see mc_sampling); `fan` adds per-month p10/p50/p90 bands;
+    `returns_model="bootstrap"` resamples historical returns instead of
+    Gaussian draws. Raises SimulationBusy / SimulationTimeout.
+    """
+    return run_regimes(
+        monthly_investment=monthly_investment,
+        extra_loan_payment=extra_loan_payment,
+        horizon_years=horizon_years,
+        regimes=regimes,
+        simulations=simulations,
+        seed=seed,
+        sampling=sampling,
+        tolerance=tolerance,
+        fan=fan,
+        returns_model=returns_model,
+    )
+
+
+def _cached_multi_regime(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    seed: int | None = None,
+    sampling: str = "standard",
+    tolerance: float | None = None,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+):
+    """
+    _run_multi_regime behind the scenario cache. Inputs are quantized ($10 steps,
+    whole years, canonical regimes) and, unless the caller pins one, the seed is
+    derived from the cache key, so every worker computes and shares the same
+    result. Returns (runs, cache_info).
+    """
+    base = {
+        **quantize_scenario(monthly_investment, extra_loan_payment, horizon_years),
+        "simulations": simulations,
+    }
+    if sampling != "standard" or tolerance is not None:
+        base["sampling"] = sampling
+        base["tolerance"] = tolerance
+    if returns_model != "gaussian":
+        # Rebuilding the dataset changes every bootstrapped result
+        base["returns_model"] = returns_model
+        base["returns_version"] = dataset_version()
+    if seed is not None:
+        base["seed"] = seed
+    params = {**base, "regimes": list(regimes)}
+    if fan:
+        # Same draws with or without the fan; only the cached payload differs
+        params["fan"] = True
+    if seed is None:
+        # Seed from the scenario alone: with common random numbers a regime's result
+        # then stays the same whichever other regimes were requested alongside it
+        _, seed = cache_key("scenario", base)
+    return get_or_compute(
+        "scenario",
+        params,
+        lambda _seed: _run_multi_regime(
+            monthly_investment=params["monthly_investment"],
+            extra_loan_payment=params["extra_loan_payment"],
+            horizon_years=params["horizon_years"],
+            regimes=params["regimes"],
+            simulations=simulations,
+            seed=seed,
+            sampling=sampling,
+            tolerance=tolerance,
+            fan=fan,
+            returns_model=returns_model,
+        ),
+    )
+
+
+def _cmp(a: dict, b: dict) -> dict:
+    """Compute simple deltas between two scenario snapshots."""
+    a_p50 = a.get("percentiles", {}).get("p50", 0.0)
+    b_p50 = b.get("percentiles", {}).get("p50", 0.0)
+    a_surv = a.get("survival_prob", 0.0)
+    b_surv = b.get("survival_prob", 0.0)
+    a_liq = a.get("liquidity", {}).get("avg_months", 0.0)
+    b_liq = b.get("liquidity", {}).get("avg_months", 0.0)
+    return {
+        "delta_net_worth_p50": float(a_p50 - b_p50),
+        "delta_survival_prob": float(a_surv - b_surv),
+        "delta_liquidity_months": float(a_liq - b_liq),
+    }
+
+
 def _fallback_coach(core: dict, monthly_investment: float) -> dict:
     # Very simple savings-rate proxy and narrative
     income_proxy = monthly_investment + 1000.0
@@ -215,9 +374,14 @@ def _fallback_coach(core: dict, monthly_investment: float) -> dict:
     }
 
 
-def _llm_coach(core: dict, monthly_investment: float, extra_loan_payment: float) -> dict:
-    provider = (os.environ.get("LLM_PROVIDER") or "").lower().strip()
+def _valid_coach(out) -> bool:
+    """A coach answer is usable when it is an object with a non-empty headline or commentary string."""
+    return isinstance(out, dict) and any(
+        isinstance(out.get(k), str) and out[k].strip() for k in ("headline", "commentary")
+    )
+
 
+def _llm_coach(core: dict, monthly_investment: float, extra_loan_payment: float, bypass_cache: bool = False) -> dict:
     # Derived metrics shared with the model
     income_proxy = monthly_investment + 1000.0
     savings_rate = (monthly_investment / income_proxy) if income_proxy > 0 else 0.0
@@ -286,62 +450,116 @@ def _llm_coach(core: dict, monthly_investment: float, extra_loan_payment: float)
         "Always ground your lines in the provided numbers and the named regime."
     )
 
-    # Groq path (JSON helper) when explicitly selected
-    if provider == "groq":
-        out = json_from_groq(system_prompt, user_prompt)
-        if not isinstance(out, dict):
-            return base
-        return {
-            "headline": out.get("headline") or base["headline"],
-            "commentary": out.get("commentary") or base["commentary"],
-            "savings_rate_pct": out.get("savings_rate_pct") or base["savings_rate_pct"],
-            "liquidity_months": out.get("liquidity_months") or base["liquidity_months"],
-            "tone": out.get("tone") or base["tone"],
-        }
-
-    # Gemini path: use GEMINI_API_KEY / GOOGLE_API_KEY / BACKBOARD_API_KEY if available
-    api_key = (
-        os.environ.get("GEMINI_API_KEY")
-        or os.environ.get("GOOGLE_API_KEY")
-        or os.environ.get("BACKBOARD_API_KEY")
+    # Metrics are in the prompt, so identical scenarios share a cached answer
+    out, _ = llm_cached(
+        "coach",
+        system_prompt,
+        user_prompt,
+        "hedged:groq+gemini",
+        lambda: hedged_call(json_providers(system_prompt, user_prompt), _valid_coach)[0],
+        bypass=bypass_cache,
     )
-    if api_key:
-        try:
-            import google.generativeai as genai
-
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            prompt = (
-                system_prompt
-                + "\n\n"
-                + user_prompt
-                + "\n\nRespond with a single JSON object only, no markdown."
-            )
-            response = model.generate_content(prompt)
-            text = (response.text or "").strip()
-            # Strip optional code fences
-            if text.startswith("```"):
-                text = text.lstrip("`")
-                if text.lower().startswith("json"):
-                    text = text[4:]
-                if "```" in text:
-                    text = text.split("```", 1)[0]
-                text = text.strip()
-            out = json.loads(text)
-            if isinstance(out, dict):
-                return {
-                    "headline": out.get("headline") or base["headline"],
-                    "commentary": out.get("commentary") or base["commentary"],
-                    "savings_rate_pct": out.get("savings_rate_pct") or base["savings_rate_pct"],
-                    "liquidity_months": out.get("liquidity_months") or base["liquidity_months"],
-                    "tone": out.get("tone") or base["tone"],
-                }
-        except Exception:
-            # Fall through to base if Gemini fails
-            pass
+    if out is None:
+        return base
+    return {
+        "headline": out.get("headline") or base["headline"],
+        "commentary": out.get("commentary") or base["commentary"],
+        "savings_rate_pct": out.get("savings_rate_pct") or base["savings_rate_pct"],
+        "liquidity_months": out.get("liquidity_months") or base["liquidity_months"],
+        "tone": out.get("tone") or base["tone"],
+    }
+
 
-    # Default: simple deterministic coach
-    return base
+def _finite(value) -> float:
+    """float(value), rejecting NaN and infinities (JSON 1e309 parses as inf). Raises ValueError/TypeError."""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Not a finite number: {value!r}")
+    return number
+
+
+def _seed(value) -> int | None:
+    """Optional RNG seed: a non-negative integer, or an integral string. Raises ValueError/TypeError."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"Invalid seed: {value!r}")
+    seed = int(value)
+    if seed < 0:
+        raise ValueError(f"Seed must be non-negative: {seed}")
+    return seed
+
+
+def _scenario_inputs(data: dict) -> dict:
+    """Parse and clamp the scenario request body. Raises ValueError/TypeError on bad input."""
+    monthly_investment = _finite(data.get("monthlyInvestment", 450))
+    extra_loan_payment = _finite(data.get("extraLoanPayment", 200))
+    horizon_years = int(_finite(data.get("horizonYears", 10)))
+    simulations = int(_finite(data.get("simulations", 500)))
+    seed = _seed(data.get("seed"))
+    sampling = (data.get("sampling") or "standard").lower().strip()
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling}")
+    returns_model = (data.get("returnsModel") or data.get("returns_model") or "gaussian").lower().strip()
+    if returns_model not in RETURNS_MODELS:
+        raise ValueError(f"Unknown returns model: {returns_model}")
+    if returns_model != "gaussian" and sampling in GAUSSIAN_ONLY_MODES:
+        raise ValueError(f"Sampling mode {sampling} needs Gaussian returns")
+    tolerance = data.get("tolerance")
+    if tolerance is not None:
+        tolerance = max(MIN_TOLERANCE, min(_finite(tolerance), MAX_TOLERANCE))
+    return {
+        "monthly_investment": max(0.0, monthly_investment),
+        "extra_loan_payment": max(0.0, extra_loan_payment),
+        "horizon_years": max(1, min(horizon_years, 40)),
+        "regime": (data.get("regime") or "balanced").lower().strip(),
+        "regimes": data.get("regimes"),
+        "simulations": max(100, min(simulations, MAX_SIMULATIONS)),
+        "seed": seed,
+        "sampling": sampling,
+        "tolerance": tolerance,
+        "fan": data.get("fan") in (True, "true", "1", 1),
+        "returns_model": returns_model,
+    }
+
+
+def _scenario_core(inputs: dict) -> dict:
+    """Core distribution for the requested regime, with comparisons and cache info."""
+    regime = inputs["regime"]
+    # Requested regime plus balanced/bull baselines, all on one shared draw
+    regime_key = canonical_regime(regime)
+    regimes = [regime_key, "balanced", "bull"]
+    requested = inputs["regimes"]
+    if requested == "all":
+        regimes += list(REGIMES)
+    elif isinstance(requested, list):
+        regimes += [canonical_regime(r) for r in requested if isinstance(r, str) and r.strip()]
+    regimes = list(dict.fromkeys(regimes))
+
+    runs, cache_info = _cached_multi_regime(
+        inputs["monthly_investment"],
+        inputs["extra_loan_payment"],
+        inputs["horizon_years"],
+        regimes,
+        simulations=inputs["simulations"],
+        seed=inputs["seed"],
+        sampling=inputs["sampling"],
+        tolerance=inputs["tolerance"],
+        fan=inputs["fan"],
+        returns_model=inputs["returns_model"],
+    )
+    core = runs[regime_key]
+    core["regime"] = regime
+    core["comparisons"] = {
+        "baseline": _cmp(core, runs["balanced"]),
+        "bull": _cmp(core, runs["bull"]),
+    }
+    if requested:
+        core["regimes"] = {
+            name: {**run, "regime": name} for name, run in runs.items() if name != regime_key
+        }
+    core["cache"] = cache_info
+    return core
 
 
 @whatif_bp.route("/scenario", methods=["POST"])
@@ -353,66 +571,243 @@ def scenario():
 
     data = request.get_json() or {}
     try:
-        monthly_investment = float(data.get("monthlyInvestment", 450))
-        extra_loan_payment = float(data.get("extraLoanPayment", 200))
-        horizon_years = int(data.get("horizonYears", 10))
+        inputs = _scenario_inputs(data)
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid input"}), 400
+    bypass = bypass_requested(request.headers)
 
-    regime = (data.get("regime") or "balanced").lower().strip()
+    try:
+        core = _scenario_core(inputs)
+    except SimulationBusy:
+        return jsonify({"error": "Simulation capacity exhausted, retry shortly"}), 503, {"Retry-After": "1"}
+    except SimulationTimeout:
+        return jsonify({"error": "Simulation timed out"}), 504
+    except ReturnsDatasetError as e:
+        return jsonify({"error": str(e)}), 503
+    # Under load the coach is the first AI work after insights to fall back to rules
+    degraded = load_shedder.should_shed("coach")
+    if degraded:
+        coach = _fallback_coach(core, inputs["monthly_investment"])
+    else:
+        coach = _llm_coach(core, inputs["monthly_investment"], inputs["extra_loan_payment"], bypass_cache=bypass)
+    core["coach"] = coach
+    # For backwards compatibility/simple uses, also expose a flat explanation string
+    core["explanation"] = coach["commentary"]
+    core["degraded"] = degraded
+    return jsonify(core)
 
-    horizon_years = max(1, min(horizon_years, 40))
-    monthly_investment = max(0.0, monthly_investment)
-    extra_loan_payment = max(0.0, extra_loan_payment)
 
-    core = _run_monte_carlo(
-        monthly_investment=monthly_investment,
-        extra_loan_payment=extra_loan_payment,
-        horizon_years=horizon_years,
-        simulations=500,
-        regime=regime,
-    )
-    core["regime"] = regime
+def _sse(event: str, payload: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
-    # Baseline (balanced) and bull regimes for comparative deltas
-    baseline = _run_monte_carlo(
-        monthly_investment=monthly_investment,
-        extra_loan_payment=extra_loan_payment,
-        horizon_years=horizon_years,
+
+@whatif_bp.route("/scenario/stream", methods=["POST"])
+def scenario_stream():
+    """
+    Server-Sent Events variant of /scenario, emitted in stages so the chart does
+    not wait on the LLM:
+      core        distribution, percentiles, liquidity (+ fallback coach placeholder)
+      comparisons deltas vs balanced and bull
+      coach       final coach commentary (LLM, or the fallback if unavailable or shed under load)
+      done        end of stream
+    An "error" event replaces the stages if the simulation pool is saturated or times out.
+    """
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    data = request.get_json() or {}
+    try:
+        inputs = _scenario_inputs(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid input"}), 400
+    bypass = bypass_requested(request.headers)
+
+    def generate():
+        try:
+            core = _scenario_core(inputs)
+        except (SimulationBusy, SimulationTimeout, ReturnsDatasetError) as e:
+            yield _sse("error", {"error": str(e)})
+            return
+        comparisons = core.pop("comparisons")
+        regimes = core.pop("regimes", None)
+        placeholder = _fallback_coach(core, inputs["monthly_investment"])
+        yield _sse("core", {**core, "coach": {**placeholder, "placeholder": True}})
+        payload = {"comparisons": comparisons}
+        if regimes is not None:
+            payload["regimes"] = regimes
+        yield _sse("comparisons", payload)
+        core["comparisons"] = comparisons
+        degraded = load_shedder.should_shed("coach")
+        try:
+            coach = placeholder if degraded else _llm_coach(
+                core, inputs["monthly_investment"], inputs["extra_loan_payment"], bypass_cache=bypass
+            )
+        except Exception:
+            coach = placeholder
+        yield _sse("coach", {"coach": coach, "explanation": coach["commentary"], "degraded": degraded})
+        yield _sse("done", {})
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Disable proxy buffering (nginx / Vite dev proxy) so frames flush immediately
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+GRID_MAX_STEPS = 25
+GRID_MAX_CELLS = 600
+
+
+def _grid_axis(spec, default, lo: float, hi: float, cast=float) -> list:
+    """
+    Parse one grid axis: a list of values or {"min", "max", "step"}.
+    Values are clamped to [lo, hi], de-duplicated and capped at GRID_MAX_STEPS.
+    """
+    if spec is None:
+        values = [default]
+    elif isinstance(spec, (int, float)):
+        values = [spec]
+    elif isinstance(spec, list):
+        values = spec
+    elif isinstance(spec, dict):
+        start = float(spec.get("min", default))
+        stop = float(spec.get("max", start))
+        step = float(spec.get("step") or 0) or (stop - start) or 1.0
+        if step <= 0 or stop < start:
+            raise ValueError("invalid range")
+        count = int((stop - start) / step + 1e-9) + 1
+        if count > GRID_MAX_STEPS:
+            raise ValueError("too many steps")
+        values = [start + i * step for i in range(count)]
+    else:
+        raise ValueError("invalid axis")
+    out = sorted({cast(max(lo, min(float(v), hi))) for v in values})
+    if not out or len(out) > GRID_MAX_STEPS:
+        raise ValueError("invalid axis")
+    return out
+
+
+@whatif_bp.route("/grid", methods=["POST"])
+def grid():
+    """
+    Batch what-if sweep for the UI sliders: p10/p50/p90, survival probability and
+    debt-freedom years for every monthlyInvestment x extraLoanPayment x horizonYears
+    cell, evaluated over one shared set of draws so the frontend can interpolate.
+    """
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    data = request.get_json() or {}
+    try:
+        investments = _grid_axis(data.get("monthlyInvestment"), 450, 0.0, 1e7)
+        extra_payments = _grid_axis(data.get("extraLoanPayment"), 200, 0.0, 1e7)
+        horizons = _grid_axis(data.get("horizonYears"), 10, 1, 40, cast=int)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid input"}), 400
+    if len(investments) * len(extra_payments) * len(horizons) > GRID_MAX_CELLS:
+        return jsonify({"error": f"Grid too large (max {GRID_MAX_CELLS} cells)"}), 400
+
+    regime = (data.get("regime") or "balanced").lower().strip()
+    annual_return, annual_vol = _regime_params(regime)
+    cells = simulate_grid(
+        investments,
+        extra_payments,
+        horizons,
         simulations=300,
-        regime="balanced",
+        annual_return=annual_return,
+        annual_vol=annual_vol,
     )
-    bull = _run_monte_carlo(
-        monthly_investment=monthly_investment,
-        extra_loan_payment=extra_loan_payment,
-        horizon_years=horizon_years,
-        simulations=300,
-        regime="bull",
+    return jsonify(
+        {
+            "regime": regime,
+            "axes": {
+                "monthlyInvestment": investments,
+                "extraLoanPayment": extra_payments,
+                "horizonYears": horizons,
+            },
+            "cells": cells,
+            "assumptions": {
+                "annual_return": annual_return,
+                "annual_vol": annual_vol,
+                "simulations": 300,
+            },
+        }
     )
 
-    def _cmp(a: dict, b: dict) -> dict:
-        """Compute simple deltas between two scenario snapshots."""
-        a_p50 = a.get("percentiles", {}).get("p50", 0.0)
-        b_p50 = b.get("percentiles", {}).get("p50", 0.0)
-        a_surv = a.get("survival_prob", 0.0)
-        b_surv = b.get("survival_prob", 0.0)
-        a_liq = a.get("liquidity", {}).get("avg_months", 0.0)
-        b_liq = b.get("liquidity", {}).get("avg_months", 0.0)
-        return {
-            "delta_net_worth_p50": float(a_p50 - b_p50),
-            "delta_survival_prob": float(a_surv - b_surv),
-            "delta_liquidity_months": float(a_liq - b_liq),
-        }
 
-    core["comparisons"] = {
-        "baseline": _cmp(core, baseline),
-        "bull": _cmp(core, bull),
+SOLVE_FIELDS = {"monthlyInvestment": "monthly_investment", "extraLoanPayment": "extra_loan_payment"}
+
+
+@whatif_bp.route("/solve", methods=["POST"])
+def solve():
+    """
+    Inverse scenario: the monthlyInvestment (or extraLoanPayment) needed to reach
+    `target` net worth after horizonYears, at a percentile (default 50) or with a
+    given probability (e.g. 0.9 = reached in 90% of paths). Searches over one
+    shared set of draws; results are cached like /scenario.
+    """
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    data = request.get_json() or {}
+    try:
+        target = round(_finite(data["target"]), 2)
+        solve_for = SOLVE_FIELDS[data.get("solveFor") or "monthlyInvestment"]
+        horizon_years = max(1, min(int(_finite(data.get("horizonYears", 10))), 40))
+        if data.get("probability") is not None:
+            quantile = 1.0 - max(0.01, min(_finite(data["probability"]), 0.99))
+        else:
+            quantile = max(1, min(int(_finite(data.get("percentile", 50))), 99)) / 100
+        simulations = max(100, min(int(_finite(data.get("simulations", 1000))), EXACT_MAX_SIMULATIONS))
+        seed = _seed(data.get("seed"))
+        fixed = {
+            "monthly_investment": quantize_money(max(0.0, _finite(data.get("monthlyInvestment", 450)))),
+            "extra_loan_payment": quantize_money(max(0.0, _finite(data.get("extraLoanPayment", 200)))),
+        }
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid input"}), 400
+    # The solved-for field is an output, so it must not split the cache
+    fixed.pop(solve_for)
+
+    regime = canonical_regime(data.get("regime"))
+    params = {
+        "target": target,
+        "solve_for": solve_for,
+        "horizon_years": horizon_years,
+        "quantile": round(quantile, 4),
+        "regime": regime,
+        "simulations": simulations,
+        **fixed,
     }
-    coach = _llm_coach(core, monthly_investment, extra_loan_payment)
-    core["coach"] = coach
-    # For backwards compatibility/simple uses, also expose a flat explanation string
-    core["explanation"] = coach["commentary"]
-    return jsonify(core)
+    if seed is not None:
+        params["seed"] = seed
+    try:
+        result, cache_info = get_or_compute(
+            "solve",
+            params,
+            lambda derived_seed: run_job(
+                solve_contribution,
+                target,
+                horizon_years,
+                solve_for=solve_for,
+                quantile=params["quantile"],
+                regime=regime,
+                simulations=simulations,
+                seed=seed if seed is not None else derived_seed,
+                **fixed,
+            ),
+        )
+    except SimulationBusy:
+        return jsonify({"error": "Simulation capacity exhausted, retry shortly"}), 503, {"Retry-After": "1"}
+    except SimulationTimeout:
+        return jsonify({"error": "Simulation timed out"}), 504
+    result["regime"] = regime
+    result["cache"] = cache_info
+    return jsonify(result)
 
 
 @whatif_bp.route("/config", methods=["GET"])
@@ -429,3 +824,21 @@ def config():
             "groq_ready": provider == "groq" and has_groq_key,
         }
     )
+
+
+@whatif_bp.route("/cache-stats", methods=["GET"])
+def cache_stats_route():
+    """Scenario cache hit/miss counters (per process and cluster-wide via Valkey)."""
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    return jsonify(cache_stats())
+
+
+@whatif_bp.route("/llm-stats", methods=["GET"])
+def llm_stats_route():
+    """Hedged LLM call win rates and latencies per provider (per process and cluster-wide via Valkey)."""
+    uid = get_current_user_id()
+    if not uid:
+        return jsonify({"error": "Not authenticated"}), 401
+    return jsonify(llm_stats())
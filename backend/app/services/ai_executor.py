@@ -0,0 +1,57 @@
+"""Process-wide bounded executor for background AI work.
+
+Background LLM jobs (e.g. insights refreshes) run on one small thread pool
+per worker instead of a pool per request. At most MAX_PENDING jobs may be
+running or queued; submit() returns None beyond that so callers degrade
+instead of piling up threads. The pool is created on first use and dropped in
+a forked child, so it always belongs to the worker that uses it.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get("AI_EXECUTOR_WORKERS", "4"))
+# Running + queued jobs per worker
+MAX_PENDING = int(os.environ.get("AI_EXECUTOR_MAX_PENDING", "32"))
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+
+
+def _reset_after_fork() -> None:
+    global _lock, _executor, _slots
+    _lock = threading.Lock()
+    _executor = None
+    _slots = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _pool() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ai-background")
+            _slots = threading.BoundedSemaphore(MAX_PENDING)
+        return _executor, _slots
+
+
+def submit(fn, *args, **kwargs) -> Future | None:
+    """Schedule `fn(*args, **kwargs)`; None if MAX_PENDING jobs are already running or queued."""
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        logger.info("AI executor full (%s pending), job rejected", MAX_PENDING)
+        return None
+    try:
+        future = executor.submit(fn, *args, **kwargs)
+    except RuntimeError:
+        slots.release()
+        return None
+    future.add_done_callback(lambda _: slots.release())
+    return future
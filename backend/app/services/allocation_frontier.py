@@ -0,0 +1,177 @@
+"""Deterministic efficient frontier for the staked / liquid / stable optimizer.
+
+Every allocation on the 3-asset simplex at GRID_STEP_PCT resolution is scored
+in one vectorized pass: expected return and volatility in closed form, and
+drawdown risk as the DRAWDOWN_QUANTILE of the 12-month max drawdown over a
+fixed set of Monte Carlo paths (monthly rebalanced). The table, its Pareto
+frontier and the best point per risk profile are built once per process
+(warmed in the background when a worker starts serving), so requests are
+array lookups.
+"""
+import logging
+import math
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ASSETS = ("staked", "liquid", "stable")
+# Annualized assumptions per bucket; illustrative, not advice
+ASSET_PARAMS = {
+    "staked": {"exp_return": 0.10, "vol": 0.60},
+    "liquid": {"exp_return": 0.02, "vol": 0.10},
+    "stable": {"exp_return": 0.05, "vol": 0.20},
+}
+GRID_STEP_PCT = 0.5
+DRAWDOWN_MONTHS = 12
+DRAWDOWN_PATHS = 500
+DRAWDOWN_QUANTILE = 0.9
+FRONTIER_SEED = 7
+# Allocations scored per chunk of the drawdown pass (bounds peak memory)
+CHUNK_POINTS = 4096
+# Drawdown budget per risk profile (DRAWDOWN_QUANTILE of 12-month max drawdown)
+RISK_BUDGETS = {"conservative": 0.20, "balanced": 0.30, "aggressive": 0.40}
+
+
+def simplex_grid(step_pct: float = GRID_STEP_PCT) -> np.ndarray:
+    """(points, 3) weights summing to 1, ordered by staked then liquid step."""
+    n = int(round(100 / step_pct))
+    i, j = np.meshgrid(np.arange(n + 1), np.arange(n + 1), indexing="ij")
+    mask = i + j <= n
+    return np.stack([i[mask], j[mask], n - i[mask] - j[mask]], axis=1) / n
+
+
+def grid_index(staked_pct: float, liquid_pct: float, step_pct: float = GRID_STEP_PCT) -> int:
+    """Row of simplex_grid() nearest to an allocation (percent)."""
+    n = int(round(100 / step_pct))
+    i = min(max(int(round(staked_pct / step_pct)), 0), n)
+    j = min(max(int(round(liquid_pct / step_pct)), 0), n - i)
+    # Rows before staked step i: sum over a < i of (n + 1 - a)
+    return i * (n + 1) - i * (i - 1) // 2 + j
+
+
+def portfolio_moments(weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Expected annual return and volatility (zero correlation) for (points, 3) weights."""
+    mu = np.array([ASSET_PARAMS[a]["exp_return"] for a in ASSETS])
+    sigma = np.array([ASSET_PARAMS[a]["vol"] for a in ASSETS])
+    return weights @ mu, np.sqrt((weights * sigma) ** 2 @ np.ones(len(ASSETS)))
+
+
+def drawdown_quantiles(
+    weights: np.ndarray,
+    paths: int = DRAWDOWN_PATHS,
+    months: int = DRAWDOWN_MONTHS,
+    quantile: float = DRAWDOWN_QUANTILE,
+    seed=FRONTIER_SEED,
+) -> np.ndarray:
+    """
+    `quantile` of the max drawdown over `months` for each allocation, on one
+    shared set of asset return paths so neighbouring allocations compare cleanly.
+    """
+    mu = np.array([ASSET_PARAMS[a]["exp_return"] for a in ASSETS])
+    sigma = np.array([ASSET_PARAMS[a]["vol"] for a in ASSETS])
+    drift = (1 + mu) ** (1 / 12) - 1
+    vol = sigma / math.sqrt(12)
+    rng = np.random.default_rng(seed)
+    asset_returns = (drift + vol * rng.standard_normal((months, paths, len(ASSETS)))).astype(np.float32)
+    # Rank of the requested quantile among the (negative) worst log drawdowns
+    k = paths - 1 - int(quantile * (paths - 1))
+    out = np.empty(weights.shape[0])
+    for start in range(0, weights.shape[0], CHUNK_POINTS):
+        w = weights[start:start + CHUNK_POINTS].T.astype(np.float32)
+        log_wealth = np.zeros((paths, w.shape[1]), dtype=np.float32)
+        peak = np.zeros_like(log_wealth)
+        worst = np.zeros_like(log_wealth)
+        for m in range(months):
+            step = asset_returns[m] @ w
+            np.log1p(np.maximum(step, -0.99, out=step), out=step)
+            log_wealth += step
+            np.maximum(peak, log_wealth, out=peak)
+            np.subtract(log_wealth, peak, out=step)
+            np.minimum(worst, step, out=worst)
+        out[start:start + CHUNK_POINTS] = 1.0 - np.exp(np.partition(worst, k, axis=0)[k])
+    return out
+
+
+@dataclass(frozen=True, eq=False)
+class Frontier:
+    weights: np.ndarray  # (points, 3)
+    expected_return: np.ndarray
+    risk_vol: np.ndarray
+    risk_drawdown: np.ndarray
+    efficient: np.ndarray  # indices on the Pareto frontier, by increasing drawdown
+    best: dict  # risk profile -> index
+
+    def point(self, idx: int) -> dict:
+        """API shape for one grid allocation."""
+        w = self.weights[idx]
+        return {
+            "allocation": {f"{a}_pct": round(float(w[i]) * 100, 2) for i, a in enumerate(ASSETS)},
+            "expected_return": float(self.expected_return[idx]),
+            "risk_vol": float(self.risk_vol[idx]),
+            "risk_drawdown": float(self.risk_drawdown[idx]),
+        }
+
+
+def build_frontier() -> Frontier:
+    weights = simplex_grid()
+    er, vol = portfolio_moments(weights)
+    dd = drawdown_quantiles(weights)
+
+    # Pareto set: sorted by drawdown (then return desc), keep strict return improvements
+    order = np.lexsort((-er, dd))
+    running = np.maximum.accumulate(er[order])
+    keep = np.concatenate(([True], er[order][1:] > running[:-1]))
+    efficient = order[keep]
+
+    best = {}
+    for profile, budget in RISK_BUDGETS.items():
+        feasible = np.flatnonzero(dd <= budget)
+        if feasible.size:
+            best[profile] = int(feasible[np.lexsort((dd[feasible], -er[feasible]))[0]])
+        else:
+            best[profile] = int(np.argmin(dd))
+    return Frontier(weights, er, vol, dd, efficient, best)
+
+
+_frontier = None
+_frontier_lock = threading.Lock()
+
+
+def get_frontier() -> Frontier:
+    """The process-wide frontier, built on first use (or by warm())."""
+    global _frontier
+    if _frontier is None:
+        with _frontier_lock:
+            if _frontier is None:
+                _frontier = build_frontier()
+    return _frontier
+
+
+def warm() -> None:
+    """Build the frontier in a background thread so the first request does not pay for it."""
+
+    def _build():
+        try:
+            get_frontier()
+        except Exception as e:
+            logger.warning("Allocation frontier warm-up failed: %s", e)
+
+    threading.Thread(target=_build, name="allocation-frontier", daemon=True).start()
+
+
+def evaluate(staked_pct: float, liquid_pct: float, stable_pct: float) -> dict:
+    """
+    Exact expected return / volatility for an arbitrary allocation, with the
+    Monte Carlo drawdown of the nearest grid point.
+    """
+    frontier = get_frontier()
+    w = np.array([[staked_pct, liquid_pct, stable_pct]]) / 100.0
+    er, vol = portfolio_moments(w)
+    return {
+        "expected_return": float(er[0]),
+        "risk_vol": float(vol[0]),
+        "risk_drawdown": float(frontier.risk_drawdown[grid_index(staked_pct, liquid_pct)]),
+    }
@@ -0,0 +1,142 @@
+"""Cluster-wide registry of Backboard assistants.
+
+Assistants are keyed by (API key, name, system prompt) hash and their ids are
+stored in Valkey without expiry, so every worker and service reuses the same
+assistant instead of POSTing /assistants per call. The first resolver in the
+cluster takes a short Valkey lock (SET NX) and creates the assistant; others
+wait for its id, for longer than the lock lives, so a crashed creator's lock
+expires and a waiter takes over. Ids are registered with SET NX, so if two
+creates ever race, everyone adopts the first registered id. Ids are also
+memoized per process, so a warm resolve costs nothing. Without Valkey the
+registry degrades to per-process memoization. BACKBOARD_ASSISTANT_ID, when
+set, overrides the registry entirely.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+
+import requests
+
+from app.services.llm_gateway import backboard_create_assistant, response_json
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_PREFIX = "backboard:assistant"
+LOCK_TTL_SECONDS = 30
+# How long a worker waits for another worker's create before giving up; past
+# the lock TTL, so an abandoned lock expires and is taken over first
+LOCK_WAIT_SECONDS = LOCK_TTL_SECONDS + 5.0
+LOCK_POLL_SECONDS = 0.1
+
+_local = {}
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+# Delete the lock only if we still own it
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+def registry_key(api_key: str, name: str, system_prompt: str) -> str:
+    account = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    spec = hashlib.sha256(f"{name}\0{system_prompt}".encode("utf-8")).hexdigest()[:24]
+    return f"{REGISTRY_PREFIX}:{account}:{spec}"
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _key_locks_guard:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _create(api_key: str, name: str, system_prompt: str) -> str | None:
+    r = backboard_create_assistant(api_key, name, system_prompt)
+    if not r.ok:
+        logger.warning("Backboard create assistant failed: status=%s body=%s", r.status_code, (r.text or "")[:500])
+        return None
+    return response_json(r).get("assistant_id")
+
+
+def _register(redis, key: str, assistant_id: str, name: str) -> str:
+    """Register `assistant_id` unless one already is; returns the id the cluster uses."""
+    try:
+        if redis.set(key, assistant_id, nx=True):
+            return assistant_id
+        existing = redis.get(key)
+        if existing and existing != assistant_id:
+            logger.warning("Assistant %r was registered concurrently; using %s", name, existing)
+        return existing or assistant_id
+    except Exception as e:
+        logger.warning("Could not register assistant %r: %s", name, e)
+        return assistant_id
+
+
+def _resolve_shared(redis, key: str, api_key: str, name: str, system_prompt: str) -> str | None:
+    """Read the id from Valkey, or become the one worker that creates it."""
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while True:
+        assistant_id = redis.get(key)
+        if assistant_id:
+            return assistant_id
+        if redis.set(lock_key, token, nx=True, ex=LOCK_TTL_SECONDS):
+            break
+        if time.monotonic() >= deadline:
+            logger.warning("Timed out waiting for assistant %r; creating it without the lock", name)
+            assistant_id = redis.get(key) or _create(api_key, name, system_prompt)
+            return _register(redis, key, assistant_id, name) if assistant_id else None
+        time.sleep(LOCK_POLL_SECONDS)
+    try:
+        # Another worker may have finished between our GET and SET NX
+        assistant_id = redis.get(key) or _create(api_key, name, system_prompt)
+        return _register(redis, key, assistant_id, name) if assistant_id else None
+    finally:
+        try:
+            redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception:
+            pass
+
+
+def resolve_assistant(api_key: str, name: str, system_prompt: str) -> str | None:
+    """Id of the shared assistant for (name, system prompt), creating it once per cluster."""
+    override = os.environ.get("BACKBOARD_ASSISTANT_ID")
+    if override:
+        return override
+    key = registry_key(api_key, name, system_prompt)
+    assistant_id = _local.get(key)
+    if assistant_id:
+        return assistant_id
+    with _key_lock(key):
+        assistant_id = _local.get(key)
+        if assistant_id:
+            return assistant_id
+        redis = get_redis()
+        assistant_id = None
+        if redis:
+            try:
+                assistant_id = _resolve_shared(redis, key, api_key, name, system_prompt)
+            except requests.exceptions.RequestException:
+                raise
+            except Exception as e:
+                logger.info("Assistant registry unavailable (%s); using per-process cache", e)
+                assistant_id = _create(api_key, name, system_prompt)
+        else:
+            assistant_id = _create(api_key, name, system_prompt)
+        if assistant_id:
+            _local[key] = assistant_id
+        return assistant_id
+
+
+def forget_assistant(api_key: str, name: str, system_prompt: str) -> None:
+    """Drop a registered id (e.g. Backboard returned 404 for it) so the next resolve recreates it."""
+    key = registry_key(api_key, name, system_prompt)
+    _local.pop(key, None)
+    redis = get_redis()
+    if redis:
+        try:
+            redis.delete(key)
+        except Exception:
+            pass
@@ -1,10 +1,10 @@
 """Build user financial snapshot and ingest to Backboard for memory/RAG."""
 import json
 import logging
-import os
 import uuid
 from datetime import datetime, timedelta
 
+from app.services.llm_gateway import backboard_ingest, document_id, response_json
 from app.services.user_context import get_user_financial_history
 
 logger = logging.getLogger(__name__)
@@ -129,30 +129,23 @@ def ingest_user_context_to_backboard(user_id: int, api_key: str) -> str | None:
     file_name = f"user_financial_snapshot_{user_id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.json"
 
     try:
-        import requests
-
-        url = os.environ.get(
-            "BACKBOARD_INGEST_URL", "https://api.backboard.io/v1/documents"
-        )
         # Backboard may accept user_id in form data for scoping; include if supported
-        data = {"type": "user_financial_snapshot", "user_id": str(user_id)}
-        r = requests.post(
-            url,
-            headers={"Authorization": f"Bearer {api_key}"},
-            files={"file": (file_name, content.encode("utf-8"), "application/json")},
-            data=data,
-            timeout=30,
+        r = backboard_ingest(
+            api_key,
+            file_name,
+            content.encode("utf-8"),
+            content_type="application/json",
+            fields={"type": "user_financial_snapshot", "user_id": str(user_id)},
         )
         if not r.ok:
             logger.warning(
                 "Backboard ingest failed: status=%s url=%s body=%s",
                 r.status_code,
-                url,
+                r.url,
                 (r.text or "")[:500],
             )
             return None
-        resp = r.json()
-        backboard_id = resp.get("id") or resp.get("document_id") or f"bk-{uuid.uuid4().hex[:12]}"
+        backboard_id = document_id(response_json(r)) or f"bk-{uuid.uuid4().hex[:12]}"
     except Exception as e:
         logger.warning("Backboard ingest error: %s", e, exc_info=True)
         return None
@@ -0,0 +1,157 @@
+"""Warm pool of pre-created Backboard threads for one-shot completions.
+
+A one-shot completion used to create a thread and then post to it, two
+sequential round trips. Here each worker keeps up to BACKBOARD_THREAD_POOL_SIZE
+idle threads per shared assistant, created ahead of time by a background
+refresher, so the hot path is a single message POST. Backboard threads keep
+their conversation history, so by default a thread is used once
+(BACKBOARD_THREAD_MAX_USES=1) and never carries one user's prompt into
+another's; raise it only for prompts that do not contain user data. Idle
+threads older than THREAD_MAX_AGE_SECONDS are dropped. The refresher starts
+on first use, i.e. after gunicorn forks the worker.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import requests
+
+from app.services.assistant_registry import forget_assistant, resolve_assistant
+from app.services.llm_gateway import backboard_create_thread, response_json
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get("BACKBOARD_THREAD_POOL_SIZE", "4"))
+MAX_USES = max(int(os.environ.get("BACKBOARD_THREAD_MAX_USES", "1")), 1)
+THREAD_MAX_AGE_SECONDS = 3600
+REFRESH_INTERVAL_SECONDS = 30
+# Back off refilling a pool whose thread creation keeps failing
+REFILL_ERROR_BACKOFF_SECONDS = 60
+
+
+@dataclass
+class Lease:
+    """A checked-out thread. Call discard() if it should not go back to the pool."""
+
+    thread_id: str
+    created_at: float
+    uses: int = 0
+    discarded: bool = False
+
+    def discard(self) -> None:
+        self.discarded = True
+
+
+@dataclass
+class _Pool:
+    api_key: str
+    name: str
+    system_prompt: str
+    idle: deque = field(default_factory=deque)
+    failed_at: float = 0.0
+
+
+_pools = {}
+_lock = threading.Lock()
+_wake = threading.Event()
+_refresher = None
+
+
+def _create(pool: _Pool) -> Lease | None:
+    assistant_id = resolve_assistant(pool.api_key, pool.name, pool.system_prompt)
+    if not assistant_id:
+        return None
+    r = backboard_create_thread(pool.api_key, assistant_id)
+    if r.status_code == 404:
+        forget_assistant(pool.api_key, pool.name, pool.system_prompt)
+    if not r.ok:
+        logger.warning("Backboard create thread failed: %s %s", r.status_code, (r.text or "")[:300])
+        return None
+    thread_id = response_json(r).get("thread_id")
+    return Lease(thread_id, time.monotonic()) if thread_id else None
+
+
+def _take_idle(pool: _Pool) -> Lease | None:
+    now = time.monotonic()
+    with _lock:
+        while pool.idle:
+            lease = pool.idle.popleft()
+            if now - lease.created_at < THREAD_MAX_AGE_SECONDS:
+                return lease
+    return None
+
+
+def _refill(pool: _Pool) -> None:
+    if time.monotonic() - pool.failed_at < REFILL_ERROR_BACKOFF_SECONDS:
+        return
+    while len(pool.idle) < POOL_SIZE:
+        try:
+            lease = _create(pool)
+        except requests.exceptions.RequestException as e:
+            logger.info("Thread pool refill for %r failed: %s", pool.name, e)
+            lease = None
+        if lease is None:
+            pool.failed_at = time.monotonic()
+            return
+        with _lock:
+            pool.idle.append(lease)
+
+
+def _refresh_loop() -> None:
+    while True:
+        _wake.wait(REFRESH_INTERVAL_SECONDS)
+        _wake.clear()
+        with _lock:
+            pools = list(_pools.values())
+            now = time.monotonic()
+            for pool in pools:
+                pool.idle = deque(l for l in pool.idle if now - l.created_at < THREAD_MAX_AGE_SECONDS)
+        for pool in pools:
+            try:
+                _refill(pool)
+            except Exception:
+                logger.exception("Thread pool refresher failed for %r", pool.name)
+
+
+def _pool(api_key: str, name: str, system_prompt: str) -> _Pool:
+    global _refresher
+    key = (api_key, name, system_prompt)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = _Pool(api_key, name, system_prompt)
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="backboard-threads", daemon=True)
+            _refresher.start()
+    return pool
+
+
+@contextmanager
+def lease_thread(api_key: str, name: str, system_prompt: str):
+    """
+    Check out a thread of the shared assistant (name, system_prompt); yields a
+    Lease, or None if no thread could be created. The thread goes back to the
+    pool on exit unless it was discarded or has reached MAX_USES.
+    """
+    pool = _pool(api_key, name, system_prompt)
+    lease = _take_idle(pool)
+    _wake.set()
+    if lease is None:
+        # Cold pool: pay for the thread inline this once
+        lease = _create(pool)
+        if lease is not None:
+            pool.failed_at = 0.0
+    try:
+        yield lease
+    finally:
+        if lease is not None:
+            lease.uses += 1
+            if not lease.discarded and lease.uses < MAX_USES:
+                with _lock:
+                    if len(pool.idle) < POOL_SIZE:
+                        pool.idle.append(lease)
+
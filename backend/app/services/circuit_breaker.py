@@ -0,0 +1,257 @@
+"""Per-provider circuit breakers for the external AI services.
+
+Every call to Backboard, Groq, Gemini or ElevenLabs is recorded in 10-second
+buckets (calls, errors, slow calls). When the last WINDOW_SECONDS hold at
+least MIN_CALLS and the error or slow-call rate crosses its threshold, the
+breaker opens for OPEN_SECONDS: allow() is False and callers go straight to
+their deterministic fallbacks instead of waiting out a timeout. After that one
+probe call is let through (half-open); success closes the breaker, failure
+re-opens it. State lives in Valkey so every worker trips together, with a
+per-process copy when Valkey is unreachable.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("backboard", "groq", "gemini", "elevenlabs")
+KEY_PREFIX = "cb"
+BUCKET_SECONDS = 10
+WINDOW_SECONDS = int(os.environ.get("BREAKER_WINDOW_SECONDS", "60"))
+MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", "6"))
+ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", "0.5"))
+SLOW_RATE = float(os.environ.get("BREAKER_SLOW_RATE", "0.5"))
+OPEN_SECONDS = int(os.environ.get("BREAKER_OPEN_SECONDS", "30"))
+# A call slower than this counts toward SLOW_RATE
+SLOW_CALL_SECONDS = {"backboard": 30.0, "groq": 10.0, "gemini": 20.0, "elevenlabs": 15.0}
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """
+    Raised by guard() when a provider's breaker is open. A ConnectionError, so
+    call sites that already fall back on connection failures handle it as-is.
+    """
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} circuit open")
+        self.provider = provider
+
+
+class _LocalStore:
+    """The few Valkey operations the breaker uses, for when Valkey is down."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._expiry = {}
+
+    def _live(self, key):
+        exp = self._expiry.get(key)
+        if exp is not None and exp <= time.time():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return self._data.get(key)
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._data[key] = str(value)
+            if ex:
+                self._expiry[key] = time.time() + ex
+            else:
+                self._expiry.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._live(key)
+            if h is None:
+                h = self._data[key] = {}
+            h[field] = int(h.get(field, 0)) + amount
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._live(key) or {})
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if key in self._data:
+                self._expiry[key] = time.time() + seconds
+
+
+_local = _LocalStore()
+# (checked_at, reachable) so an unreachable Valkey is not pinged on every call
+_health = [0.0, False]
+HEALTH_CHECK_SECONDS = 5.0
+
+
+def _store():
+    r = get_redis()
+    if not r:
+        return _local
+    now = time.monotonic()
+    if now - _health[0] >= HEALTH_CHECK_SECONDS:
+        try:
+            r.ping()
+            _health[1] = True
+        except Exception:
+            _health[1] = False
+        _health[0] = now
+    return r if _health[1] else _local
+
+
+def _bucket_keys(provider: str, now: float) -> list[str]:
+    current = int(now // BUCKET_SECONDS)
+    return [f"{KEY_PREFIX}:{provider}:b:{current - i}" for i in range(max(WINDOW_SECONDS // BUCKET_SECONDS, 1))]
+
+
+def _window(store, provider: str, now: float) -> dict:
+    totals = {"calls": 0, "errors": 0, "slow": 0}
+    for key in _bucket_keys(provider, now):
+        for field, value in (store.hgetall(key) or {}).items():
+            totals[field] = totals.get(field, 0) + int(value)
+    return totals
+
+
+def _open(store, provider: str, now: float, reason: str) -> None:
+    store.set(f"{KEY_PREFIX}:{provider}:open_until", now + OPEN_SECONDS, ex=OPEN_SECONDS * 4)
+    store.delete(f"{KEY_PREFIX}:{provider}:probe")
+    logger.warning("Circuit breaker for %s opened for %ss (%s)", provider, OPEN_SECONDS, reason)
+
+
+def _close(store, provider: str, now: float) -> None:
+    store.delete(
+        f"{KEY_PREFIX}:{provider}:open_until",
+        f"{KEY_PREFIX}:{provider}:probe",
+        *_bucket_keys(provider, now),
+    )
+    logger.info("Circuit breaker for %s closed", provider)
+
+
+def _state(store, provider: str, now: float) -> str:
+    open_until = store.get(f"{KEY_PREFIX}:{provider}:open_until")
+    if open_until is None:
+        return "closed"
+    return "open" if now < float(open_until) else "half_open"
+
+
+def state(provider: str) -> str:
+    """"closed", "open" or "half_open" (read-only; use allow() before a call)."""
+    try:
+        return _state(_store(), provider, time.time())
+    except Exception:
+        return "closed"
+
+
+def is_open(provider: str) -> bool:
+    """
+    True while `provider` is open, for routes to skip straight to their fallback.
+    Half-open reads as closed so a request can carry the probe; allow() in the
+    gateway turns away everyone but the first.
+    """
+    return state(provider) == "open"
+
+
+def allow(provider: str) -> bool:
+    """Whether a call may go out now; in half-open, only one caller gets the probe."""
+    try:
+        store = _store()
+        now = time.time()
+        current = _state(store, provider, now)
+        if current == "closed":
+            return True
+        if current == "open":
+            return False
+        return bool(store.set(f"{KEY_PREFIX}:{provider}:probe", "1", nx=True, ex=OPEN_SECONDS))
+    except Exception:
+        return True
+
+
+def record(provider: str, ok: bool, latency: float) -> None:
+    """Record one finished call and trip or reset the breaker as needed."""
+    try:
+        store = _store()
+        now = time.time()
+        current = _state(store, provider, now)
+        slow = latency >= SLOW_CALL_SECONDS.get(provider, 30.0)
+        if current == "half_open":
+            # This was the probe
+            if ok and not slow:
+                _close(store, provider, now)
+            else:
+                _open(store, provider, now, "probe failed")
+            return
+        key = _bucket_keys(provider, now)[0]
+        store.hincrby(key, "calls", 1)
+        if not ok:
+            store.hincrby(key, "errors", 1)
+        if slow:
+            store.hincrby(key, "slow", 1)
+        store.expire(key, WINDOW_SECONDS + BUCKET_SECONDS)
+        if current == "open":
+            return
+        totals = _window(store, provider, now)
+        if totals["calls"] >= MIN_CALLS:
+            if totals["errors"] / totals["calls"] >= ERROR_RATE:
+                _open(store, provider, now, f"{totals['errors']}/{totals['calls']} errors")
+            elif totals["slow"] / totals["calls"] >= SLOW_RATE:
+                _open(store, provider, now, f"{totals['slow']}/{totals['calls']} slow calls")
+    except Exception as e:
+        logger.debug("Circuit breaker record failed: %s", e)
+
+
+def guard(provider: str) -> None:
+    """Raise CircuitOpen unless allow(provider)."""
+    if not allow(provider):
+        raise CircuitOpen(provider)
+
+
+def reset(provider: str) -> None:
+    """Force a breaker closed and clear its window (admin)."""
+    _close(_store(), provider, time.time())
+
+
+def snapshot() -> dict:
+    """State, window counts and reopen time per provider, for the admin endpoint."""
+    store = _store()
+    now = time.time()
+    out = {}
+    for provider in PROVIDERS:
+        totals = _window(store, provider, now)
+        open_until = store.get(f"{KEY_PREFIX}:{provider}:open_until")
+        out[provider] = {
+            "state": _state(store, provider, now),
+            "window": totals,
+            "error_rate": totals["errors"] / totals["calls"] if totals["calls"] else 0.0,
+            "slow_rate": totals["slow"] / totals["calls"] if totals["calls"] else 0.0,
+            "open_until": float(open_until) if open_until is not None else None,
+        }
+    return {
+        "shared": store is not _local,
+        "thresholds": {
+            "window_seconds": WINDOW_SECONDS,
+            "min_calls": MIN_CALLS,
+            "error_rate": ERROR_RATE,
+            "slow_rate": SLOW_RATE,
+            "open_seconds": OPEN_SECONDS,
+            "slow_call_seconds": SLOW_CALL_SECONDS,
+        },
+        "providers": out,
+    }
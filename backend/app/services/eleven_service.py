@@ -2,6 +2,7 @@
 
 All audio is streamed directly from the API. Nothing touches disk.
 Uses ElevenLabs Free Tier compatible settings (mp3_44100_128).
+Calls feed the "elevenlabs" circuit breaker and raise CircuitOpen while it is open.
 """
 
 import io
@@ -12,6 +13,8 @@ from typing import Generator
 
 from elevenlabs import ElevenLabs
 
+from app.services import circuit_breaker
+
 # Rate-limit concurrent API calls (Free Tier is strict)
 _semaphore = threading.Semaphore(3)
 
@@ -54,6 +57,17 @@ def stream_speech(text: str, voice_id: str = None) -> Generator[bytes, None, Non
 
     voice = voice_id or DEFAULT_VOICE_ID
 
+    circuit_breaker.guard("elevenlabs")
+    started = time.monotonic()
+    recorded = False
+
+    def record(ok: bool) -> None:
+        # Once per call: time to first byte is what the slow-call threshold measures
+        nonlocal recorded
+        if not recorded:
+            recorded = True
+            circuit_breaker.record("elevenlabs", ok, time.monotonic() - started)
+
     _semaphore.acquire()
     try:
         last_exc = None
@@ -68,17 +82,23 @@ def stream_speech(text: str, voice_id: str = None) -> Generator[bytes, None, Non
                 )
                 # Yield chunks directly -- no buffering, no disk
                 for chunk in response:
+                    record(True)
                     yield chunk
+                record(True)
                 return
 
             except Exception as e:
                 last_exc = e
-                if _is_retryable(e) and attempt < MAX_RETRIES - 1:
+                # A retry after audio went out would replay it
+                if not recorded and _is_retryable(e) and attempt < MAX_RETRIES - 1:
                     time.sleep(RETRY_DELAY)
                     continue
+                record(False)
                 raise
         raise last_exc  # type: ignore[misc]
     finally:
+        # Also settles a half-open probe when the generator is closed or interrupted
+        record(False)
         _semaphore.release()
 
 
@@ -103,6 +123,8 @@ def transcribe_audio(audio_bytes: bytes, language: str = "en") -> str:
 
     audio_file = io.BytesIO(audio_bytes)
 
+    circuit_breaker.guard("elevenlabs")
+    started = time.monotonic()
     last_exc = None
     for attempt in range(MAX_RETRIES):
         try:
@@ -112,6 +134,7 @@ def transcribe_audio(audio_bytes: bytes, language: str = "en") -> str:
                 model_id="scribe_v2",
                 language_code=language,
             )
+            circuit_breaker.record("elevenlabs", True, time.monotonic() - started)
             return result.text
         except Exception as e:
             last_exc = e
@@ -119,5 +142,6 @@ def transcribe_audio(audio_bytes: bytes, language: str = "en") -> str:
                 audio_file.seek(0)
                 time.sleep(RETRY_DELAY)
                 continue
+            circuit_breaker.record("elevenlabs", False, time.monotonic() - started)
             raise
     raise last_exc  # type: ignore[misc]
@@ -1,72 +1,19 @@
 """AI-powered personalized experience suggestions for short-term budget.
 
-Uses Backboard API: create assistant, create thread, send message (data=content per docs), parse JSON.
-Requires BACKBOARD_API_KEY.
+Uses llm_gateway.backboard_completion: the shared assistant id comes from the
+cluster-wide registry, the prompt is one message POST on a pre-created pooled
+thread, and the reply is parsed as JSON. Requires BACKBOARD_API_KEY.
 """
 import json
 import logging
 import os
 
-import requests
-
+from app.services import circuit_breaker, single_flight
+from app.services.llm_gateway import backboard_completion
 from app.services.user_context import get_user_financial_history
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://app.backboard.io/api"
-
-
-def _backboard_completion(prompt: str, api_key: str) -> str | None:
-    """Single Backboard completion per docs: assistant -> thread -> message with data=content."""
-    headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-    base = (os.environ.get("BACKBOARD_API_BASE") or BASE_URL).rstrip("/")
-
-    # 1) Create assistant (or use existing)
-    assistant_id = os.environ.get("BACKBOARD_ASSISTANT_ID")
-    if not assistant_id:
-        r = requests.post(
-            f"{base}/assistants",
-            headers=headers,
-            json={
-                "name": "Experiences",
-                "system_prompt": "You respond only with valid JSON. No markdown, no code fences.",
-            },
-            timeout=30,
-        )
-        if not r.ok:
-            logger.warning("Backboard assistants: %s %s", r.status_code, (r.text or "")[:300])
-            return None
-        assistant_id = r.json().get("assistant_id")
-    if not assistant_id:
-        return None
-
-    # 2) Create thread
-    r = requests.post(
-        f"{base}/assistants/{assistant_id}/threads",
-        headers=headers,
-        json={},
-        timeout=30,
-    )
-    if not r.ok:
-        logger.warning("Backboard threads: %s %s", r.status_code, (r.text or "")[:300])
-        return None
-    thread_id = r.json().get("thread_id")
-    if not thread_id:
-        return None
-
-    # 3) Send message — docs: data={"content": "Hello!", "stream": "false"}
-    r = requests.post(
-        f"{base}/threads/{thread_id}/messages",
-        headers={"X-API-Key": api_key},
-        data={"content": prompt, "stream": "false"},
-        timeout=60,
-    )
-    if not r.ok:
-        logger.warning("Backboard messages: %s %s", r.status_code, (r.text or "")[:300])
-        return None
-    out = r.json()
-    return out.get("content") or out.get("text") or out.get("response")
-
 
 def _call_backboard_for_experiences(
     context: str, location: str, remaining_budget_dollars: float
@@ -75,6 +22,8 @@ def _call_backboard_for_experiences(
     if not api_key or not api_key.strip():
         logger.warning("Experiences: BACKBOARD_API_KEY not set.")
         return [], "no_api_key"
+    if circuit_breaker.is_open("backboard"):
+        return [], "api_error"
 
     loc_hint = (
         f" Focus on experiences in or near: {location}." if location else " Suggest experiences for a general urban area."
@@ -100,7 +49,12 @@ def _call_backboard_for_experiences(
         + context
     )
 
-    text = _backboard_completion(prompt, api_key)
+    text = backboard_completion(
+        prompt,
+        api_key,
+        assistant_name="Experiences",
+        system_prompt="You respond only with valid JSON. No markdown, no code fences.",
+    )
     if not text:
         return [], "api_error"
 
@@ -152,7 +106,11 @@ def generate_experiences(user_id: int, location: str | None, budget_cents: int)
     if remaining_dollars <= 0:
         remaining_dollars = 50.0
     try:
-        return _call_backboard_for_experiences(context, location or "", remaining_dollars)
+        experiences, status = single_flight.run(
+            single_flight.flight_key(user_id, "experiences", context, location or "", remaining_dollars),
+            lambda: _call_backboard_for_experiences(context, location or "", remaining_dollars),
+        )
+        return experiences, status
     except Exception as e:
         logger.warning("Experiences failed: %s", e)
         return [], "api_error"
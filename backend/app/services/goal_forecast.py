@@ -0,0 +1,202 @@
+"""Goal-success forecast: hit probability and expected completion for every goal.
+
+Each goal's balance follows B_t = B_{t-1} (1 + r_t) + c, with its monthly
+contribution c taken from the user's partition_config budget. With cumulative
+growth W_t = prod_{j<=t} (1 + r_j) this is B_t = W_t (B_0 + c sum_{k<=t} 1 / W_k),
+so one pass over a shared shock matrix per return profile serves every goal
+as a single broadcast (goals, paths, months) array operation.
+"""
+import hashlib
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app.services.montecarlo import monthly_params, regime_params
+
+logger = logging.getLogger(__name__)
+
+# Goal categories funded from the investments bucket (fully market exposed);
+# everything else is funded from short_term_goals and held mostly in cash
+INVESTMENT_CATEGORIES = ("long_term", "investment", "investments", "investing", "retirement")
+SHORT_TERM_EQUITY_SHARE = 0.3
+DEFAULT_HORIZON_MONTHS = 60
+MAX_HORIZON_MONTHS = 360
+BUDGET_LOOKBACK_DAYS = 90
+# Bound the (goals, paths, months) working array for users with many goals
+MAX_CHUNK_ELEMENTS = 2_000_000
+
+
+def months_until(deadline: date | None, today: date) -> int | None:
+    """Whole months from `today` to `deadline` (0 if already past), or None."""
+    if deadline is None:
+        return None
+    months = (deadline.year - today.year) * 12 + (deadline.month - today.month)
+    if deadline.day < today.day:
+        months -= 1
+    return max(months, 0)
+
+
+def add_months(start: date, months: int) -> date:
+    """`start` moved forward by `months`, clamping the day to the target month."""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    month += 1
+    next_month = date(year + (month == 12), month % 12 + 1, 1)
+    return date(year, month, min(start.day, (next_month - timedelta(days=1)).day))
+
+
+def estimate_monthly_budget_cents(user_id: int) -> int:
+    """
+    Monthly budget from recent transactions: average inflow over the lookback,
+    falling back to average spend when there is no recorded income.
+    """
+    from app.models import Transaction
+
+    cutoff = datetime.utcnow() - timedelta(days=BUDGET_LOOKBACK_DAYS)
+    rows = Transaction.query.filter(
+        Transaction.user_id == user_id,
+        Transaction.transaction_at >= cutoff,
+    ).with_entities(Transaction.amount_cents).all()
+    inflow = sum(a for (a,) in rows if a > 0)
+    outflow = sum(-a for (a,) in rows if a < 0)
+    months = BUDGET_LOOKBACK_DAYS / 30.0
+    return int(round((inflow or outflow) / months))
+
+
+def goal_contributions(goals: list[dict], partition_config: dict, budget_cents: int) -> list[float]:
+    """
+    Monthly contribution (dollars) per goal. Each partition bucket is split
+    across its unmet goals in proportion to what each still needs.
+    """
+    buckets = {}
+    for i, g in enumerate(goals):
+        remaining = max(g["target_cents"] - g["saved_cents"], 0)
+        if remaining:
+            buckets.setdefault(g["bucket"], []).append((i, remaining))
+    out = [0.0] * len(goals)
+    for bucket, members in buckets.items():
+        cfg = (partition_config or {}).get(bucket) or {}
+        if not cfg.get("enabled", True):
+            continue
+        pool = budget_cents * float(cfg.get("target_pct", 0) or 0) / 100.0
+        total = sum(r for _, r in members)
+        for i, remaining in members:
+            out[i] = pool * remaining / total / 100.0
+    return out
+
+
+def _profile_forecast(
+    saved: np.ndarray,
+    target: np.ndarray,
+    contribution: np.ndarray,
+    deadline: np.ndarray,
+    returns: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Hit probability at each goal's deadline and the median first month the
+    target is reached (-1 when fewer than half the paths reach it), for goals
+    sharing one (paths, months) return matrix.
+    """
+    paths, months = returns.shape
+    wealth = np.cumprod(1.0 + returns, axis=1)
+    inv_sum = np.cumsum(1.0 / wealth, axis=1)
+    hit_prob = np.empty(saved.shape[0])
+    median_month = np.empty(saved.shape[0], dtype=np.int64)
+    chunk = max(1, MAX_CHUNK_ELEMENTS // max(paths * months, 1))
+    for start in range(0, saved.shape[0], chunk):
+        sl = slice(start, start + chunk)
+        balance = wealth[None, :, :] * (saved[sl, None, None] + contribution[sl, None, None] * inv_sum[None, :, :])
+        reached = balance >= target[sl, None, None]
+        at_deadline = np.take_along_axis(reached, np.maximum(deadline[sl] - 1, 0)[:, None, None], axis=2)[:, :, 0]
+        hit_prob[sl] = at_deadline.mean(axis=1)
+        # First month (1-based) each path reaches the target; months + 1 if never
+        first = np.where(reached.any(axis=2), reached.argmax(axis=2) + 1, months + 1)
+        med = np.median(first, axis=1)
+        median_month[sl] = np.where(med <= months, np.ceil(med), -1).astype(np.int64)
+    return hit_prob, median_month
+
+
+def forecast_goals(
+    goals: list[dict],
+    partition_config: dict,
+    budget_cents: int,
+    regime: str = "balanced",
+    simulations: int = 500,
+    seed=None,
+    today: date | None = None,
+) -> list[dict]:
+    """
+    Forecast every goal over one shared shock matrix.
+
+    `goals` are plain dicts (id, name, target_cents, saved_cents, category,
+    deadline as ISO date or None). A goal without a deadline reports the
+    probability of completing within the simulated horizon.
+    """
+    today = today or date.today()
+    if not goals:
+        return []
+    rows = []
+    for g in goals:
+        deadline = date.fromisoformat(g["deadline"]) if g.get("deadline") else None
+        category = (g.get("category") or "short_term").lower().strip()
+        bucket = "investments" if category in INVESTMENT_CATEGORIES else "short_term_goals"
+        rows.append({**g, "bucket": bucket, "deadline_months": months_until(deadline, today)})
+    contributions = goal_contributions(rows, partition_config, budget_cents)
+
+    horizon = max([DEFAULT_HORIZON_MONTHS] + [r["deadline_months"] or 0 for r in rows])
+    horizon = min(horizon, MAX_HORIZON_MONTHS)
+    annual_return, annual_vol = regime_params(regime)
+    normals = np.random.default_rng(seed).standard_normal((simulations, horizon))
+
+    saved = np.array([r["saved_cents"] / 100.0 for r in rows])
+    target = np.array([r["target_cents"] / 100.0 for r in rows])
+    contribution = np.array(contributions)
+    deadline = np.array([min(r["deadline_months"] or horizon, horizon) for r in rows], dtype=np.int64)
+    hit_prob = np.empty(len(rows))
+    median_month = np.empty(len(rows), dtype=np.int64)
+    for share, bucket in ((1.0, "investments"), (SHORT_TERM_EQUITY_SHARE, "short_term_goals")):
+        idx = np.array([i for i, r in enumerate(rows) if r["bucket"] == bucket], dtype=np.int64)
+        if not idx.size:
+            continue
+        drift, vol = monthly_params(annual_return * share, annual_vol * share)
+        hit_prob[idx], median_month[idx] = _profile_forecast(
+            saved[idx], target[idx], contribution[idx], deadline[idx], drift + vol * normals
+        )
+
+    out = []
+    for i, r in enumerate(rows):
+        met = r["saved_cents"] >= r["target_cents"]
+        if met:
+            prob, month = 1.0, 0
+        elif r["deadline_months"] == 0:
+            prob, month = 0.0, int(median_month[i])
+        else:
+            prob, month = float(hit_prob[i]), int(median_month[i])
+        out.append(
+            {
+                "goal_id": r.get("id"),
+                "name": r.get("name"),
+                "category": r.get("category"),
+                "funded_from": r["bucket"],
+                "target": r["target_cents"] / 100,
+                "saved": r["saved_cents"] / 100,
+                "monthly_contribution": round(contributions[i], 2),
+                "deadline": r.get("deadline"),
+                "hit_probability": prob,
+                "expected_completion_date": add_months(today, month).isoformat() if month >= 0 else None,
+                "expected_completion_months": month if month >= 0 else None,
+            }
+        )
+    return out
+
+
+def data_version(goals: list[dict], partition_config: dict, budget_cents: int) -> str:
+    """Fingerprint of everything a forecast depends on besides regime/paths/date."""
+    payload = json.dumps(
+        {"goals": goals, "partition_config": partition_config, "budget_cents": budget_cents},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
@@ -0,0 +1,171 @@
+"""Historical monthly return series for block-bootstrap what-if simulations.
+
+The dataset is a 2-D `.npy` array (months x series) of decimal monthly returns
+with a JSON sidecar (`<name>.json`) naming the series. It is opened with
+numpy's memmap in read-only mode, so every gunicorn worker and pool process
+shares one page-cache copy and nothing is parsed per request. Build and check
+it with `python returns_data.py` (backend root); workers pick up a rebuilt
+file on restart.
+
+Bootstrapped draws are standardized residuals of the historical series: the
+regime still sets drift and volatility, while fat tails and short-range
+autocorrelation (within each block) come from history.
+"""
+import hashlib
+import json
+import math
+import os
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_RETURNS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "returns.npy")
+RETURNS_PATH = os.environ.get("WHATIF_RETURNS_PATH") or DEFAULT_RETURNS_PATH
+FORMAT_VERSION = 1
+MIN_MONTHS = 24
+# Consecutive months per bootstrap block (keeps a year of serial structure)
+BOOTSTRAP_BLOCK_MONTHS = 12
+
+
+class ReturnsDatasetError(ValueError):
+    """Raised when the returns dataset is missing or fails validation."""
+
+
+@dataclass(frozen=True, eq=False)
+class ReturnSeries:
+    """Read-only view over a memory-mapped returns dataset."""
+
+    path: str
+    data: np.ndarray  # (months, series) memmap
+    series: tuple[str, ...]
+    start: str | None
+    means: np.ndarray
+    stds: np.ndarray
+    version: str
+
+    @property
+    def months(self) -> int:
+        return int(self.data.shape[0])
+
+    def column(self, series: str | None) -> int:
+        if series is None:
+            return 0
+        try:
+            return self.series.index(series)
+        except ValueError:
+            raise ReturnsDatasetError(f"Unknown return series: {series}") from None
+
+
+def sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def validate_array(data: np.ndarray, series) -> None:
+    """Raise ReturnsDatasetError unless `data` is a usable (months, series) return matrix."""
+    if data.ndim != 2:
+        raise ReturnsDatasetError(f"Expected a 2-D array, got shape {data.shape}")
+    if data.dtype not in (np.float32, np.float64):
+        raise ReturnsDatasetError(f"Expected float32/float64, got {data.dtype}")
+    if data.shape[0] < MIN_MONTHS:
+        raise ReturnsDatasetError(f"Need at least {MIN_MONTHS} months, got {data.shape[0]}")
+    if data.shape[1] != len(series):
+        raise ReturnsDatasetError(f"{data.shape[1]} columns but {len(series)} series names")
+    if not np.isfinite(data).all():
+        raise ReturnsDatasetError("Dataset contains NaN or infinite values")
+    if (data <= -1.0).any():
+        raise ReturnsDatasetError("Monthly returns must be greater than -100%")
+    if (data.std(axis=0) <= 0).any():
+        raise ReturnsDatasetError("Every series needs non-zero variance")
+
+
+def _replace_atomically(path: str, write) -> None:
+    """Write via `write(file)` to a temp file next to `path`, then rename it over `path`."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        # mkstemp creates 0600; workers may run as another user
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_dataset(path: str, data: np.ndarray, series, start: str | None = None) -> None:
+    """
+    Validate and write `data` (months x series) plus its sidecar. Both files are
+    swapped in by rename, data first and sidecar last, so running workers keep
+    their memmap of the old file intact and only see the new one on restart.
+    """
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    series = list(series)
+    validate_array(data, series)
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = json.dumps({"format": FORMAT_VERSION, "series": series, "start": start}, indent=2)
+    _replace_atomically(path, lambda f: np.save(f, data))
+    _replace_atomically(sidecar_path(path), lambda f: f.write(meta.encode("utf-8")))
+
+
+@lru_cache(maxsize=4)
+def load_returns(path: str | None = None) -> ReturnSeries:
+    """Open (once per process) and validate the memory-mapped dataset."""
+    path = path or RETURNS_PATH
+    try:
+        data = np.load(path, mmap_mode="r")
+        with open(sidecar_path(path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ReturnsDatasetError(f"Returns dataset unavailable: {e}") from e
+    if meta.get("format") != FORMAT_VERSION:
+        raise ReturnsDatasetError(f"Unsupported dataset format: {meta.get('format')}")
+    series = tuple(meta.get("series") or ())
+    validate_array(data, series)
+    stat = os.stat(path)
+    version = hashlib.sha256(
+        json.dumps([meta, list(data.shape), stat.st_size, stat.st_mtime_ns]).encode("utf-8")
+    ).hexdigest()[:16]
+    return ReturnSeries(
+        path=path,
+        data=data,
+        series=series,
+        start=meta.get("start"),
+        means=data.mean(axis=0, dtype=np.float64),
+        stds=data.std(axis=0, dtype=np.float64),
+        version=version,
+    )
+
+
+def dataset_version(path: str | None = None) -> str:
+    """Fingerprint of the dataset, for cache keys (raises ReturnsDatasetError)."""
+    return load_returns(path).version
+
+
+def bootstrap_shocks(
+    rng: np.random.Generator,
+    paths: int,
+    months: int,
+    series: str | None = None,
+    block_months: int = BOOTSTRAP_BLOCK_MONTHS,
+    path: str | None = None,
+) -> np.ndarray:
+    """
+    (paths, months) standardized shocks from a circular block bootstrap: each
+    path concatenates random `block_months` runs of consecutive history.
+    """
+    dataset = load_returns(path)
+    col = dataset.column(series)
+    n = dataset.months
+    blocks = math.ceil(months / block_months) if months else 0
+    starts = rng.integers(0, n, size=(paths, blocks))
+    idx = (starts[:, :, None] + np.arange(block_months)) % n
+    idx = idx.reshape(paths, blocks * block_months)[:, :months]
+    return (dataset.data[idx, col] - dataset.means[col]) / dataset.stds[col]
@@ -0,0 +1,109 @@
+"""Per-user insights cache with stale-while-revalidate.
+
+Insights are stored per user with the fingerprint of the figures they were
+generated from. An entry older than FRESH_SECONDS, or built from different
+figures, is still served at once while refresh() regenerates it on the shared
+AI executor. Each user has at most one refresh in flight per worker, and a
+worker runs at most MAX_CONCURRENT_REFRESHES of them. Entries live in Valkey
+(so every worker sees them) with a per-process LRU copy for when Valkey is
+unreachable; both expire after MAX_AGE_SECONDS.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services import ai_executor, single_flight
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "insights:cache"
+FRESH_SECONDS = int(os.environ.get("INSIGHTS_FRESH_SECONDS", "900"))
+MAX_AGE_SECONDS = 24 * 3600
+MAX_CONCURRENT_REFRESHES = int(os.environ.get("INSIGHTS_MAX_REFRESHES", "2"))
+LOCAL_MAX_ENTRIES = 1024
+
+_local = OrderedDict()
+# Reentrant: a refresh that finishes before add_done_callback runs its callback inline
+_lock = threading.RLock()
+_refreshing = {}
+_refresh_slots = threading.BoundedSemaphore(MAX_CONCURRENT_REFRESHES)
+
+
+def _key(user_id: int) -> str:
+    return f"{CACHE_PREFIX}:{user_id}"
+
+
+def get(user_id: int) -> dict | None:
+    """{"insights": [...], "version": str, "at": epoch seconds} or None."""
+    r = get_redis()
+    if r:
+        try:
+            text = r.get(_key(user_id))
+            if text is not None:
+                return json.loads(text)
+        except Exception as e:
+            logger.debug("Insights cache read failed: %s", e)
+    with _lock:
+        entry = _local.get(user_id)
+    if entry is not None and time.time() - entry["at"] < MAX_AGE_SECONDS:
+        return entry
+    return None
+
+
+def put(user_id: int, insights: list, version: str) -> None:
+    entry = {"insights": insights, "version": version, "at": time.time()}
+    with _lock:
+        _local[user_id] = entry
+        _local.move_to_end(user_id)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+    r = get_redis()
+    if r:
+        try:
+            r.setex(_key(user_id), MAX_AGE_SECONDS, json.dumps(entry))
+        except Exception as e:
+            logger.debug("Insights cache write failed: %s", e)
+
+
+def is_stale(entry: dict, version: str) -> bool:
+    return entry.get("version") != version or time.time() - entry.get("at", 0) >= FRESH_SECONDS
+
+
+def _regenerate(user_id: int, version: str, compute) -> list:
+    # Workers refreshing the same user at once share one LLM call
+    insights = single_flight.run(single_flight.flight_key(user_id, "insights", version), compute)
+    if insights:
+        put(user_id, insights, version)
+    return insights or []
+
+
+def refresh(user_id: int, version: str, compute):
+    """
+    Regenerate `user_id`'s insights with `compute()` in the background. Returns
+    the Future (shared with a refresh already in flight for this user), or None
+    if the refresh cap or the AI executor is full.
+    """
+    with _lock:
+        future = _refreshing.get(user_id)
+        if future is not None:
+            return future
+        if not _refresh_slots.acquire(blocking=False):
+            return None
+        future = ai_executor.submit(_regenerate, user_id, version, compute)
+        if future is None:
+            _refresh_slots.release()
+            return None
+        _refreshing[user_id] = future
+
+        def _done(f):
+            with _lock:
+                if _refreshing.get(user_id) is f:
+                    del _refreshing[user_id]
+            _refresh_slots.release()
+
+        future.add_done_callback(_done)
+        return future
@@ -1,8 +1,9 @@
 """Parse invoice PDF/image using Gemini vision. Extract structured data."""
-import os
 import json
 import re
 
+from app.services.llm_gateway import gemini_api_key, gemini_generate
+
 
 def parse_invoice_with_gemini(file_content: bytes, file_name: str) -> dict | None:
     """
@@ -10,13 +11,11 @@ def parse_invoice_with_gemini(file_content: bytes, file_name: str) -> dict | Non
     Returns dict with: amount, due_date, merchant, line_items (list of {description, amount}).
     Returns None if API key not set or parsing fails.
     """
-    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or os.environ.get("BACKBOARD_API_KEY")
-    if not api_key:
+    if not gemini_api_key():
         return None
     try:
-        from google import genai
         from google.genai import types
-        client = genai.Client(api_key=api_key)
+
         fn = (file_name or "").lower()
         if fn.endswith(".pdf"):
             mime = "application/pdf"
@@ -31,11 +30,10 @@ def parse_invoice_with_gemini(file_content: bytes, file_name: str) -> dict | Non
             "Amount should be the total in USD. If no amount found, use null."
         )
         contents = [
-            types.Part.from_text(prompt),
+            types.Part.from_text(text=prompt),
             types.Part.from_bytes(data=file_content, mime_type=mime),
         ]
-        response = client.models.generate_content(model="gemini-1.5-flash", contents=contents)
-        text = (response.text or "").strip()
+        text = gemini_generate(contents) or ""
         text = re.sub(r"^```(?:json)?\s*", "", text)
         text = re.sub(r"\s*```$", "", text)
         return json.loads(text)
@@ -0,0 +1,140 @@
+"""Content-addressed cache for deterministic LLM tasks.
+
+Portfolio allocation, project descriptions, spending analysis and the What-If
+coach are pure functions of their prompt and the user's data, so their answers
+are cached in Valkey under a hash of (task, system prompt, normalized user
+prompt, model, user data version). Values are zlib-compressed JSON (base64,
+since the Valkey client decodes responses) with a per-task TTL. Only successful
+answers are stored; a request with `Cache-Control: no-cache` recomputes and
+refreshes the entry. Without Valkey every lookup is a miss.
+"""
+import base64
+import hashlib
+import json
+import logging
+import re
+import threading
+import zlib
+
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "llm:cache"
+STATS_KEY = "llm:cache:stats"
+# Bump to invalidate every entry when prompts or parsing change
+CACHE_VERSION = 1
+TASK_TTL_SECONDS = {
+    "allocation": 24 * 3600,
+    "description": 7 * 24 * 3600,
+    "spending_analysis": 6 * 3600,
+    "coach": 3600,
+}
+DEFAULT_TTL_SECONDS = 3600
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share an entry."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def data_version(*parts) -> str:
+    """Fingerprint of the user data a prompt was built from."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def cache_key(task: str, system_prompt: str, user_prompt: str, model: str, version: str = "") -> str:
+    payload = json.dumps(
+        {
+            "v": CACHE_VERSION,
+            "task": task,
+            "system": normalize_prompt(system_prompt),
+            "user": normalize_prompt(user_prompt),
+            "model": model,
+            "data": version,
+        },
+        sort_keys=True,
+    )
+    return f"{CACHE_PREFIX}:{task}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]}"
+
+
+def bypass_requested(headers) -> bool:
+    """True when the client sent Cache-Control: no-cache / no-store."""
+    directives = (headers.get("Cache-Control") or "").lower()
+    return "no-cache" in directives or "no-store" in directives
+
+
+def _encode(value) -> str:
+    return base64.b64encode(zlib.compress(json.dumps(value).encode("utf-8"))).decode("ascii")
+
+
+def _decode(text: str):
+    return json.loads(zlib.decompress(base64.b64decode(text)))
+
+
+def _record(task: str, outcome: str) -> None:
+    with _stats_lock:
+        counts = _stats.setdefault(task, {"hit": 0, "miss": 0, "bypass": 0})
+        counts[outcome] += 1
+    r = get_redis()
+    if not r:
+        return
+    try:
+        r.hincrby(STATS_KEY, f"{task}:{outcome}", 1)
+    except Exception:
+        pass
+
+
+def cached(task: str, system_prompt: str, user_prompt: str, model: str, compute, version: str = "", bypass: bool = False, store_if=None):
+    """
+    Return (value, cache_info). On a miss (or bypass) `compute()` runs and its
+    JSON-serializable result is stored when `store_if(value)` is true (default:
+    any non-None value), with the task's TTL.
+    """
+    key = cache_key(task, system_prompt, user_prompt, model, version)
+    r = get_redis()
+    if r and not bypass:
+        try:
+            text = r.get(key)
+        except Exception as e:
+            logger.debug("LLM cache read failed: %s", e)
+            text = None
+        if text is not None:
+            try:
+                value = _decode(text)
+            except Exception:
+                value = None
+            if value is not None:
+                _record(task, "hit")
+                return value, {"hit": True}
+
+    _record(task, "bypass" if bypass else "miss")
+    value = compute()
+    if value is not None and (store_if is None or store_if(value)) and r:
+        try:
+            r.setex(key, TASK_TTL_SECONDS.get(task, DEFAULT_TTL_SECONDS), _encode(value))
+        except Exception as e:
+            logger.debug("LLM cache write failed: %s", e)
+    return value, {"hit": False}
+
+
+def stats() -> dict:
+    """Per-task hit/miss/bypass counters for this process and, when reachable, the cluster."""
+    with _stats_lock:
+        local = {task: dict(c) for task, c in _stats.items()}
+    out = {"process": local, "cluster": None}
+    r = get_redis()
+    if r:
+        try:
+            cluster = {}
+            for field, value in (r.hgetall(STATS_KEY) or {}).items():
+                task, _, outcome = field.rpartition(":")
+                cluster.setdefault(task, {})[outcome] = int(value)
+            out["cluster"] = cluster
+        except Exception:
+            pass
+    return out
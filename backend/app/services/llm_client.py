@@ -2,7 +2,7 @@ import json
 import os
 from typing import Any, Dict, List, Optional
 
-import requests
+from app.services.llm_gateway import GEMINI_MODEL, gemini_api_key, gemini_generate, groq_chat
 
 
 def _groq_api_key() -> Optional[str]:
@@ -15,6 +15,7 @@ def groq_chat_completion(
   model: Optional[str] = None,
   max_tokens: int = 1024,
   temperature: float = 0.4,
+  timeout: Optional[float] = None,
 ) -> Optional[str]:
   """
   Minimal Groq chat completion client using the OpenAI-compatible API.
@@ -26,19 +27,15 @@ def groq_chat_completion(
     return None
   model_name = model or os.environ.get("GROQ_MODEL") or "llama-3.1-8b-instant"
   try:
-    resp = requests.post(
-      "https://api.groq.com/openai/v1/chat/completions",
-      headers={
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-      },
-      json={
+    resp = groq_chat(
+      api_key,
+      {
         "model": model_name,
         "messages": messages,
         "max_tokens": max_tokens,
         "temperature": temperature,
       },
-      timeout=60,
+      timeout=timeout,
     )
     if not resp.ok:
       return None
@@ -59,6 +56,7 @@ def json_from_groq(
   model: Optional[str] = None,
   max_tokens: int = 1024,
   temperature: float = 0.3,
+  timeout: Optional[float] = None,
 ) -> Any:
   """
   Helper for JSON-structured responses from Groq.
@@ -73,10 +71,16 @@ def json_from_groq(
     model=model,
     max_tokens=max_tokens,
     temperature=temperature,
+    timeout=timeout,
   )
   if not content:
     return None
-  text = content.strip()
+  return parse_json_text(content)
+
+
+def parse_json_text(content: str) -> Any:
+  """Parse a model's JSON answer, tolerating ``` / ```json fences. None if invalid."""
+  text = (content or "").strip()
   # Handle fenced code blocks, if any
   if text.startswith("```"):
     text = text.lstrip("`")
@@ -90,3 +94,28 @@ def json_from_groq(
   except Exception:
     return None
 
+
+def _gemini_api_key() -> Optional[str]:
+  """Return the Gemini API key from env (GEMINI_API_KEY / GOOGLE_API_KEY / BACKBOARD_API_KEY), if present."""
+  return gemini_api_key()
+
+
+def json_from_gemini(
+  system_prompt: str,
+  user_prompt: str,
+  model: str = GEMINI_MODEL,
+  timeout: Optional[float] = None,
+) -> Any:
+  """
+  Helper for JSON-structured responses from Gemini.
+
+  Returns parsed JSON (dict / list) or None on error / missing key.
+  """
+  text = gemini_generate(
+    system_prompt + "\n\n" + user_prompt + "\n\nRespond with a single JSON object only, no markdown.",
+    model=model,
+    timeout=timeout,
+  )
+  if not text:
+    return None
+  return parse_json_text(text)
@@ -0,0 +1,456 @@
+"""Shared gateway for the AI providers (Backboard, Groq, Gemini).
+
+Every outbound LLM call goes through here so connections are reused: each
+provider gets one keep-alive `requests.Session` per process (Gemini: one
+`google.genai.Client`, which keeps its own httpx pool), with the same timeouts
+and retry policy everywhere. Retries use exponential backoff with full jitter.
+Idempotent methods retry any connection error and 429/502/503/504. POST and
+PATCH retry only when the provider says it did not take the request (429/503)
+or the connection never got as far as sending it (connect timeout, refused,
+DNS), so a generation or upload is not run twice because its response got
+lost. Each request feeds the provider's circuit breaker
+(app.services.circuit_breaker); while it is open, request() raises CircuitOpen
+(a ConnectionError) without touching the network. Response shapes that vary
+between Backboard endpoints are normalized by message_text() / document_id().
+
+Clients belong to the worker that created them: they are dropped in a forked
+child (gunicorn --preload) and rebuilt there, and warm() builds the Gemini
+client and opens its connection when a worker starts serving (app.warm_up) so
+the first request does not pay for the google.genai import and TLS handshake.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from app.services import circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get("LLM_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT_SECONDS = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "2"))
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_BACKOFF_MAX_SECONDS = 8.0
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# A 502/504 may come back after the upstream already ran the request
+UNSENT_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Keep-alive connections per provider host (>= concurrent requests per worker)
+POOL_SIZE = int(os.environ.get("LLM_POOL_SIZE", "16"))
+
+BACKBOARD_API_BASE = "https://app.backboard.io/api"
+BACKBOARD_INGEST_URL = "https://api.backboard.io/v1/documents"
+GROQ_API_BASE = "https://api.groq.com/openai/v1"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+_sessions = {}
+_gemini_clients = {}
+_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    """Never share pooled sockets with a parent process."""
+    global _lock
+    _lock = threading.Lock()
+    _sessions.clear()
+    _gemini_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def session(provider: str) -> requests.Session:
+    """The process-wide keep-alive session for `provider`."""
+    s = _sessions.get(provider)
+    if s is None:
+        with _lock:
+            s = _sessions.get(provider)
+            if s is None:
+                s = requests.Session()
+                # Retries are handled in request() so they get jitter and stay POST-safe
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+                _sessions[provider] = s
+    return s
+
+
+def _timeout(timeout):
+    """(connect, read) timeout; a bare number is the read timeout."""
+    if timeout is None:
+        return (CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS)
+    if isinstance(timeout, (int, float)):
+        return (min(CONNECT_TIMEOUT_SECONDS, timeout), timeout)
+    return timeout
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry `attempt` (0-based)."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+def _unsent(e: requests.exceptions.RequestException) -> bool:
+    """True if the request failed while connecting, i.e. before any byte was sent."""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def request(provider: str, method: str, url: str, timeout=None, retries: int | None = None, **kwargs) -> requests.Response:
+    """
+    Send one HTTP request on the provider's pooled session. Returns the final
+    response (callers check .ok); raises the last requests exception if every
+    attempt failed to connect, or CircuitOpen if the provider's breaker is open.
+    """
+    circuit_breaker.guard(provider)
+    retries = MAX_RETRIES if retries is None else retries
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    statuses = RETRY_STATUSES if idempotent else UNSENT_STATUSES
+    s = session(provider)
+    started = time.monotonic()
+    for attempt in range(retries + 1):
+        try:
+            r = s.request(method, url, timeout=_timeout(timeout), **kwargs)
+        except requests.exceptions.RequestException as e:
+            retryable = isinstance(e, requests.exceptions.ConnectionError) and (idempotent or _unsent(e))
+            if not retryable or attempt >= retries:
+                circuit_breaker.record(provider, False, time.monotonic() - started)
+                raise
+            logger.info("%s %s connection failed (%s), retrying", provider, method, e)
+        else:
+            if r.status_code not in statuses or attempt >= retries:
+                ok = r.status_code < 500 and r.status_code != 429
+                circuit_breaker.record(provider, ok, time.monotonic() - started)
+                return r
+            logger.info("%s %s returned %s, retrying", provider, method, r.status_code)
+            r.close()
+        time.sleep(_backoff(attempt))
+
+
+def response_json(r: requests.Response):
+    """Parsed JSON body, or {} when the body is not JSON."""
+    try:
+        return r.json()
+    except ValueError:
+        return {}
+
+
+def error_detail(r: requests.Response) -> str:
+    """Provider error message from a non-2xx JSON body, or ''."""
+    out = response_json(r)
+    if isinstance(out, dict):
+        msg = out.get("detail") or out.get("error") or out.get("message")
+        if isinstance(msg, str):
+            return msg
+    return ""
+
+
+def message_text(out) -> str | None:
+    """Assistant text from a Backboard message response, whichever shape it uses."""
+    if not isinstance(out, dict):
+        return None
+    content = out.get("content") or out.get("text") or out.get("response")
+    if content:
+        return content
+    msg = out.get("message")
+    if not msg and out.get("messages"):
+        msg = out["messages"][-1]
+    if isinstance(msg, dict):
+        return msg.get("content") or msg.get("text") or msg.get("response")
+    return None
+
+
+def document_id(out) -> str | None:
+    """Document id from a Backboard ingest response."""
+    if not isinstance(out, dict):
+        return None
+    return out.get("id") or out.get("document_id")
+
+
+# Backboard
+
+
+def backboard_base_url() -> str:
+    return (os.environ.get("BACKBOARD_API_BASE") or BACKBOARD_API_BASE).rstrip("/")
+
+
+def backboard_create_assistant(api_key: str, name: str, system_prompt: str) -> requests.Response:
+    return request(
+        "backboard",
+        "POST",
+        f"{backboard_base_url()}/assistants",
+        headers={"X-API-Key": api_key},
+        json={"name": name, "system_prompt": system_prompt},
+        timeout=30,
+    )
+
+
+def backboard_create_thread(api_key: str, assistant_id: str) -> requests.Response:
+    return request(
+        "backboard",
+        "POST",
+        f"{backboard_base_url()}/assistants/{assistant_id}/threads",
+        headers={"X-API-Key": api_key},
+        json={},
+        timeout=30,
+    )
+
+
+def backboard_send_message(api_key: str, thread_id: str, content: str, **fields) -> requests.Response:
+    """POST a message (multipart form, stream=false unless overridden) to a thread."""
+    data = {"stream": "false", **fields}
+    return request(
+        "backboard",
+        "POST",
+        f"{backboard_base_url()}/threads/{thread_id}/messages",
+        headers={"X-API-Key": api_key},
+        data=data,
+        files=[("content", (None, content))],
+        timeout=60,
+    )
+
+
+def backboard_stream_message(api_key: str, thread_id: str, content: str, **fields) -> requests.Response:
+    """POST a message with stream=true; read the body with backboard_stream_events()."""
+    return request(
+        "backboard",
+        "POST",
+        f"{backboard_base_url()}/threads/{thread_id}/messages",
+        headers={"X-API-Key": api_key, "Accept": "text/event-stream"},
+        data={**fields, "stream": "true"},
+        files=[("content", (None, content))],
+        timeout=60,
+        stream=True,
+    )
+
+
+def backboard_stream_events(r: requests.Response):
+    """
+    Normalize a streamed Backboard message into ("token", text) pieces, then one
+    ("done", {"text": full text, "action": ...}), or ("error", message). Accepts
+    SSE `data:` frames or NDJSON; a plain JSON body (stream not honoured) is
+    replayed as a single token.
+    """
+    if "application/json" in r.headers.get("Content-Type", ""):
+        out = response_json(r)
+        text = message_text(out) or ""
+        if text:
+            yield "token", text
+        yield "done", {"text": text, "action": out.get("action") if isinstance(out, dict) else None}
+        return
+    r.encoding = r.encoding or "utf-8"
+    parts, action, final_text = [], None, None
+    for line in r.iter_lines(decode_unicode=True):
+        if not line or line.startswith((":", "event:", "id:", "retry:")):
+            continue
+        if line.startswith("data:"):
+            line = line[5:].strip()
+        if line == "[DONE]":
+            break
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(event, dict):
+            continue
+        kind = str(event.get("type") or event.get("event") or "").lower()
+        if event.get("action") is not None:
+            action = event["action"]
+        if "error" in kind:
+            yield "error", str(event.get("error") or event.get("message") or event.get("detail") or "stream error")
+            return
+        if kind.endswith(("complete", "completed", "end", "ended", "done")):
+            final_text = message_text(event) or final_text
+            continue
+        piece = event.get("delta") or event.get("content") or event.get("text")
+        if isinstance(piece, str) and piece:
+            parts.append(piece)
+            yield "token", piece
+    if not parts and final_text:
+        yield "token", final_text
+    yield "done", {"text": "".join(parts) or final_text or "", "action": action}
+
+
+def backboard_completion(prompt: str, api_key: str, assistant_name: str, system_prompt: str) -> str | None:
+    """One-shot Backboard completion on a pre-created pooled thread (one request when warm); text or None."""
+    from app.services.backboard_threads import lease_thread
+
+    try:
+        with lease_thread(api_key, assistant_name, system_prompt) as lease:
+            if lease is None:
+                return None
+            try:
+                r = backboard_send_message(api_key, lease.thread_id, prompt)
+            except requests.exceptions.RequestException:
+                # The message may still land on the thread; never hand it to another prompt
+                lease.discard()
+                raise
+            if not r.ok:
+                lease.discard()
+                logger.warning("Backboard messages failed: %s %s", r.status_code, (r.text or "")[:400])
+                return None
+        out = response_json(r)
+        text = message_text(out)
+        if not text:
+            logger.warning(
+                "Backboard returned 200 but no content. Keys: %s",
+                list(out.keys()) if isinstance(out, dict) else type(out).__name__,
+            )
+        return text
+    except requests.exceptions.RequestException as e:
+        logger.warning("Backboard completion failed: %s", e)
+        return None
+
+
+def backboard_ingest(api_key: str, file_name: str, content: bytes, content_type: str | None = None, fields=None) -> requests.Response:
+    """Upload a document to the Backboard documents API."""
+    url = os.environ.get("BACKBOARD_INGEST_URL") or BACKBOARD_INGEST_URL
+    file_part = (file_name, content, content_type) if content_type else (file_name, content)
+    return request(
+        "backboard",
+        "POST",
+        url,
+        headers={"Authorization": f"Bearer {api_key}"},
+        files={"file": file_part},
+        data=fields or {},
+        timeout=30,
+    )
+
+
+# Groq
+
+
+def groq_chat(api_key: str, payload: dict, timeout=None) -> requests.Response:
+    """POST an OpenAI-compatible chat completion to Groq."""
+    return request(
+        "groq",
+        "POST",
+        f"{GROQ_API_BASE}/chat/completions",
+        headers={"Authorization": f"Bearer {api_key}"},
+        json=payload,
+        timeout=timeout,
+    )
+
+
+# Gemini
+
+
+def gemini_api_key() -> str | None:
+    """Gemini API key from env (GEMINI_API_KEY / GOOGLE_API_KEY / BACKBOARD_API_KEY), if present."""
+    return os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or os.environ.get("BACKBOARD_API_KEY")
+
+
+def gemini_client(api_key: str | None = None):
+    """Process-wide google.genai Client per key (reuses its HTTP pool), or None without a key."""
+    api_key = api_key or gemini_api_key()
+    if not api_key:
+        return None
+    client = _gemini_clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _gemini_clients.get(api_key)
+            if client is None:
+                from google import genai
+                from google.genai import types
+
+                client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        timeout=int(READ_TIMEOUT_SECONDS * 1000),
+                        retry_options=types.HttpRetryOptions(
+                            attempts=MAX_RETRIES + 1,
+                            initial_delay=RETRY_BACKOFF_SECONDS,
+                            max_delay=RETRY_BACKOFF_MAX_SECONDS,
+                            jitter=1.0,
+                            http_status_codes=sorted(UNSENT_STATUSES),
+                        ),
+                    ),
+                )
+                _gemini_clients[api_key] = client
+    return client
+
+
+def _gemini_config(timeout: float | None):
+    """Per-call config overriding the client's read timeout (seconds), or None for the default."""
+    if timeout is None:
+        return None
+    from google.genai import types
+
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+
+def _gemini_client_for_call():
+    """gemini_client(), or None if it cannot be built (missing or incompatible google-genai)."""
+    try:
+        return gemini_client()
+    except Exception as e:
+        logger.warning("Gemini client unavailable: %s", e)
+        return None
+
+
+def gemini_generate(contents, model: str = GEMINI_MODEL, timeout: float | None = None) -> str | None:
+    """
+    Text of a Gemini generate_content call, or None on error / missing key /
+    open breaker. `timeout` (seconds) defaults to READ_TIMEOUT_SECONDS.
+    """
+    client = _gemini_client_for_call()
+    if client is None or not circuit_breaker.allow("gemini"):
+        return None
+    started = time.monotonic()
+    try:
+        response = client.models.generate_content(model=model, contents=contents, config=_gemini_config(timeout))
+    except Exception as e:
+        circuit_breaker.record("gemini", False, time.monotonic() - started)
+        logger.warning("Gemini generate_content failed: %s", e)
+        return None
+    circuit_breaker.record("gemini", True, time.monotonic() - started)
+    return (response.text or "").strip() or None
+
+
+async def gemini_generate_async(contents, model: str = GEMINI_MODEL, timeout: float | None = None) -> str | None:
+    """Async gemini_generate() on the same client, with the same timeout and breaker semantics."""
+    client = _gemini_client_for_call()
+    if client is None or not circuit_breaker.allow("gemini"):
+        return None
+    timeout = READ_TIMEOUT_SECONDS if timeout is None else timeout
+    started = time.monotonic()
+    try:
+        response = await asyncio.wait_for(
+            client.aio.models.generate_content(model=model, contents=contents, config=_gemini_config(timeout)),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        circuit_breaker.record("gemini", False, time.monotonic() - started)
+        logger.warning("Gemini generate_content (async) timed out after %ss", timeout)
+        return None
+    except Exception as e:
+        circuit_breaker.record("gemini", False, time.monotonic() - started)
+        logger.warning("Gemini generate_content (async) failed: %s", e)
+        return None
+    circuit_breaker.record("gemini", True, time.monotonic() - started)
+    return (response.text or "").strip() or None
+
+
+def warm() -> None:
+    """Build the Gemini client and open its connection in the background (once per worker)."""
+
+    def _warm():
+        try:
+            client = gemini_client()
+            if client is not None:
+                # Cheap metadata call: pays for DNS + TLS now instead of on the first user request
+                client.models.get(model=GEMINI_MODEL)
+        except Exception as e:
+            logger.info("Gemini warm-up failed: %s", e)
+
+    threading.Thread(target=_warm, name="gemini-warm", daemon=True).start()
@@ -0,0 +1,147 @@
+"""Hedged LLM calls: race Groq and Gemini, keep the first valid answer.
+
+The preferred provider starts first; each backup starts LLM_HEDGE_DELAY
+seconds later (0 = all at once), or as soon as every running call has failed.
+The first response that passes the caller's validator wins and the rest are
+cancelled (calls already in flight are abandoned; their results are ignored).
+Per-provider calls, wins, failures and latencies are counted in-process and,
+when reachable, cluster-wide in Valkey.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.services import circuit_breaker
+from app.services.llm_client import _gemini_api_key, _groq_api_key, json_from_gemini, json_from_groq
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "llm:hedge:stats"
+HEDGE_DELAY_SECONDS = float(os.environ.get("LLM_HEDGE_DELAY", "1.5"))
+HEDGE_TIMEOUT_SECONDS = float(os.environ.get("LLM_HEDGE_TIMEOUT", "20"))
+HEDGE_WORKERS = int(os.environ.get("LLM_HEDGE_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _record(provider: str, outcome: str, latency: float | None = None) -> None:
+    """Count one call outcome ("win", "fail", "cancelled") and its latency."""
+    with _stats_lock:
+        s = _stats.setdefault(provider, {"calls": 0, "win": 0, "fail": 0, "cancelled": 0, "latency_ms": 0.0, "timed": 0})
+        s["calls"] += 1
+        s[outcome] += 1
+        if latency is not None:
+            s["latency_ms"] += latency * 1000
+            s["timed"] += 1
+    r = get_redis()
+    if not r:
+        return
+    try:
+        pipe = r.pipeline()
+        pipe.hincrby(STATS_KEY, f"{provider}:calls", 1)
+        pipe.hincrby(STATS_KEY, f"{provider}:{outcome}", 1)
+        if latency is not None:
+            pipe.hincrbyfloat(STATS_KEY, f"{provider}:latency_ms", latency * 1000)
+            pipe.hincrby(STATS_KEY, f"{provider}:timed", 1)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def _summarize(raw: dict) -> dict:
+    out = {}
+    for provider, s in raw.items():
+        calls = s.get("calls", 0)
+        out[provider] = {
+            "calls": calls,
+            "wins": s.get("win", 0),
+            "failures": s.get("fail", 0),
+            "cancelled": s.get("cancelled", 0),
+            "win_rate": s.get("win", 0) / calls if calls else 0.0,
+            "avg_latency_ms": s.get("latency_ms", 0.0) / s["timed"] if s.get("timed") else None,
+        }
+    return out
+
+
+def stats() -> dict:
+    """Per-provider win rates and latencies for this process and, when reachable, the cluster."""
+    with _stats_lock:
+        local = {k: dict(v) for k, v in _stats.items()}
+    out = {"process": _summarize(local), "cluster": None}
+    r = get_redis()
+    if r:
+        try:
+            cluster = {}
+            for field, value in (r.hgetall(STATS_KEY) or {}).items():
+                provider, _, name = field.rpartition(":")
+                cluster.setdefault(provider, {})[name] = float(value)
+            out["cluster"] = _summarize(cluster)
+        except Exception:
+            pass
+    return out
+
+
+def json_providers(system_prompt: str, user_prompt: str) -> list:
+    """
+    (name, call) pairs for every configured provider whose circuit breaker is
+    not open, preferred first: Groq when LLM_PROVIDER=groq, otherwise Gemini.
+    An empty list makes hedged_call() return (None, None) at once, so callers
+    go straight to their fallback.
+    """
+    calls = []
+    if _gemini_api_key() and not circuit_breaker.is_open("gemini"):
+        calls.append(("gemini", lambda: json_from_gemini(system_prompt, user_prompt, timeout=HEDGE_TIMEOUT_SECONDS)))
+    if _groq_api_key() and not circuit_breaker.is_open("groq"):
+        calls.append(("groq", lambda: json_from_groq(system_prompt, user_prompt, timeout=HEDGE_TIMEOUT_SECONDS)))
+    if (os.environ.get("LLM_PROVIDER") or "").lower().strip() == "groq":
+        calls.sort(key=lambda c: c[0] != "groq")
+    return calls
+
+
+def hedged_call(calls, validate, delay: float | None = None, timeout: float | None = None):
+    """
+    Race `calls` ((name, zero-arg callable) pairs in preference order) and return
+    (result, provider) for the first result where `validate(result)` is true,
+    or (None, None) if all fail or `timeout` seconds pass.
+    """
+    delay = HEDGE_DELAY_SECONDS if delay is None else max(delay, 0.0)
+    deadline = time.monotonic() + (timeout or HEDGE_TIMEOUT_SECONDS)
+    queue = list(calls)
+    pending = {}
+    next_launch = time.monotonic()
+    try:
+        while True:
+            now = time.monotonic()
+            if queue and (now >= next_launch or not pending):
+                name, fn = queue.pop(0)
+                pending[_executor.submit(fn)] = (name, now)
+                next_launch = now + delay
+                continue
+            if not pending or now >= deadline:
+                return None, None
+            wait_for = deadline - now
+            if queue:
+                wait_for = min(wait_for, next_launch - now)
+            done, _ = wait(pending, timeout=max(wait_for, 0.0), return_when=FIRST_COMPLETED)
+            for f in done:
+                name, started = pending.pop(f)
+                latency = time.monotonic() - started
+                try:
+                    result = f.result()
+                    valid = result is not None and validate(result)
+                except Exception as e:
+                    logger.debug("LLM provider %s failed: %s", name, e)
+                    result, valid = None, False
+                if valid:
+                    _record(name, "win", latency)
+                    return result, name
+                _record(name, "fail", latency)
+    finally:
+        for f, (name, _) in pending.items():
+            f.cancel()
+            _record(name, "cancelled")
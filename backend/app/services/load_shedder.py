@@ -0,0 +1,224 @@
+"""Adaptive load shedding of optional AI work.
+
+Every request is tagged with a route group (blueprint, or endpoint for the
+What-If scenario routes) and the worker tracks in-flight requests and a
+rolling p95 latency per group. Sync gunicorn workers hold one request each, so
+overload shows up as time spent in the listen backlog before Flask sees the
+request: the front proxy stamps X-Request-Start (the Vite proxy does; with
+nginx, `proxy_set_header X-Request-Start "t=${msec}";`) and that queue time
+counts toward every latency sample and has its own p95 objective. Pressure is
+the worst of queue p95 / QUEUE_SLO, p95 / SLO over the groups with enough
+samples, and (for threaded workers) in-flight / capacity. At pressure >= 1 the
+lowest-priority AI feature is shed, and each further SHED_STEP sheds the next
+one in SHED_ORDER (insights, then the What-If coach, then experiences): those
+routes answer from their deterministic fallback with `degraded: true` instead
+of calling an LLM, which keeps threads free for the core CRUD routes. The
+level rises as soon as pressure does and drops one step at a time after
+RECOVER_SECONDS of lower pressure. State is per worker, like the load it
+measures.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Lowest priority first
+SHED_ORDER = ("insights", "coach", "experiences")
+# Endpoint overrides, then blueprint name -> route group
+ENDPOINT_GROUPS = {
+    "whatif.scenario": "coach",
+    "whatif.scenario_stream": "coach",
+}
+BLUEPRINT_GROUPS = {
+    "insights": "insights",
+    "experiences": "experiences",
+    "transactions": "core",
+    "bills": "core",
+    "goals": "core",
+}
+# p95 latency objectives per group (seconds); AI groups include the LLM round trip
+SLO_P95_SECONDS = {
+    "core": float(os.environ.get("SHED_CORE_P95_MS", "500")) / 1000,
+    "insights": 8.0,
+    "coach": 10.0,
+    "experiences": 25.0,
+}
+# p95 of the time requests wait before a worker picks them up
+QUEUE_SLO_SECONDS = float(os.environ.get("SHED_QUEUE_P95_MS", "250")) / 1000
+# Ignore request-start stamps further off than this (clock skew, bad header)
+MAX_QUEUE_SECONDS = 300
+# Requests one worker can carry at once: its gunicorn --threads. 0 disables the
+# check, which is the right setting for sync workers (always at most one).
+MAX_IN_FLIGHT = int(os.environ.get("SHED_MAX_IN_FLIGHT", "0"))
+SHED_STEP = 0.5
+WINDOW_SECONDS = 30
+MIN_SAMPLES = 20
+MAX_SAMPLES = 2000
+EVALUATE_EVERY_SECONDS = 1.0
+RECOVER_SECONDS = 10.0
+
+
+class _Group:
+    def __init__(self):
+        self.in_flight = 0
+        self.samples = deque(maxlen=MAX_SAMPLES)  # (finished_at, latency)
+
+    def p95(self, now: float) -> tuple[float | None, int]:
+        while self.samples and now - self.samples[0][0] > WINDOW_SECONDS:
+            self.samples.popleft()
+        n = len(self.samples)
+        if n < MIN_SAMPLES:
+            return None, n
+        latencies = sorted(latency for _, latency in self.samples)
+        return latencies[min(int(n * 0.95), n - 1)], n
+
+
+_lock = threading.Lock()
+_groups = {}
+_queue = _Group()
+_in_flight = 0
+_level = 0
+_pressure = 0.0
+_evaluated_at = 0.0
+_calm_since = None
+
+
+def group_for(endpoint: str | None, blueprint: str | None) -> str:
+    return ENDPOINT_GROUPS.get(endpoint or "") or BLUEPRINT_GROUPS.get(blueprint or "") or "other"
+
+
+def queue_seconds(header: str | None, now: float) -> float | None:
+    """Seconds since the proxy's X-Request-Start ("t=<epoch>", in s, ms or us), or None."""
+    if not header:
+        return None
+    value = header.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # Scale milliseconds / microseconds since the epoch down to seconds
+    while started > now * 100:
+        started /= 1000
+    queued = now - started
+    if not -1.0 < queued < MAX_QUEUE_SECONDS:
+        return None
+    return max(queued, 0.0)
+
+
+def _group(name: str) -> _Group:
+    grp = _groups.get(name)
+    if grp is None:
+        grp = _groups[name] = _Group()
+    return grp
+
+
+def _evaluate(now: float) -> None:
+    """Recompute pressure and the shed level (caller holds _lock)."""
+    global _level, _pressure, _evaluated_at, _calm_since
+    _evaluated_at = now
+    pressure = _in_flight / MAX_IN_FLIGHT if MAX_IN_FLIGHT > 0 else 0.0
+    queue_p95, _ = _queue.p95(now)
+    if queue_p95 is not None and QUEUE_SLO_SECONDS > 0:
+        pressure = max(pressure, queue_p95 / QUEUE_SLO_SECONDS)
+    for name, grp in _groups.items():
+        slo = SLO_P95_SECONDS.get(name)
+        p95, _ = grp.p95(now)
+        if slo and p95 is not None:
+            pressure = max(pressure, p95 / slo)
+    _pressure = pressure
+    target = 0 if pressure < 1.0 else min(1 + int((pressure - 1.0) / SHED_STEP), len(SHED_ORDER))
+    if target > _level:
+        logger.warning("Load shedding level %s -> %s (pressure %.2f)", _level, target, pressure)
+        _level, _calm_since = target, None
+    elif target < _level:
+        if _calm_since is None:
+            _calm_since = now
+        elif now - _calm_since >= RECOVER_SECONDS:
+            logger.info("Load shedding level %s -> %s (pressure %.2f)", _level, _level - 1, pressure)
+            _level, _calm_since = _level - 1, now
+    else:
+        _calm_since = None
+
+
+def should_shed(group: str) -> bool:
+    """True if `group` (one of SHED_ORDER) should serve its deterministic fallback right now."""
+    if group not in SHED_ORDER:
+        return False
+    now = time.monotonic()
+    with _lock:
+        if now - _evaluated_at >= EVALUATE_EVERY_SECONDS:
+            _evaluate(now)
+        return _level > SHED_ORDER.index(group)
+
+
+def _start() -> None:
+    global _in_flight
+    name = group_for(request.endpoint, request.blueprint)
+    started = time.monotonic()
+    queued = queue_seconds(request.headers.get("X-Request-Start"), time.time())
+    g.shed_group, g.shed_started, g.shed_queued = name, started, queued or 0.0
+    with _lock:
+        _in_flight += 1
+        _group(name).in_flight += 1
+        if queued is not None:
+            _queue.samples.append((started, queued))
+
+
+def _finish(exc=None) -> None:
+    global _in_flight
+    name = g.pop("shed_group", None)
+    started = g.pop("shed_started", None)
+    queued = g.pop("shed_queued", 0.0)
+    if name is None:
+        return
+    now = time.monotonic()
+    with _lock:
+        _in_flight -= 1
+        grp = _group(name)
+        grp.in_flight -= 1
+        # Latency as the client sees it: backlog wait plus handling
+        grp.samples.append((now, now - started + queued))
+
+
+def init_app(app) -> None:
+    """Track every request's group, in-flight count and latency."""
+    app.before_request(_start)
+    # teardown runs after streamed responses finish, so SSE routes count their full duration
+    app.teardown_request(_finish)
+
+
+def snapshot() -> dict:
+    """Current level, pressure, queue p95 and per-group in-flight / p95, for the admin endpoint."""
+    now = time.monotonic()
+    with _lock:
+        _evaluate(now)
+        queue_p95, queue_n = _queue.p95(now)
+        groups = {}
+        for name, grp in _groups.items():
+            p95, n = grp.p95(now)
+            groups[name] = {
+                "in_flight": grp.in_flight,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+                "samples": n,
+                "slo_p95_ms": round(SLO_P95_SECONDS[name] * 1000) if name in SLO_P95_SECONDS else None,
+            }
+        return {
+            "level": _level,
+            "shedding": list(SHED_ORDER[:_level]),
+            "pressure": round(_pressure, 3),
+            "in_flight": _in_flight,
+            "max_in_flight": MAX_IN_FLIGHT,
+            "queue": {
+                "p95_ms": round(queue_p95 * 1000) if queue_p95 is not None else None,
+                "samples": queue_n,
+                "slo_p95_ms": round(QUEUE_SLO_SECONDS * 1000),
+            },
+            "groups": groups,
+        }
@@ -0,0 +1,307 @@
+"""Process-pool execution service for what-if Monte Carlo runs.
+
+Simulations are CPU bound; running them inside a sync gunicorn worker blocks
+every other request that worker could serve. This module hands them to a
+per-worker process pool (created lazily, i.e. after gunicorn forks) with a
+bounded number of in-flight jobs and a per-job timeout. If the pool breaks
+(e.g. a process is OOM-killed), it is rebuilt and the job retried once within
+the same timeout; after that callers get SimulationBusy rather than the job
+running in the web worker.
+
+Large runs are split into seeding blocks (numpy SeedSequence children) spread
+across pool processes and merged with mergeable sketches, so a given `seed`
+yields bit-identical results however many processes take part.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from app.services.montecarlo import (
+    DEFAULT_BLOCK_SIZE,
+    block_sizes,
+    regime_keys,
+    run_blocks,
+    scenario_schedule,
+    simulate_regimes,
+    summarize_regimes,
+)
+from app.services.mc_sampling import simulate_sampled
+
+logger = logging.getLogger(__name__)
+
+POOL_WORKERS = int(os.environ.get("WHATIF_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_PENDING_JOBS = int(os.environ.get("WHATIF_POOL_MAX_PENDING", "8"))
+JOB_TIMEOUT_SECONDS = float(os.environ.get("WHATIF_JOB_TIMEOUT", "20"))
+# A broken pool is rebuilt and the job retried once; never run in the web worker
+POOL_ATTEMPTS = 2
+# Path counts above this are split into blocks and merged from sketches
+EXACT_MAX_SIMULATIONS = 5_000
+
+
+class SimulationBusy(RuntimeError):
+    """Raised when the pool already has MAX_PENDING_JOBS jobs in flight."""
+
+
+class SimulationTimeout(RuntimeError):
+    """Raised when a job does not finish within its timeout."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING_JOBS)
+
+
+def _get_pool():
+    global _pool
+    if POOL_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the parent is a threaded gunicorn worker holding DB/Redis sockets
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=ctx)
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def shutdown() -> None:
+    """Stop the pool (e.g. on worker exit)."""
+    _reset_pool()
+
+
+def _split(items: list, parts: int) -> list[list]:
+    """Round-robin `items` into at most `parts` non-empty lists."""
+    parts = max(1, min(parts, len(items)))
+    return [items[i::parts] for i in range(parts)]
+
+
+def _run_inline(
+    monthly_investment,
+    extra_loan_payment,
+    horizon_years,
+    regimes,
+    simulations,
+    seed,
+    sampling,
+    tolerance,
+    fan,
+    returns_model,
+):
+    """Same computation as the pool path, in the calling process (pool disabled)."""
+    if sampling != "standard" or tolerance is not None:
+        return simulate_sampled(
+            monthly_investment,
+            extra_loan_payment,
+            horizon_years,
+            regimes,
+            simulations,
+            sampling,
+            tolerance,
+            seed=seed,
+            fan=fan,
+            returns_model=returns_model,
+        )
+    if simulations <= EXACT_MAX_SIMULATIONS:
+        return simulate_regimes(
+            monthly_investment,
+            extra_loan_payment,
+            horizon_years,
+            regimes,
+            simulations,
+            seed=seed,
+            fan=fan,
+            returns_model=returns_model,
+        )
+    months = horizon_years * 12
+    keys, params = regime_keys(regimes)
+    entropy = np.random.SeedSequence(seed).entropy
+    blocks = list(enumerate(block_sizes(simulations, DEFAULT_BLOCK_SIZE)))
+    summaries = run_blocks(
+        monthly_investment, extra_loan_payment, months, params, entropy, blocks, fan, returns_model
+    )
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    return summarize_regimes(summaries, keys, params, schedule, horizon_years)
+
+
+def _release_when_done(futures) -> None:
+    """Free one slot once every future has finished, even after the caller gave up on them."""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def _done(_future):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                _slots.release()
+
+    for f in futures:
+        f.add_done_callback(_done)
+
+
+def _run_on_pool(submit, timeout: float | None) -> list:
+    """
+    Run `submit(pool)` (which returns the job's futures) under one queue slot and
+    return their results. A pool that is unavailable or breaks mid-job (e.g. a
+    process was OOM-killed) is rebuilt and the job retried once within the same
+    deadline; it never falls back to running in the web worker. Raises
+    SimulationBusy / SimulationTimeout.
+    """
+    deadline = time.monotonic() + (timeout or JOB_TIMEOUT_SECONDS)
+    for attempt in range(POOL_ATTEMPTS):
+        if not _slots.acquire(blocking=False):
+            raise SimulationBusy("Too many simulations in progress")
+        try:
+            futures = submit(_get_pool())
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            _slots.release()
+            logger.warning("Simulation pool unavailable (attempt %s): %s", attempt + 1, e)
+            _reset_pool()
+            continue
+        _release_when_done(futures)
+        done, pending = wait(futures, timeout=max(deadline - time.monotonic(), 0.0))
+        if pending:
+            for f in pending:
+                f.cancel()
+            raise SimulationTimeout("Simulation timed out")
+        try:
+            return [f.result() for f in futures]
+        except BrokenProcessPool as e:
+            logger.warning("Simulation pool broke (attempt %s): %s", attempt + 1, e)
+            _reset_pool()
+        if time.monotonic() >= deadline:
+            raise SimulationTimeout("Simulation timed out")
+    raise SimulationBusy("Simulation pool unavailable")
+
+
+def run_job(fn, *args, timeout: float | None = None, **kwargs):
+    """
+    Run one picklable `fn(*args, **kwargs)` on the pool under the same queue
+    depth, timeout and retry rules as run_regimes (SimulationBusy /
+    SimulationTimeout). Runs inline only when the pool is disabled.
+    """
+    if POOL_WORKERS <= 0:
+        return fn(*args, **kwargs)
+    return _run_on_pool(lambda pool: [pool.submit(fn, *args, **kwargs)], timeout)[0]
+
+
+def run_regimes(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    seed=None,
+    timeout: float | None = None,
+    sampling: str = "standard",
+    tolerance: float | None = None,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+) -> dict:
+    """
+    Run a multi-regime simulation on the process pool; returns {regime: result}.
+
+    Up to EXACT_MAX_SIMULATIONS paths run as one exact job. Larger runs are
+    split into DEFAULT_BLOCK_SIZE seeding blocks across the pool and merged.
+    A non-standard `sampling` mode or a `tolerance` (adaptive stopping) runs
+    as one mc_sampling job. `fan` adds per-month p10/p50/p90 bands;
+    `returns_model="bootstrap"` draws shocks from the historical dataset.
+    Raises SimulationBusy when the queue is full or the pool is still broken
+    after one rebuild, and SimulationTimeout after `timeout` seconds (default
+    JOB_TIMEOUT_SECONDS). Runs inline only when the pool is disabled
+    (WHATIF_POOL_WORKERS=0).
+    """
+    if seed is None:
+        # Fix the entropy up front so every block of this job shares it
+        seed = np.random.SeedSequence().entropy
+    job = (
+        monthly_investment,
+        extra_loan_payment,
+        horizon_years,
+        regimes,
+        simulations,
+        seed,
+        sampling,
+        tolerance,
+        fan,
+        returns_model,
+    )
+    if POOL_WORKERS <= 0:
+        return _run_inline(*job)
+
+    months = horizon_years * 12
+    keys, params = regime_keys(regimes)
+    single = sampling != "standard" or tolerance is not None or simulations <= EXACT_MAX_SIMULATIONS
+
+    def submit(pool):
+        if sampling != "standard" or tolerance is not None:
+            return [
+                pool.submit(
+                    simulate_sampled,
+                    monthly_investment,
+                    extra_loan_payment,
+                    horizon_years,
+                    keys,
+                    simulations,
+                    sampling,
+                    tolerance,
+                    seed=seed,
+                    fan=fan,
+                    returns_model=returns_model,
+                )
+            ]
+        if simulations <= EXACT_MAX_SIMULATIONS:
+            return [
+                pool.submit(
+                    simulate_regimes,
+                    monthly_investment,
+                    extra_loan_payment,
+                    horizon_years,
+                    keys,
+                    simulations,
+                    None,
+                    seed,
+                    fan,
+                    returns_model,
+                )
+            ]
+        entropy = np.random.SeedSequence(seed).entropy
+        blocks = list(enumerate(block_sizes(simulations, DEFAULT_BLOCK_SIZE)))
+        return [
+            pool.submit(
+                run_blocks,
+                monthly_investment,
+                extra_loan_payment,
+                months,
+                params,
+                entropy,
+                part,
+                fan,
+                returns_model,
+            )
+            for part in _split(blocks, POOL_WORKERS)
+        ]
+
+    # One slot per job, freed only once every part has finished (even after a
+    # timeout), so abandoned work still counts against the queue depth
+    results = _run_on_pool(submit, timeout)
+    if single:
+        return results[0]
+    summaries = results[0]
+    for part in results[1:]:
+        for merged, other in zip(summaries, part):
+            merged.merge(other)
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    return summarize_regimes(summaries, keys, params, schedule, horizon_years)
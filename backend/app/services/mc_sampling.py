@@ -0,0 +1,222 @@
+"""Variance-reduced sampling and adaptive stopping for the what-if Monte Carlo.
+
+Paths are drawn in independent replicate batches (each with its own seed
+child, or its own Sobol scramble), so the spread of the per-batch p50 gives an
+honest standard error for every mode, including the variance-reduced ones:
+
+  standard         plain pseudo-random normals
+  antithetic       each batch pairs every draw z with -z
+  sobol            scrambled Sobol points mapped through the normal inverse CDF;
+                   every replicate is a full power-of-two block
+  control_variate  pseudo-random normals; paths are reweighted (regression
+                   estimator) so the first-order shock response of the
+                   investment leg matches its known mean of zero. The weights
+                   apply to the percentiles, the histogram and the drawdown
+
+`simulations` is the path count: it is split into at least MIN_BATCHES
+near-equal batches of at most BATCH_SIZE paths (Sobol rounds up to whole
+power-of-two blocks, under one block more). With a `tolerance`, batches of
+the same size keep being added until the p50 standard error is below
+`tolerance * |p50|` (or the path budget runs out).
+"""
+import math
+
+import numpy as np
+
+from app.services.montecarlo import (
+    FAN_PROBS,
+    draw_shocks,
+    fan_rows,
+    investment_paths,
+    max_drawdowns,
+    monthly_params,
+    regime_keys,
+    regime_params,
+    scenario_schedule,
+    summarize_terminal,
+    weighted_percentiles,
+)
+from app.services.quantile_sketch import FanSketch
+
+SAMPLING_MODES = ("standard", "antithetic", "sobol", "control_variate")
+# Modes that transform Gaussian draws and so cannot run on bootstrapped history
+GAUSSIAN_ONLY_MODES = ("antithetic", "sobol")
+# Largest replicate batch (a power of two, as Sobol replicates must be to stay balanced)
+BATCH_SIZE = 512
+# Fewer replicates make the batch standard error itself too noisy to stop on
+MIN_BATCHES = 4
+ADAPTIVE_MAX_SIMULATIONS = 32_768
+
+
+def batch_normals(
+    seed_seq: np.random.SeedSequence, paths: int, months: int, sampling: str, returns_model: str = "gaussian"
+) -> np.ndarray:
+    """One replicate batch of (paths, months) shocks (standard normal unless bootstrapped)."""
+    rng = np.random.default_rng(seed_seq)
+    if returns_model != "gaussian":
+        return draw_shocks(rng, paths, months, returns_model)
+    if sampling == "antithetic":
+        half = rng.standard_normal(((paths + 1) // 2, months))
+        return np.concatenate([half, -half])[:paths]
+    if sampling == "sobol":
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+
+        if paths < 2 or paths & (paths - 1):
+            raise ValueError(f"Sobol replicates need a power-of-two size, got {paths}")
+        engine = qmc.Sobol(d=months, scramble=True, seed=rng)
+        u = engine.random_base2(paths.bit_length() - 1)
+        # Keep the inverse CDF finite at the unit-cube edges
+        return ndtri(np.clip(u, 1e-12, 1 - 1e-12))
+    return rng.standard_normal((paths, months))
+
+
+def replicate_sizes(simulations: int, sampling: str = "standard") -> list[int]:
+    """
+    Near-equal batch sizes summing to `simulations`: at least MIN_BATCHES, each
+    at most BATCH_SIZE. For Sobol, equal power-of-two batches (the largest that
+    still gives MIN_BATCHES) covering `simulations` with less than one to spare.
+    """
+    if sampling == "sobol":
+        size = min(1 << (max(math.ceil(simulations / MIN_BATCHES), 2).bit_length() - 1), BATCH_SIZE)
+        return [size] * max(math.ceil(simulations / size), MIN_BATCHES)
+    batches = max(MIN_BATCHES, math.ceil(simulations / BATCH_SIZE))
+    batches = max(min(batches, simulations), 1)
+    base, extra = divmod(max(simulations, 1), batches)
+    return [base + 1] * extra + [base] * (batches - extra)
+
+
+def control_coefficients(flow: np.ndarray, monthly_drift: float, monthly_vol: float) -> np.ndarray:
+    """
+    First-order sensitivity of the terminal investment balance to each month's
+    shock, around the deterministic path. `shocks @ coefficients` has mean zero
+    and tracks the terminal balance much more closely than a control built on
+    the balance itself.
+    """
+    months = flow.shape[0]
+    expected = investment_paths(flow, np.full((1, months), monthly_drift))[0]
+    opening = np.concatenate(([0.0], expected[:-1]))
+    growth = (1.0 + monthly_drift) ** np.arange(months - 1, -1, -1)
+    return monthly_vol * opening * growth
+
+
+def control_variate_weights(control: np.ndarray, control_mean: float) -> np.ndarray:
+    """
+    Linear control-variate weights: sum to one and reproduce `control_mean`
+    exactly, clipped at zero (and renormalized) so they can weight a quantile.
+    """
+    n = control.shape[0]
+    dx = control - control.mean()
+    ss = float(np.dot(dx, dx))
+    if n == 0 or ss <= 0:
+        return np.full(n, 1.0 / max(n, 1))
+    w = 1.0 / n + (control_mean - control.mean()) * dx / ss
+    w = np.clip(w, 0.0, None)
+    return w / w.sum()
+
+
+def _p50(ends: np.ndarray, weights: np.ndarray | None) -> float:
+    if weights is None:
+        return float(np.percentile(ends, 50))
+    return weighted_percentiles(ends, weights, [0.5])["p50"]
+
+
+def simulate_sampled(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    sampling: str = "standard",
+    tolerance: float | None = None,
+    max_simulations: int = ADAPTIVE_MAX_SIMULATIONS,
+    seed=None,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+) -> dict:
+    """
+    Multi-regime simulation with a sampling mode and optional adaptive stopping.
+
+    Without `tolerance`, runs `simulations` paths (see replicate_sizes for Sobol).
+    With it, adds batches of the same size, up to `max_simulations` paths, until
+    every regime's p50 standard error is at most `tolerance * |p50|`. Each result carries a "sampling" block with
+    the mode, paths used and the achieved p50 standard error. With `fan`, the
+    per-month band is streamed through a FanSketch (unweighted).
+    """
+    if sampling not in SAMPLING_MODES:
+        raise ValueError(f"Unknown sampling mode: {sampling}")
+    if returns_model != "gaussian" and sampling in GAUSSIAN_ONLY_MODES:
+        raise ValueError(f"Sampling mode {sampling} needs Gaussian returns")
+    months = horizon_years * 12
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    keys, params = regime_keys(regimes)
+    steps = [monthly_params(a, v) for a, v in params]
+    coefficients = [control_coefficients(schedule.flow, drift, vol) for drift, vol in steps]
+
+    ends = [[] for _ in params]
+    controls = [[] for _ in params]
+    drawdowns = [[] for _ in params]
+    batch_p50 = [[] for _ in params]
+    fans = [FanSketch(months) if fan else None for _ in params]
+
+    root = np.random.SeedSequence(seed)
+    sizes = replicate_sizes(simulations, sampling)
+    budget = max(simulations, max_simulations) if tolerance else sum(sizes)
+    stderr = [math.inf for _ in params]
+    batches = 0
+    used = 0
+    while used < budget:
+        if batches < len(sizes):
+            paths = sizes[batches]
+        else:
+            # Sobol blocks cannot be cut short
+            paths = sizes[0] if sampling == "sobol" else min(sizes[0], budget - used)
+        normals = batch_normals(root.spawn(1)[0], paths, months, sampling, returns_model)
+        used += paths
+        for i, (drift, vol) in enumerate(steps):
+            invest = investment_paths(schedule.flow, drift + vol * normals)
+            net_worth = invest - schedule.loan
+            batch_ends = net_worth[:, -1]
+            weights = None
+            if sampling == "control_variate":
+                control = normals @ coefficients[i]
+                weights = control_variate_weights(control, 0.0)
+                controls[i].append(control)
+            ends[i].append(batch_ends)
+            drawdowns[i].append(max_drawdowns(net_worth))
+            if fans[i] is not None:
+                fans[i].add(net_worth)
+            batch_p50[i].append(_p50(batch_ends, weights))
+        batches += 1
+        if batches < MIN_BATCHES:
+            continue
+        stderr = [float(np.std(b, ddof=1) / math.sqrt(len(b))) for b in batch_p50]
+        if tolerance is None:
+            continue
+        pooled = [_p50(np.concatenate(e), None) for e in ends]
+        if all(se <= tolerance * max(abs(p), 1.0) for se, p in zip(stderr, pooled)):
+            break
+
+    by_params = {}
+    for i, p in enumerate(params):
+        all_ends = np.concatenate(ends[i])
+        weights = None
+        if sampling == "control_variate":
+            weights = control_variate_weights(np.concatenate(controls[i]), 0.0)
+        result = summarize_terminal(
+            all_ends, np.concatenate(drawdowns[i]), schedule, horizon_years, p[0], p[1], weights=weights
+        )
+        if fans[i] is not None:
+            result["fan"] = fan_rows(fans[i].quantiles(FAN_PROBS))
+        p50 = result["percentiles"]["p50"]
+        result["sampling"] = {
+            "mode": sampling,
+            "adaptive": tolerance is not None,
+            "tolerance": tolerance,
+            "paths": int(all_ends.shape[0]),
+            "batches": batches,
+            "p50_stderr": stderr[i],
+            "p50_rel_error": stderr[i] / abs(p50) if p50 else None,
+        }
+        by_params[p] = result
+    return {k: dict(by_params[regime_params(k)]) for k in keys}
@@ -0,0 +1,571 @@
+"""Vectorized NumPy engine for the what-if Monte Carlo.
+
+Mirrors the loan / investment / liquidity structure of the original pure-Python
+loop in `app.routes.whatif`, but draws a `(simulations, months)` matrix of
+normal shocks up front and evaluates every path as array operations.
+"""
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from app.services.historical_returns import bootstrap_shocks
+from app.services.quantile_sketch import FanSketch, QuantileSketch, RunningMean
+
+# Mirrors the constants used by the frontend What-If model
+LOAN_PRINCIPAL = 10_000.0
+LOAN_MIN_PAYMENT = 250.0
+LOAN_ANNUAL_RATE = 0.10
+LIQUID_START = 3_000.0
+LIQUID_MONTHLY_GROWTH = 0.01
+LIQUID_MONTHLY_SPEND = 400.0
+MONTHLY_EXPENSES = 2_000.0
+LIQUIDITY_TARGET_MONTHS = 6.0
+INVEST_TO_LOAN_SHARE = 0.2
+HISTOGRAM_BUCKETS = 20
+# Per-month bands returned with `fan=True`
+FAN_PROBS = (0.1, 0.5, 0.9)
+
+# Canonical regime names understood by regime_params
+REGIMES = ("balanced", "bull", "bear", "high_vol", "crypto_winter")
+# Shock sources: i.i.d. Gaussian, or block bootstrap of historical returns
+RETURNS_MODELS = ("gaussian", "bootstrap")
+
+
+def regime_params(regime: str):
+    """Return (annual_return, annual_vol) for a given market regime."""
+    key = (regime or "").lower().strip()
+    if key in ("bull", "bull_cycle"):
+        return 0.15, 0.25
+    if key in ("bear", "bear_cycle"):
+        return -0.05, 0.35
+    if key in ("high_vol", "high_volatility"):
+        return 0.07, 0.40
+    if key in ("crypto_winter", "winter"):
+        return -0.15, 0.70
+    # balanced / default
+    return 0.07, 0.15
+
+
+def monthly_params(annual_return: float, annual_vol: float):
+    """Convert annualized drift/vol into the monthly (drift, vol) used per step."""
+    return (1 + annual_return) ** (1 / 12) - 1, annual_vol / math.sqrt(12)
+
+
+def draw_shocks(rng: np.random.Generator, paths: int, months: int, returns_model: str = "gaussian") -> np.ndarray:
+    """(paths, months) zero-mean, unit-variance shocks from `returns_model`."""
+    if returns_model == "bootstrap":
+        return bootstrap_shocks(rng, paths, months)
+    if returns_model != "gaussian":
+        raise ValueError(f"Unknown returns model: {returns_model}")
+    return rng.standard_normal((paths, months))
+
+
+def draw_normals(simulations: int, months: int, seed=None, returns_model: str = "gaussian") -> np.ndarray:
+    """Shock matrix of shape (simulations, months); standard normal unless bootstrapped."""
+    return draw_shocks(np.random.default_rng(seed), simulations, months, returns_model)
+
+
+def _first_month(mask: np.ndarray):
+    """1-based index of the first True entry, or None."""
+    idx = np.flatnonzero(mask)
+    return int(idx[0]) + 1 if idx.size else None
+
+
+def _recovery_month(buffer: np.ndarray):
+    """First month the buffer is back at target after having dipped below it."""
+    below = buffer < LIQUIDITY_TARGET_MONTHS
+    dipped = np.logical_or.accumulate(below)
+    # A month only counts as a recovery if the dip happened in an earlier month
+    dipped_before = np.concatenate(([False], dipped[:-1]))
+    return _first_month(dipped_before & ~below)
+
+
+@dataclass(frozen=True, eq=False)
+class ScenarioSchedule:
+    """
+    Deterministic legs of a scenario: they depend only on the contribution
+    inputs, never on the market draw, so they are computed once and shared
+    by every simulated path.
+    """
+
+    months: int
+    loan: np.ndarray  # loan balance after each month's payment
+    flow: np.ndarray  # contribution into investments each month
+    buffer: np.ndarray  # liquidity buffer in months of expenses
+    payoff_month: int | None
+    recovery_month: int | None
+
+    @property
+    def liquidity_end(self) -> float:
+        return float(self.buffer[-1]) if self.months else 0.0
+
+
+@lru_cache(maxsize=512)
+def scenario_schedule(monthly_investment: float, extra_loan_payment: float, months: int) -> ScenarioSchedule:
+    """Build (or reuse) the deterministic loan/liquidity schedule for these inputs."""
+    loan = np.empty(months)
+    flow = np.empty(months)
+    buffer = np.empty(months)
+    loan_balance = LOAN_PRINCIPAL
+    liquid_reserve = LIQUID_START
+    for m in range(months):
+        if loan_balance > 0:
+            payment = LOAN_MIN_PAYMENT + extra_loan_payment + INVEST_TO_LOAN_SHARE * monthly_investment
+        else:
+            payment = 0.0
+        flow[m] = max(monthly_investment + (payment if loan_balance <= 0 else 0.0), 0.0)
+        if loan_balance > 0:
+            interest = loan_balance * (LOAN_ANNUAL_RATE / 12)
+            loan_balance = max(loan_balance - max(payment - interest, 0.0), 0.0)
+        loan[m] = loan_balance
+        liquid_reserve = max(
+            liquid_reserve * (1 + LIQUID_MONTHLY_GROWTH)
+            + monthly_investment * INVEST_TO_LOAN_SHARE
+            - LIQUID_MONTHLY_SPEND,
+            0.0,
+        )
+        buffer[m] = liquid_reserve / MONTHLY_EXPENSES if liquid_reserve > 0 else 0.0
+    # Cached instances are shared between requests; keep them read-only
+    for arr in (loan, flow, buffer):
+        arr.flags.writeable = False
+    return ScenarioSchedule(
+        months=months,
+        loan=loan,
+        flow=flow,
+        buffer=buffer,
+        payoff_month=_first_month(loan <= 0),
+        recovery_month=_recovery_month(buffer),
+    )
+
+
+def investment_paths(flow: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """Investment balance per path/month for monthly return matrix `returns`."""
+    growth = 1.0 + returns
+    balances = np.empty_like(returns)
+    balance = np.zeros(returns.shape[0])
+    for m in range(returns.shape[1]):
+        balance = balance * growth[:, m] + flow[m]
+        balances[:, m] = balance
+    return balances
+
+
+def max_drawdowns(net_worth: np.ndarray) -> np.ndarray:
+    """Largest peak-to-trough fall per path, measured against positive peaks only."""
+    peaks = np.maximum(np.maximum.accumulate(net_worth, axis=1), 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = np.where(peaks > 0, (peaks - net_worth) / peaks, 0.0)
+    return dd.max(axis=1) if dd.shape[1] else np.zeros(dd.shape[0])
+
+
+def histogram(values: np.ndarray, buckets: int = HISTOGRAM_BUCKETS, weights: np.ndarray | None = None) -> list[dict]:
+    """
+    Fixed-width histogram of terminal net worth, as returned by the API. With
+    `weights`, counts are the weighted share of the paths, rounded.
+    """
+    if values.size:
+        vmin, vmax = float(values.min()), float(values.max())
+    else:
+        vmin = vmax = 0.0
+    if vmax == vmin:
+        vmax = vmin + 1.0
+    width = (vmax - vmin) / buckets
+    idx = np.minimum(((values - vmin) / width).astype(int), buckets - 1)
+    if weights is None:
+        counts = np.bincount(idx, minlength=buckets)
+    else:
+        counts = np.rint(np.bincount(idx, weights=weights, minlength=buckets) * values.size / weights.sum())
+    return [
+        {"net_worth": vmin + (i + 0.5) * width, "count": int(c)}
+        for i, c in enumerate(counts)
+    ]
+
+
+def percentiles(values: np.ndarray, probs) -> dict:
+    """Linear-interpolated percentiles, matching statistics.quantiles(method="inclusive")."""
+    if not values.size:
+        return {f"p{int(p * 100)}": 0.0 for p in probs}
+    qs = np.percentile(values, [int(p * 100) for p in probs])
+    return {f"p{int(p * 100)}": float(q) for p, q in zip(probs, qs)}
+
+
+def weighted_percentiles(values: np.ndarray, weights: np.ndarray, probs) -> dict:
+    """Percentiles of a weighted sample (weights >= 0), interpolated between weight midpoints."""
+    if not values.size:
+        return {f"p{int(p * 100)}": 0.0 for p in probs}
+    order = np.argsort(values)
+    v, w = values[order], weights[order]
+    positions = (np.cumsum(w) - 0.5 * w) / w.sum()
+    return {f"p{int(p * 100)}": float(np.interp(p, positions, v)) for p in probs}
+
+
+def fan_rows(bands: np.ndarray) -> list[dict]:
+    """API shape for a (len(FAN_PROBS), months) band array: one row per month."""
+    keys = [f"p{int(p * 100)}" for p in FAN_PROBS]
+    return [
+        {"month": m + 1, **{k: float(v) for k, v in zip(keys, column)}}
+        for m, column in enumerate(bands.T)
+    ]
+
+
+def fan_chart(net_worth: np.ndarray) -> list[dict]:
+    """Per-month p10/p50/p90 of a (simulations, months) matrix, one column sort per month."""
+    if not net_worth.size:
+        return fan_rows(np.zeros((len(FAN_PROBS), net_worth.shape[1])))
+    return fan_rows(np.percentile(net_worth, [int(p * 100) for p in FAN_PROBS], axis=0))
+
+
+def summarize(
+    net_worth: np.ndarray,
+    schedule: ScenarioSchedule,
+    horizon_years: int,
+    annual_return: float,
+    annual_vol: float,
+    fan: bool = False,
+) -> dict:
+    """
+    Reduce a (simulations, months) net-worth matrix to the what-if response shape,
+    plus a per-month "fan" band when `fan` is set.
+    """
+    simulations = net_worth.shape[0]
+    net_worth_ends = net_worth[:, -1] if schedule.months else np.zeros(simulations)
+    result = summarize_terminal(
+        net_worth_ends, max_drawdowns(net_worth), schedule, horizon_years, annual_return, annual_vol
+    )
+    if fan:
+        result["fan"] = fan_chart(net_worth)
+    return result
+
+
+def summarize_terminal(
+    net_worth_ends: np.ndarray,
+    drawdowns: np.ndarray,
+    schedule: ScenarioSchedule,
+    horizon_years: int,
+    annual_return: float,
+    annual_vol: float,
+    weights: np.ndarray | None = None,
+) -> dict:
+    """
+    Response shape from terminal net worth and per-path max drawdown. Optional
+    per-path `weights` (e.g. control-variate weights) apply to the percentiles,
+    the histogram and the expected drawdown.
+    """
+    simulations = net_worth_ends.shape[0]
+    liquidity_end = schedule.liquidity_end
+    payoff_month = schedule.payoff_month
+    recovery_month = schedule.recovery_month
+
+    if weights is None:
+        pct = percentiles(net_worth_ends, [0.1, 0.5, 0.9])
+        drawdown = float(drawdowns.mean()) if simulations else 0.0
+    else:
+        pct = weighted_percentiles(net_worth_ends, weights, [0.1, 0.5, 0.9])
+        drawdown = float(np.average(drawdowns, weights=weights)) if simulations else 0.0
+    survival_prob = 0.0 if liquidity_end < LIQUIDITY_TARGET_MONTHS else 1.0
+    if not simulations:
+        survival_prob = 1.0
+
+    return {
+        "distribution": histogram(net_worth_ends, weights=weights),
+        "percentiles": {
+            "p10": pct["p10"],
+            "p50": pct["p50"],
+            "p90": pct["p90"],
+        },
+        "liquidity": {
+            "avg_months": liquidity_end if simulations else 0.0,
+            "p10_months": liquidity_end if simulations else 0.0,
+        },
+        "debt_freedom_years": payoff_month / 12.0 if payoff_month else float(horizon_years),
+        "survival_prob": survival_prob,
+        "recovery_years": recovery_month / 12.0 if recovery_month else 0.0,
+        "expected_max_drawdown": drawdown,
+        "assumptions": {
+            "annual_return": annual_return,
+            "annual_vol": annual_vol,
+            "simulations": simulations,
+            "horizon_years": horizon_years,
+        },
+    }
+
+
+def simulate(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    simulations: int = 500,
+    annual_return: float = 0.07,
+    annual_vol: float = 0.15,
+    normals: np.ndarray | None = None,
+    seed=None,
+    schedule: ScenarioSchedule | None = None,
+    fan: bool = False,
+) -> dict:
+    """
+    Run the what-if Monte Carlo over a full shock matrix.
+
+    `normals` may be passed in (shape `(simulations, months)`) so the same draws
+    can be replayed through the reference loop; otherwise they are drawn from `seed`.
+    Only the investment leg is simulated per path; the loan and liquidity legs
+    come from the memoized `scenario_schedule`.
+    """
+    months = horizon_years * 12
+    if normals is None:
+        normals = draw_normals(simulations, months, seed)
+    monthly_drift, monthly_vol = monthly_params(annual_return, annual_vol)
+
+    if schedule is None:
+        schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    invest = investment_paths(schedule.flow, monthly_drift + monthly_vol * normals)
+    return summarize(invest - schedule.loan, schedule, horizon_years, annual_return, annual_vol, fan=fan)
+
+
+def simulate_regimes(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    normals: np.ndarray | None = None,
+    seed=None,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+) -> dict:
+    """
+    Evaluate several market regimes against one shared shock matrix.
+
+    Every regime sees the same draws (common random numbers), so deltas between
+    them reflect the regime assumptions rather than sampling noise. All regimes
+    are stacked into a single investment pass. Returns {regime: result}.
+    """
+    months = horizon_years * 12
+    if normals is None:
+        normals = draw_normals(simulations, months, seed, returns_model)
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+
+    keys, params = regime_keys(regimes)
+    steps = np.array([monthly_params(a, v) for a, v in params])
+    returns = steps[:, 0, None, None] + steps[:, 1, None, None] * normals[None, :, :]
+    invest = investment_paths(schedule.flow, returns.reshape(-1, months))
+    net_worth = (invest - schedule.loan).reshape(len(params), simulations, months)
+
+    by_params = {
+        p: summarize(net_worth[i], schedule, horizon_years, p[0], p[1], fan=fan)
+        for i, p in enumerate(params)
+    }
+    # Shallow copies so callers can annotate one regime without touching its aliases
+    return {k: dict(by_params[regime_params(k)]) for k in keys}
+
+
+def simulate_grid(
+    investments,
+    extra_payments,
+    horizons,
+    simulations: int = 300,
+    annual_return: float = 0.07,
+    annual_vol: float = 0.15,
+    normals: np.ndarray | None = None,
+    seed=None,
+) -> list[dict]:
+    """
+    Evaluate a monthly_investment x extra_loan_payment x horizon_years grid in one
+    batched pass over a single shock matrix sized for the longest horizon.
+
+    Shorter horizons read the same paths at an earlier month, and every
+    contribution pair sees the same draws, so neighbouring cells differ only
+    by their inputs. Returns one summary dict per cell.
+    """
+    horizons = sorted(set(int(h) for h in horizons))
+    max_months = horizons[-1] * 12
+    if normals is None:
+        normals = draw_normals(simulations, max_months, seed)
+    monthly_drift, monthly_vol = monthly_params(annual_return, annual_vol)
+    growth = 1.0 + monthly_drift + monthly_vol * normals
+
+    pairs = [(float(i), float(e)) for i in investments for e in extra_payments]
+    schedules = [scenario_schedule(i, e, max_months) for i, e in pairs]
+    flows = np.stack([s.flow for s in schedules])
+    loans = np.stack([s.loan for s in schedules])
+
+    # Only terminal values at the requested horizons are kept: (pairs, horizons, sims)
+    checkpoints = {h * 12 - 1: j for j, h in enumerate(horizons)}
+    ends = np.empty((len(pairs), len(horizons), simulations))
+    balance = np.zeros((len(pairs), simulations))
+    for m in range(max_months):
+        balance = balance * growth[None, :, m] + flows[:, m, None]
+        j = checkpoints.get(m)
+        if j is not None:
+            ends[:, j, :] = balance - loans[:, m, None]
+
+    qs = np.percentile(ends, [10, 50, 90], axis=2) if simulations else np.zeros((3,) + ends.shape[:2])
+    cells = []
+    for p, ((inv, extra), sched) in enumerate(zip(pairs, schedules)):
+        for j, h in enumerate(horizons):
+            months = h * 12
+            payoff = sched.payoff_month if sched.payoff_month and sched.payoff_month <= months else None
+            cells.append({
+                "monthly_investment": inv,
+                "extra_loan_payment": extra,
+                "horizon_years": h,
+                "p10": float(qs[0, p, j]),
+                "p50": float(qs[1, p, j]),
+                "p90": float(qs[2, p, j]),
+                "survival_prob": 0.0 if sched.buffer[months - 1] < LIQUIDITY_TARGET_MONTHS else 1.0,
+                "debt_freedom_years": payoff / 12.0 if payoff else float(h),
+            })
+    return cells
+
+
+# Paths per block for the chunked executor; also the unit of seeding, so results
+# only depend on (seed, simulations), never on how blocks are scheduled.
+DEFAULT_BLOCK_SIZE = 2000
+
+
+class PathSummary:
+    """Mergeable reduction of simulated paths for one regime (optionally with a per-month fan)."""
+
+    def __init__(self, fan_months: int | None = None):
+        self.terminal = QuantileSketch()
+        self.drawdown = RunningMean()
+        self.fan = FanSketch(fan_months) if fan_months else None
+
+    def add(self, net_worth: np.ndarray, block: int = 0) -> None:
+        self.terminal.add(net_worth[:, -1])
+        self.drawdown.add(max_drawdowns(net_worth), block)
+        if self.fan is not None:
+            self.fan.add(net_worth)
+
+    def merge(self, other: "PathSummary") -> "PathSummary":
+        self.terminal.merge(other.terminal)
+        self.drawdown.merge(other.drawdown)
+        if self.fan is not None:
+            self.fan.merge(other.fan)
+        return self
+
+
+def block_rng(entropy, block: int) -> np.random.Generator:
+    """Independent generator for block `block` of a run seeded with `entropy`."""
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(block,)))
+
+
+def block_sizes(simulations: int, block_size: int = DEFAULT_BLOCK_SIZE) -> list[int]:
+    """Path counts per block: full blocks plus a final remainder."""
+    full, rest = divmod(simulations, block_size)
+    return [block_size] * full + ([rest] if rest else [])
+
+
+def run_blocks(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    months: int,
+    params,
+    entropy,
+    blocks,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+) -> list[PathSummary]:
+    """
+    Simulate the given `(block index, paths)` pairs for every (annual_return,
+    annual_vol) in `params`, holding at most one block of paths in memory.
+    Returns one PathSummary per entry of `params`.
+    """
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    steps = [monthly_params(a, v) for a, v in params]
+    summaries = [PathSummary(months if fan else None) for _ in params]
+    for block, paths in blocks:
+        normals = draw_shocks(block_rng(entropy, block), paths, months, returns_model)
+        for (drift, vol), summary in zip(steps, summaries):
+            invest = investment_paths(schedule.flow, drift + vol * normals)
+            summary.add(invest - schedule.loan, block)
+    return summaries
+
+
+def summarize_sketch(
+    summary: PathSummary,
+    schedule: ScenarioSchedule,
+    horizon_years: int,
+    annual_return: float,
+    annual_vol: float,
+) -> dict:
+    """Same response shape as summarize(), built from merged sketches."""
+    simulations = summary.terminal.count
+    extra = {"fan": fan_rows(summary.fan.quantiles(FAN_PROBS))} if summary.fan is not None else {}
+    p10, p50, p90 = summary.terminal.quantiles([0.1, 0.5, 0.9])
+    vmin, vmax, counts = summary.terminal.histogram(HISTOGRAM_BUCKETS)
+    width = (vmax - vmin) / HISTOGRAM_BUCKETS
+    liquidity_end = schedule.liquidity_end
+    payoff_month = schedule.payoff_month
+    recovery_month = schedule.recovery_month
+    survival_prob = 0.0 if liquidity_end < LIQUIDITY_TARGET_MONTHS else 1.0
+    if not simulations:
+        survival_prob = 1.0
+    return {
+        "distribution": [
+            {"net_worth": vmin + (i + 0.5) * width, "count": c} for i, c in enumerate(counts)
+        ],
+        "percentiles": {"p10": p10, "p50": p50, "p90": p90},
+        "liquidity": {
+            "avg_months": liquidity_end if simulations else 0.0,
+            "p10_months": liquidity_end if simulations else 0.0,
+        },
+        "debt_freedom_years": payoff_month / 12.0 if payoff_month else float(horizon_years),
+        "survival_prob": survival_prob,
+        "recovery_years": recovery_month / 12.0 if recovery_month else 0.0,
+        "expected_max_drawdown": summary.drawdown.mean,
+        "assumptions": {
+            "annual_return": annual_return,
+            "annual_vol": annual_vol,
+            "simulations": simulations,
+            "horizon_years": horizon_years,
+        },
+        **extra,
+    }
+
+
+def regime_keys(regimes) -> tuple[list[str], list[tuple[float, float]]]:
+    """Normalized regime names and their distinct (annual_return, annual_vol) pairs."""
+    keys = list(dict.fromkeys((r or "balanced").lower().strip() for r in regimes))
+    # Aliases ("bull" / "bull_cycle") share parameters; simulate each pair once
+    params = list(dict.fromkeys(regime_params(k) for k in keys))
+    return keys, params
+
+
+def summarize_regimes(summaries, keys, params, schedule: ScenarioSchedule, horizon_years: int) -> dict:
+    """Map merged PathSummary objects (one per params entry) back to {regime: result}."""
+    by_params = {
+        p: summarize_sketch(s, schedule, horizon_years, p[0], p[1]) for p, s in zip(params, summaries)
+    }
+    return {k: dict(by_params[regime_params(k)]) for k in keys}
+
+
+def simulate_regimes_chunked(
+    monthly_investment: float,
+    extra_loan_payment: float,
+    horizon_years: int,
+    regimes,
+    simulations: int = 500,
+    seed=None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    fan: bool = False,
+    returns_model: str = "gaussian",
+) -> dict:
+    """
+    Memory-bounded variant of simulate_regimes for large path counts.
+
+    Paths are simulated one block at a time (common random numbers across
+    regimes within each block) and reduced into mergeable sketches, so peak
+    memory is O(block_size x months) whatever `simulations` is. Percentiles and
+    the histogram are approximate to QuantileSketch's relative accuracy; the
+    optional per-month fan to FanSketch's.
+    """
+    months = horizon_years * 12
+    entropy = np.random.SeedSequence(seed).entropy
+    keys, params = regime_keys(regimes)
+    blocks = list(enumerate(block_sizes(simulations, block_size)))
+    summaries = run_blocks(
+        monthly_investment, extra_loan_payment, months, params, entropy, blocks, fan, returns_model
+    )
+    schedule = scenario_schedule(float(monthly_investment), float(extra_loan_payment), months)
+    return summarize_regimes(summaries, keys, params, schedule, horizon_years)
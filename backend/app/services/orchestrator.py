@@ -1,18 +1,34 @@
 """Multi-agent orchestrator: build context, route intent, call Backboard with system prompt and mode."""
 import logging
-import os
 import json
 from collections import defaultdict
 
+import requests
+
 from app import db
 from app.models import User
+from app.services import circuit_breaker, llm_cache, single_flight
+from app.services.assistant_registry import forget_assistant, resolve_assistant
 from app.services.backboard_ingest import build_user_financial_snapshot
+from app.services.llm_gateway import (
+    backboard_create_thread,
+    backboard_send_message,
+    backboard_stream_events,
+    backboard_stream_message,
+    error_detail,
+    message_text,
+    response_json,
+)
 from app.services.user_context import get_user_financial_history
 
 logger = logging.getLogger(__name__)
 
-# Cache assistant_id after first create (when BACKBOARD_ASSISTANT_ID is not set)
-_cached_assistant_id = None
+# Shared Backboard assistant (see assistant_registry) unless BACKBOARD_ASSISTANT_ID is set
+ASSISTANT_NAME = "Nightshade Financial"
+# finance_payload["portfolio_task"] values whose answers are deterministic enough to cache
+CACHEABLE_TASKS = ("allocation", "description", "spending_analysis")
+NO_KEY_TEXT = "Assistant is connected via Backboard (Gemini). Set BACKBOARD_API_KEY to enable."
+CIRCUIT_OPEN_TEXT = "Backboard unavailable: too many recent failures, retrying shortly."
 
 # Intent keywords for routing (optional; used for single-call with full context in v1)
 GOALS_KEYWORDS = ("goal", "goals", "saving", "saved", "target", "deadline", "progress")
@@ -299,25 +315,15 @@ def route_intent(message: str) -> list[str]:
     return list(dict.fromkeys(intents))  # dedupe order-preserving
 
 
-def chat(
+def _build_message(
     message: str,
     user_id: int,
-    api_key: str,
-    mode: str | None = None,
-    messages: list | None = None,
-    finance_payload: dict | None = None,
-    page: str | None = None,
-) -> dict:
-    """
-    Orchestrator entry: build context, build system prompt (with mode), call Backboard once.
-    Returns {"text": "...", "action": None} compatible with existing frontend.
-    """
-    global _cached_assistant_id
-    if not api_key:
-        return {
-            "text": "Assistant is connected via Backboard (Gemini). Set BACKBOARD_API_KEY to enable.",
-            "action": None,
-        }
+    mode: str | None,
+    messages: list | None,
+    finance_payload: dict | None,
+    page: str | None,
+) -> tuple[str, str, str]:
+    """(assistant base system prompt, full Backboard message with context, mode and history, user context)."""
     context = build_context(user_id)
     base_system = _base_system_prompt()
     portfolio_task = (finance_payload or {}).get("portfolio_task")
@@ -375,127 +381,212 @@ def chat(
         f"Latest user question: {message}"
         f"{finance_payload_text}"
     )
-    try:
-        import requests
-
-        base_url = os.environ.get("BACKBOARD_API_BASE", "https://app.backboard.io/api").rstrip("/")
-        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-
-        # 1) Get or create assistant
-        assistant_id = os.environ.get("BACKBOARD_ASSISTANT_ID") or _cached_assistant_id
-        if not assistant_id:
-            r = requests.post(
-                f"{base_url}/assistants",
-                headers=headers,
-                json={
-                    "name": "Nightshade Financial",
-                    "system_prompt": base_system + get_mode_system_append(mode or "balanced"),
-                },
-                timeout=(10, 30),
-            )
-            if not r.ok:
-                logger.warning("Backboard create assistant failed: status=%s body=%s", r.status_code, (r.text or "")[:500])
-                return {"text": f"Backboard unavailable: create assistant returned {r.status_code}.", "action": None}
-            data = r.json()
-            assistant_id = data.get("assistant_id")
-            if assistant_id:
-                _cached_assistant_id = assistant_id
-
-        if not assistant_id:
-            return {"text": "Backboard unavailable: no assistant id.", "action": None}
-
-        # 2) Get or create thread for user
-        user = User.query.get(user_id)
-        if not user:
-            return {"text": "User not found.", "action": None}
-        thread_id = user.backboard_thread_id
-        if not thread_id:
-            r = requests.post(
-                f"{base_url}/assistants/{assistant_id}/threads",
-                headers=headers,
-                json={},
-                timeout=(10, 30),
-            )
-            if not r.ok:
-                logger.warning("Backboard create thread failed: status=%s body=%s", r.status_code, (r.text or "")[:500])
-                return {"text": f"Backboard unavailable: create thread returned {r.status_code}.", "action": None}
-            thread_id = r.json().get("thread_id")
-            if thread_id:
-                user.backboard_thread_id = thread_id
-                db.session.commit()
-        if not thread_id:
-            return {"text": "Backboard unavailable: no thread id.", "action": None}
-
-        # 3) Send message (API expects multipart/form-data; web_search=Auto for current rates/context when relevant)
-        msg_headers = {"X-API-Key": api_key}
-        r = requests.post(
-            f"{base_url}/threads/{thread_id}/messages",
-            headers=msg_headers,
-            data={"stream": "false", "memory": "Auto", "web_search": "Auto"},
-            files=[("content", (None, full_message))],
-            timeout=(10, 60),
+    return base_system, full_message, context
+
+
+class ChatUnavailable(Exception):
+    """Backboard could not answer; the message is safe to show the user."""
+
+
+def _connection_hint(e: Exception) -> str:
+    if isinstance(e, circuit_breaker.CircuitOpen):
+        return CIRCUIT_OPEN_TEXT
+    err_str = str(e).lower()
+    if "resolve" in err_str or "name resolution" in err_str or "nodename" in err_str:
+        hint = (
+            "Cannot resolve app.backboard.io (DNS failure). "
+            "If using Docker, try: (1) Restart containers. (2) Ensure outbound DNS (8.8.8.8) works. "
+            "(3) Run backend outside Docker to test. "
+            "See README 'Backboard connection' for more."
         )
+    else:
+        hint = f"Backboard connection failed: {e}. Check network and BACKBOARD_API_BASE."
+    return f"Backboard unavailable: {hint}"
+
+
+def _replace_thread(api_key: str, assistant_id: str, base_system: str, user, stale: str | None = None) -> str:
+    """
+    Give `user` a Backboard thread in place of `stale` (None: no thread yet) and
+    return its id. Concurrent requests for the same user, on any worker, share
+    one create, so a racing request cannot overwrite the thread another one set.
+    """
+
+    def create():
+        db.session.refresh(user)
+        if user.backboard_thread_id and user.backboard_thread_id != stale:
+            return user.backboard_thread_id  # another request already replaced it
+        r = backboard_create_thread(api_key, assistant_id)
+        if r.status_code == 404:
+            forget_assistant(api_key, ASSISTANT_NAME, base_system)
         if not r.ok:
-            body_snippet = (r.text or "")[:500]
-            detail = ""
-            try:
-                err_json = r.json()
-                detail = (err_json.get("detail") or err_json.get("error") or err_json.get("message") or "").lower()
-            except Exception:
-                pass
-            if r.status_code == 404 and ("thread" in detail or "not found" in detail):
-                logger.info("Backboard thread not found (404), creating new thread and retrying")
-                user.backboard_thread_id = None
-                db.session.commit()
-                r_thread = requests.post(
-                    f"{base_url}/assistants/{assistant_id}/threads",
-                    headers=headers,
-                    json={},
-                    timeout=(10, 30),
-                )
-                if r_thread.ok:
-                    thread_id = r_thread.json().get("thread_id")
-                    if thread_id:
-                        user.backboard_thread_id = thread_id
-                        db.session.commit()
-                        r = requests.post(
-                            f"{base_url}/threads/{thread_id}/messages",
-                            headers=msg_headers,
-                            data={"stream": "false", "memory": "Auto", "web_search": "Auto"},
-                            files=[("content", (None, full_message))],
-                            timeout=(10, 60),
-                        )
-            if not r.ok:
-                logger.warning(
-                    "Backboard messages returned non-2xx: status=%s body=%s",
-                    r.status_code,
-                    (r.text or "")[:500],
-                )
-                user_hint = f"Backboard returned {r.status_code}. Check server logs for details."
-                try:
-                    err = r.json()
-                    msg = err.get("error") or err.get("message") or err.get("detail")
-                    if isinstance(msg, str) and msg:
-                        user_hint = f"Backboard returned {r.status_code}: {(msg[:100])}."
-                except Exception:
-                    pass
-                return {"text": user_hint, "action": None}
-        out = r.json()
-        content = out.get("content") or out.get("text") or out.get("response")
-        return {"text": content or "No response.", "action": out.get("action")}
+            logger.warning("Backboard create thread failed: status=%s body=%s", r.status_code, (r.text or "")[:500])
+            return {"error": f"Backboard unavailable: create thread returned {r.status_code}."}
+        thread_id = response_json(r).get("thread_id")
+        user.backboard_thread_id = thread_id
+        db.session.commit()
+        return thread_id
+
+    thread_id = single_flight.run(single_flight.flight_key(user.id, "backboard_thread", stale), create)
+    if isinstance(thread_id, dict):
+        raise ChatUnavailable(thread_id["error"])
+    if not thread_id:
+        raise ChatUnavailable("Backboard unavailable: no thread id.")
+    if user.backboard_thread_id != thread_id:
+        db.session.refresh(user)
+    return thread_id
+
+
+def _post_message(api_key: str, user_id: int, base_system: str, full_message: str, stream: bool = False):
+    """
+    Send `full_message` on the user's Backboard thread (creating it, or replacing
+    it on 404) and return the 2xx response. Raises ChatUnavailable otherwise.
+    """
+    send = backboard_stream_message if stream else backboard_send_message
+    if circuit_breaker.is_open("backboard"):
+        raise ChatUnavailable(CIRCUIT_OPEN_TEXT)
+
+    # 1) Shared assistant, created once per cluster; mode and intent instructions travel with each message
+    assistant_id = resolve_assistant(api_key, ASSISTANT_NAME, base_system)
+    if not assistant_id:
+        raise ChatUnavailable("Backboard unavailable: no assistant id.")
+
+    # 2) Get or create thread for user
+    user = User.query.get(user_id)
+    if not user:
+        raise ChatUnavailable("User not found.")
+    thread_id = user.backboard_thread_id or _replace_thread(api_key, assistant_id, base_system, user)
+
+    # 3) Send message (multipart/form-data; web_search=Auto for current rates/context when relevant)
+    r = send(api_key, thread_id, full_message, memory="Auto", web_search="Auto")
+    if r.ok:
+        return r
+    detail = error_detail(r).lower()
+    if r.status_code == 404 and ("thread" in detail or "not found" in detail):
+        logger.info("Backboard thread not found (404), creating new thread and retrying")
+        try:
+            thread_id = _replace_thread(api_key, assistant_id, base_system, user, stale=thread_id)
+        except ChatUnavailable:
+            thread_id = None
+        if thread_id:
+            r = send(api_key, thread_id, full_message, memory="Auto", web_search="Auto")
+            if r.ok:
+                return r
+    logger.warning(
+        "Backboard messages returned non-2xx: status=%s body=%s",
+        r.status_code,
+        (r.text or "")[:500],
+    )
+    msg = error_detail(r)
+    if msg:
+        raise ChatUnavailable(f"Backboard returned {r.status_code}: {(msg[:100])}.")
+    raise ChatUnavailable(f"Backboard returned {r.status_code}. Check server logs for details.")
+
+
+def chat(
+    message: str,
+    user_id: int,
+    api_key: str,
+    mode: str | None = None,
+    messages: list | None = None,
+    finance_payload: dict | None = None,
+    page: str | None = None,
+    bypass_cache: bool = False,
+) -> dict:
+    """
+    Orchestrator entry: build context, build system prompt (with mode), call Backboard once.
+    Returns {"text": "...", "action": None} compatible with existing frontend.
+    Portfolio tasks are answered from the LLM response cache while the prompt
+    and the user's data are unchanged (unless bypass_cache).
+    """
+    if not api_key:
+        return {"text": NO_KEY_TEXT, "action": None}
+    base_system, full_message, context = _build_message(message, user_id, mode, messages, finance_payload, page)
+    task = (finance_payload or {}).get("portfolio_task")
+    if task not in CACHEABLE_TASKS:
+        return _chat_once(api_key, user_id, base_system, full_message)[0]
+
+    failed = []
+
+    def compute():
+        out, ok = _chat_once(api_key, user_id, base_system, full_message)
+        if ok:
+            return out
+        failed.append(out)  # error replies are returned but never cached
+        return None
+
+    def cached():
+        out, _ = llm_cache.cached(
+            task,
+            base_system,
+            full_message,
+            f"backboard:{ASSISTANT_NAME}",
+            compute,
+            version=llm_cache.data_version(user_id, context),
+            bypass=bypass_cache,
+        )
+        return out if out is not None else failed[0]
+
+    # Duplicate requests (double-mounted pages, retries) wait for the first one's answer
+    return single_flight.run(single_flight.flight_key(user_id, task, full_message, bypass_cache), cached)
+
+
+def _chat_once(api_key: str, user_id: int, base_system: str, full_message: str) -> tuple[dict, bool]:
+    """One Backboard round trip: (reply, True if Backboard answered with text)."""
+    try:
+        r = _post_message(api_key, user_id, base_system, full_message)
+        out = response_json(r)
+        text = message_text(out)
+        return {"text": text or "No response.", "action": out.get("action") if isinstance(out, dict) else None}, bool(text)
+    except ChatUnavailable as e:
+        return {"text": str(e), "action": None}, False
     except requests.exceptions.ConnectionError as e:
         logger.warning("Backboard connection failed: %s", e)
-        err_str = str(e).lower()
-        if "resolve" in err_str or "name resolution" in err_str or "nodename" in err_str:
-            hint = (
-                "Cannot resolve app.backboard.io (DNS failure). "
-                "If using Docker, try: (1) Restart containers. (2) Ensure outbound DNS (8.8.8.8) works. "
-                "(3) Run backend outside Docker to test. "
-                "See README 'Backboard connection' for more."
-            )
-        else:
-            hint = f"Backboard connection failed: {e}. Check network and BACKBOARD_API_BASE."
-        return {"text": f"Backboard unavailable: {hint}", "action": None}
+        return {"text": _connection_hint(e), "action": None}, False
     except Exception as e:
         logger.exception("Backboard chat failed")
-        return {"text": f"Backboard unavailable: {e}", "action": None}
+        return {"text": f"Backboard unavailable: {e}", "action": None}, False
+
+
+def chat_stream(
+    message: str,
+    user_id: int,
+    api_key: str,
+    mode: str | None = None,
+    messages: list | None = None,
+    finance_payload: dict | None = None,
+    page: str | None = None,
+):
+    """
+    Streaming variant of chat(): yields ("token", {"text": piece}) as Backboard
+    streams the answer, then exactly one ("done", {"text": full text, "action": ...}),
+    the same shape chat() returns. Failures yield ("error", {"error": message})
+    before "done".
+    """
+    if not api_key:
+        yield "done", {"text": NO_KEY_TEXT, "action": None}
+        return
+    base_system, full_message, _ = _build_message(message, user_id, mode, messages, finance_payload, page)
+    streamed = []
+    try:
+        r = _post_message(api_key, user_id, base_system, full_message, stream=True)
+        with r:
+            for kind, payload in backboard_stream_events(r):
+                if kind == "token":
+                    streamed.append(payload)
+                    yield "token", {"text": payload}
+                elif kind == "done":
+                    yield "done", {"text": payload["text"] or "No response.", "action": payload["action"]}
+                    return
+                else:
+                    raise ChatUnavailable(f"Backboard unavailable: {payload}")
+        error = "Backboard unavailable: stream ended early."
+    except ChatUnavailable as e:
+        error = str(e)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Backboard stream failed: %s", e)
+        error = _connection_hint(e)
+    except Exception as e:
+        logger.exception("Backboard chat stream failed")
+        error = f"Backboard unavailable: {e}"
+    yield "error", {"error": error}
+    yield "done", {"text": "".join(streamed) or error, "action": None}
@@ -3,6 +3,8 @@ import json
 import logging
 import os
 
+from app.services.llm_gateway import backboard_completion
+
 logger = logging.getLogger(__name__)
 
 
@@ -11,79 +13,15 @@ def _call_backboard(prompt):
     api_key = os.environ.get("BACKBOARD_API_KEY", "")
     if not api_key:
         return None
-    try:
-        import requests
-
-        base_url = os.environ.get("BACKBOARD_API_BASE", "https://app.backboard.io/api").rstrip("/")
-        headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
-
-        assistant_id = os.environ.get("BACKBOARD_ASSISTANT_ID")
-        if not assistant_id:
-            r = requests.post(
-                f"{base_url}/assistants",
-                headers=headers,
-                json={
-                    "name": "Portfolio Advisor",
-                    "system_prompt": (
-                        "You are a financial portfolio advisor. You always respond with valid JSON. "
-                        "Never include markdown formatting or code fences in your response."
-                    ),
-                },
-                timeout=30,
-            )
-            if not r.ok:
-                logger.warning("Backboard create assistant failed: %s", r.status_code)
-                return None
-            assistant_id = r.json().get("assistant_id")
-
-        if not assistant_id:
-            return None
-
-        r = requests.post(
-            f"{base_url}/assistants/{assistant_id}/threads",
-            headers=headers,
-            json={},
-            timeout=30,
-        )
-        if not r.ok:
-            return None
-        thread_id = r.json().get("thread_id")
-        if not thread_id:
-            return None
-
-        msg_headers = {"X-API-Key": api_key}
-        r = requests.post(
-            f"{base_url}/threads/{thread_id}/messages",
-            headers=msg_headers,
-            data={"stream": "false"},
-            files=[("content", (None, prompt))],
-            timeout=60,
-        )
-        if not r.ok:
-            logger.warning("Backboard messages POST failed: status=%s body=%s", r.status_code, (r.text or "")[:400])
-            return None
-        out = r.json()
-        content = out.get("content") or out.get("text") or out.get("response")
-        if content:
-            return content
-        # Try nested shapes some APIs use
-        msg = out.get("message")
-        if not msg and out.get("messages"):
-            msgs = out.get("messages")
-            msg = msgs[-1] if msgs else {}
-        if isinstance(msg, dict):
-            content = msg.get("content") or msg.get("text") or msg.get("response")
-            if content:
-                return content
-        logger.warning(
-            "Backboard returned 200 but no content in response. Keys: %s. Snippet: %s",
-            list(out.keys()) if isinstance(out, dict) else type(out).__name__,
-            (str(out)[:300] if out else ""),
-        )
-        return None
-    except Exception as e:
-        logger.exception("Backboard call failed: %s", e)
-        return None
+    return backboard_completion(
+        prompt,
+        api_key,
+        assistant_name="Portfolio Advisor",
+        system_prompt=(
+            "You are a financial portfolio advisor. You always respond with valid JSON. "
+            "Never include markdown formatting or code fences in your response."
+        ),
+    )
 
 
 def _parse_json_response(text):
@@ -0,0 +1,237 @@
+"""Mergeable summaries for chunked Monte Carlo runs.
+
+Each simulated block of paths is reduced into small sketches whose state is
+plain counters, so blocks computed in any order, chunk size or process merge
+into exactly the same result.
+"""
+import math
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.005
+# Magnitudes below this are counted in the zero bucket
+MIN_INDEXABLE = 1e-6
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch (DDSketch-style log buckets).
+
+    Values are counted in logarithmic buckets of width `relative_accuracy`, one
+    store for positive and one for negative values. Quantiles are accurate to
+    within `relative_accuracy` of the true value, memory grows with the log of
+    the value range rather than the count, and merging two sketches just adds
+    bucket counts, so it is exact and order independent.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _bucket_counts(self, magnitudes: np.ndarray) -> dict:
+        idx = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(idx, return_counts=True)
+        return dict(zip(keys.tolist(), counts.tolist()))
+
+    @staticmethod
+    def _add_counts(store: dict, counts: dict) -> None:
+        for k, c in counts.items():
+            store[k] = store.get(k, 0) + c
+
+    def add(self, values) -> None:
+        """Add an array of values."""
+        values = np.asarray(values, dtype=float).ravel()
+        if not values.size:
+            return
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        pos = values[values >= MIN_INDEXABLE]
+        neg = -values[values <= -MIN_INDEXABLE]
+        self.zero += int(values.size - pos.size - neg.size)
+        if pos.size:
+            self._add_counts(self.positive, self._bucket_counts(pos))
+        if neg.size:
+            self._add_counts(self.negative, self._bucket_counts(neg))
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold `other` into this sketch (in place) and return self."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self._add_counts(self.positive, other.positive)
+        self._add_counts(self.negative, other.negative)
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def buckets(self):
+        """(representative value, count) pairs in ascending value order."""
+        out = [(-self._value(k), self.negative[k]) for k in sorted(self.negative, reverse=True)]
+        if self.zero:
+            out.append((0.0, self.zero))
+        out.extend((self._value(k), self.positive[k]) for k in sorted(self.positive))
+        return out
+
+    def quantiles(self, probs) -> list[float]:
+        """Approximate quantiles for probabilities in [0, 1], clamped to the exact min/max."""
+        if not self.count:
+            return [0.0 for _ in probs]
+        buckets = self.buckets()
+        out = []
+        for p in probs:
+            rank = p * (self.count - 1)
+            seen = 0
+            value = buckets[-1][0]
+            for v, c in buckets:
+                seen += c
+                if seen > rank:
+                    value = v
+                    break
+            out.append(min(max(value, self.min), self.max))
+        return out
+
+    def histogram(self, bins: int) -> tuple[float, float, list[int]]:
+        """Fixed-width histogram over [min, max] rebuilt from the bucket counts."""
+        vmin, vmax = (self.min, self.max) if self.count else (0.0, 0.0)
+        if vmax == vmin:
+            vmax = vmin + 1.0
+        width = (vmax - vmin) / bins
+        counts = [0] * bins
+        for v, c in self.buckets():
+            v = min(max(v, vmin), vmax)
+            counts[min(int((v - vmin) / width), bins - 1)] += c
+        return vmin, vmax, counts
+
+
+class RunningMean:
+    """
+    Count + sum accumulator keyed by block.
+
+    Partial sums are kept per block and added in block order when the mean is
+    read, so the result is bit-identical however blocks were split or merged.
+    """
+
+    def __init__(self):
+        self.partials = {}
+
+    def add(self, values, block: int = 0) -> None:
+        values = np.asarray(values, dtype=float).ravel()
+        count, total = self.partials.get(block, (0, 0.0))
+        self.partials[block] = (count + int(values.size), total + float(values.sum()))
+
+    def merge(self, other: "RunningMean") -> "RunningMean":
+        for block, (count, total) in other.partials.items():
+            c, t = self.partials.get(block, (0, 0.0))
+            self.partials[block] = (c + count, t + total)
+        return self
+
+    @property
+    def count(self) -> int:
+        return sum(c for c, _ in self.partials.values())
+
+    @property
+    def mean(self) -> float:
+        count = self.count
+        total = 0.0
+        for block in sorted(self.partials):
+            total += self.partials[block][1]
+        return total / count if count else 0.0
+
+
+# Fan charts only need chart resolution, which keeps the dense counts small
+FAN_RELATIVE_ACCURACY = 0.01
+# Magnitudes below FAN_MIN_VALUE count as zero; those above FAN_MAX_VALUE are clipped
+FAN_MIN_VALUE = 1.0
+FAN_MAX_VALUE = 1e12
+
+
+class FanSketch:
+    """
+    Per-column relative-error quantiles for a stream of (paths, columns) blocks.
+
+    Every column (month) gets its own log-bucket histogram, stored as one dense
+    (columns, buckets) count matrix so a whole block is added with a single
+    bincount. Like QuantileSketch, merging adds counts, so it is exact and order
+    independent; quantiles are within `relative_accuracy` of the true value
+    (clamped to each column's exact min/max).
+    """
+
+    def __init__(
+        self,
+        columns: int,
+        relative_accuracy: float = FAN_RELATIVE_ACCURACY,
+        min_value: float = FAN_MIN_VALUE,
+        max_value: float = FAN_MAX_VALUE,
+    ):
+        self.columns = columns
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self._min_index = math.ceil(math.log(min_value) / self._log_gamma)
+        self._max_index = math.ceil(math.log(max_value) / self._log_gamma)
+        # Signed bucket codes: 0 is the zero bucket, +k / -k the k-th magnitude bucket
+        self._half = self._max_index - self._min_index + 1
+        self.width = 2 * self._half + 1
+        # int32 halves what a pool worker ships back; per-bucket counts stay far below 2**31
+        self.counts = np.zeros((columns, self.width), dtype=np.int32)
+        self.count = 0
+        self.min = np.full(columns, math.inf)
+        self.max = np.full(columns, -math.inf)
+
+    def _codes(self, values: np.ndarray) -> np.ndarray:
+        magnitudes = np.abs(values)
+        with np.errstate(divide="ignore"):
+            idx = np.ceil(np.log(np.maximum(magnitudes, self.min_value)) / self._log_gamma)
+        idx = np.clip(idx, self._min_index, self._max_index).astype(np.int64)
+        codes = np.where(magnitudes < self.min_value, 0, np.sign(values).astype(np.int64) * (idx - self._min_index + 1))
+        return codes + self._half
+
+    def add(self, values: np.ndarray) -> None:
+        """Add a (paths, columns) block."""
+        if not values.size:
+            return
+        keys = self._codes(values) + np.arange(self.columns, dtype=np.int64) * self.width
+        self.counts += np.bincount(keys.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.count += int(values.shape[0])
+        self.min = np.minimum(self.min, values.min(axis=0))
+        self.max = np.maximum(self.max, values.max(axis=0))
+
+    def merge(self, other: "FanSketch") -> "FanSketch":
+        """Fold `other` into this sketch (in place) and return self."""
+        if other.counts.shape != self.counts.shape or other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge fan sketches with different shapes")
+        self.counts += other.counts
+        self.count += other.count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def _values(self, codes: np.ndarray) -> np.ndarray:
+        signed = codes - self._half
+        idx = np.abs(signed) + self._min_index - 1
+        return np.where(signed == 0, 0.0, np.sign(signed) * 2 * self.gamma ** idx / (self.gamma + 1))
+
+    def quantiles(self, probs) -> np.ndarray:
+        """(len(probs), columns) array of approximate per-column quantiles."""
+        if not self.count:
+            return np.zeros((len(probs), self.columns))
+        cumulative = np.cumsum(self.counts, axis=1)
+        out = []
+        for p in probs:
+            rank = p * (self.count - 1)
+            codes = np.argmax(cumulative > rank, axis=1)
+            out.append(np.clip(self._values(codes), self.min, self.max))
+        return np.array(out)
@@ -0,0 +1,142 @@
+"""Result cache for what-if simulations: in-process LRU in front of Valkey.
+
+Inputs are quantized before hashing so that near-identical slider positions
+share an entry, and the simulation seed is derived from the same hash so a miss
+recomputed on any gunicorn worker produces the same result.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from app.services.montecarlo import REGIMES
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "whatif:cache"
+STATS_KEY = "whatif:cache:stats"
+# Bump to invalidate every cached entry when the engine's output changes
+CACHE_VERSION = 1
+DEFAULT_TTL_SECONDS = int(os.environ.get("WHATIF_CACHE_TTL", "3600"))
+LOCAL_MAX_ENTRIES = int(os.environ.get("WHATIF_CACHE_LOCAL_SIZE", "256"))
+MONEY_STEP = 10.0
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+_local_stats = {"memory": 0, "valkey": 0, "miss": 0}
+
+
+def quantize_money(value: float, step: float = MONEY_STEP) -> float:
+    """Round a dollar amount to the nearest `step` (e.g. $10)."""
+    return float(round(float(value) / step) * step)
+
+
+def canonical_regime(regime: str | None) -> str:
+    """Collapse regime aliases that share parameters ("bull_cycle" -> "bull")."""
+    key = (regime or "balanced").lower().strip()
+    aliases = {
+        "bull_cycle": "bull",
+        "bear_cycle": "bear",
+        "high_volatility": "high_vol",
+        "winter": "crypto_winter",
+    }
+    key = aliases.get(key, key)
+    return key if key in REGIMES else "balanced"
+
+
+def quantize_scenario(monthly_investment: float, extra_loan_payment: float, horizon_years: int) -> dict:
+    """Quantized scenario inputs: $10 contribution steps, whole years."""
+    return {
+        "monthly_investment": quantize_money(monthly_investment),
+        "extra_loan_payment": quantize_money(extra_loan_payment),
+        "horizon_years": int(round(horizon_years)),
+    }
+
+
+def cache_key(namespace: str, params: dict) -> tuple[str, int]:
+    """Return (valkey key, derived 63-bit seed) for a namespace + quantized params."""
+    payload = json.dumps({"v": CACHE_VERSION, "ns": namespace, **params}, sort_keys=True)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{CACHE_PREFIX}:{namespace}:{digest[:32]}", int(digest[32:48], 16) >> 1
+
+
+def _local_get(key: str):
+    with _local_lock:
+        text = _local.get(key)
+        if text is not None:
+            _local.move_to_end(key)
+        return text
+
+
+def _local_put(key: str, text: str) -> None:
+    with _local_lock:
+        _local[key] = text
+        _local.move_to_end(key)
+        while len(_local) > LOCAL_MAX_ENTRIES:
+            _local.popitem(last=False)
+
+
+def _record(layer: str) -> None:
+    with _local_lock:
+        _local_stats[layer] += 1
+    r = get_redis()
+    if not r:
+        return
+    try:
+        r.hincrby(STATS_KEY, layer, 1)
+    except Exception:
+        pass
+
+
+def get_or_compute(namespace: str, params: dict, compute, ttl: int | None = None):
+    """
+    Return (result, cache_info). `compute(seed)` is called on a miss with the
+    seed derived from the key; its JSON-serializable result is stored in the
+    local LRU and in Valkey (with TTL). Every hit returns a fresh copy.
+    """
+    key, seed = cache_key(namespace, params)
+
+    text = _local_get(key)
+    if text is not None:
+        _record("memory")
+        return json.loads(text), {"hit": True, "layer": "memory"}
+
+    r = get_redis()
+    if r:
+        try:
+            text = r.get(key)
+        except Exception as e:
+            logger.debug("Scenario cache read failed: %s", e)
+            text = None
+        if text is not None:
+            _local_put(key, text)
+            _record("valkey")
+            return json.loads(text), {"hit": True, "layer": "valkey"}
+
+    result = compute(seed)
+    text = json.dumps(result)
+    _local_put(key, text)
+    if r:
+        try:
+            r.setex(key, ttl or DEFAULT_TTL_SECONDS, text)
+        except Exception as e:
+            logger.debug("Scenario cache write failed: %s", e)
+    _record("miss")
+    return json.loads(text), {"hit": False, "layer": None}
+
+
+def stats() -> dict:
+    """Hit/miss counters for this process and, when reachable, the whole cluster."""
+    with _local_lock:
+        local = dict(_local_stats)
+    out = {"process": local, "cluster": None}
+    r = get_redis()
+    if r:
+        try:
+            out["cluster"] = {k: int(v) for k, v in (r.hgetall(STATS_KEY) or {}).items()}
+        except Exception:
+            pass
+    return out
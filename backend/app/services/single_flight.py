@@ -0,0 +1,130 @@
+"""Single-flight coalescing of concurrent identical calls.
+
+run(key, fn) makes sure only one caller per key executes `fn` at a time: in
+this process, duplicates block on the leader's thread and share its return
+value; across workers, the leader holds a Valkey lock (SET NX) and publishes
+its JSON result under a key tied to its lock token, which followers poll for.
+A follower whose leader dies (lock expires without a result) or exceeds
+WAIT_SECONDS runs `fn` itself, so coalescing never blocks a request for good.
+Results must be JSON-serializable; followers get a JSON copy (tuples come
+back as lists). Errors are not published: followers in this process re-raise
+the leader's exception, remote followers run `fn` themselves.
+Without Valkey only the in-process layer applies.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from app.services.valkey import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "sf"
+# Longest upstream call we coalesce (Backboard read timeout is 60s)
+LOCK_TTL_SECONDS = 90
+WAIT_SECONDS = 75.0
+RESULT_TTL_SECONDS = 30
+POLL_SECONDS = 0.1
+
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def flight_key(user_id, task: str, *inputs) -> str:
+    """Key for `task` run by `user_id` on `inputs` (hashed; inputs must be JSON-serializable)."""
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+    return f"{KEY_PREFIX}:{task}:{user_id}:{digest}"
+
+
+def _await_remote(r, key: str, token: str):
+    """Poll for the leader's published result. Returns (found, result)."""
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + WAIT_SECONDS
+    while time.monotonic() < deadline:
+        text = r.get(f"{key}:result:{token}")
+        if text is not None:
+            return True, json.loads(text)
+        if r.get(lock_key) != token:
+            # Leader finished without publishing (failed) or its lock expired;
+            # check once more in case the result landed just before the release
+            text = r.get(f"{key}:result:{token}")
+            return (True, json.loads(text)) if text is not None else (False, None)
+        time.sleep(POLL_SECONDS)
+    return False, None
+
+
+def _run_shared(key: str, fn):
+    r = get_redis()
+    if not r:
+        return fn()
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    try:
+        acquired = r.set(lock_key, token, nx=True, ex=LOCK_TTL_SECONDS)
+        leader_token = None if acquired else r.get(lock_key)
+    except Exception as e:
+        logger.debug("Single-flight lock unavailable: %s", e)
+        return fn()
+
+    if not acquired:
+        if leader_token:
+            try:
+                found, result = _await_remote(r, key, leader_token)
+            except Exception as e:
+                logger.debug("Single-flight wait failed: %s", e)
+                found, result = False, None
+            if found:
+                return result
+        # No leader result to share; do the work ourselves (uncoordinated)
+        return fn()
+
+    try:
+        result = fn()
+        try:
+            r.setex(f"{key}:result:{token}", RESULT_TTL_SECONDS, json.dumps(result))
+        except Exception as e:
+            logger.debug("Single-flight publish failed: %s", e)
+        return result
+    finally:
+        try:
+            r.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception:
+            pass
+
+
+def run(key: str, fn):
+    """Call `fn()` once for all concurrent callers of `key` and return its result to each."""
+    with _calls_lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        # Same JSON shape a remote follower gets, and no shared mutable state
+        return json.loads(json.dumps(call.result))
+    try:
+        call.result = _run_shared(key, fn)
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(key, None)
+        call.done.set()
@@ -35,4 +35,4 @@ fi
 # Start Gunicorn (replace shell so it gets PID 1)
 # Use /tmp for pid to avoid control server error when /app is a mounted volume
 echo "Starting Gunicorn..."
-exec gunicorn -b 0.0.0.0:5000 -w 2 -t 300 --pid /tmp/gunicorn.pid --worker-tmp-dir /tmp --control-socket /tmp/gunicorn.ctl run:app
+exec gunicorn -c gunicorn.conf.py -b 0.0.0.0:5000 -w 2 -t 300 --pid /tmp/gunicorn.pid --worker-tmp-dir /tmp --control-socket /tmp/gunicorn.ctl run:app
@@ -0,0 +1,8 @@
+"""Gunicorn hooks for the backend (flags are in entrypoint.sh)."""
+
+
+def post_worker_init(worker):
+    """Warm caches and clients in each worker once it has loaded the app."""
+    from app import warm_up
+
+    warm_up()
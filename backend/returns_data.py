@@ -0,0 +1,68 @@
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from app.services.historical_returns import (
+    RETURNS_PATH,
+    ReturnsDatasetError,
+    load_returns,
+    sidecar_path,
+    write_dataset,
+)
+
+
+def read_csv(path: str, percent: bool = False):
+    """Read a CSV of monthly returns: first column a date label, one column per series."""
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    if len(rows) < 2:
+        raise ReturnsDatasetError("CSV needs a header row and at least one data row")
+    header, body = rows[0], [r for r in rows[1:] if r and any(c.strip() for c in r)]
+    series = [h.strip() for h in header[1:]]
+    try:
+        data = np.array([[float(c) for c in r[1:]] for r in body], dtype=np.float64)
+    except ValueError as e:
+        raise ReturnsDatasetError(f"Non-numeric return value: {e}") from e
+    if percent:
+        data /= 100.0
+    start = body[0][0].strip() if body else None
+    return data, series, start
+
+
+def build(args) -> int:
+    data, series, start = read_csv(args.csv, percent=args.percent)
+    write_dataset(args.out, data, series, start=start)
+    print(f"Wrote {args.out} ({data.shape[0]} months x {data.shape[1]} series) and {sidecar_path(args.out)}")
+    return info(args.out)
+
+
+def info(path: str) -> int:
+    dataset = load_returns(path)
+    print(f"{dataset.path}: {dataset.months} months from {dataset.start or '?'}, version {dataset.version}")
+    for i, name in enumerate(dataset.series):
+        mean, std = dataset.means[i], dataset.stds[i]
+        print(
+            f"  {name}: mean {mean:.4%}/mo ({(1 + mean) ** 12 - 1:.2%}/yr), "
+            f"vol {std:.4%}/mo ({std * 12 ** 0.5:.2%}/yr)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or validate the What-If historical returns dataset")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="Convert a CSV of monthly returns into the memory-mapped dataset")
+    p_build.add_argument("csv", help="CSV with a date column followed by one column of monthly returns per series")
+    p_build.add_argument("--out", default=RETURNS_PATH, help=f"Output .npy path (default {RETURNS_PATH})")
+    p_build.add_argument("--percent", action="store_true", help="Values are percentages (1.5 = 1.5%%)")
+    p_validate = sub.add_parser("validate", help="Check an existing dataset and print per-series stats")
+    p_validate.add_argument("path", nargs="?", default=RETURNS_PATH)
+    args = parser.parse_args()
+
+    try:
+        sys.exit(build(args) if args.command == "build" else info(args.path))
+    except ReturnsDatasetError as e:
+        print(f"Invalid dataset: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -1,6 +1,11 @@
-from app import create_app
+import os
+
+from app import create_app, warm_up
 
 app = create_app()
 
 if __name__ == "__main__":
+    # With the reloader, only the child process serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up()
     app.run(host="0.0.0.0", port=5000, debug=True)
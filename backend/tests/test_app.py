@@ -0,0 +1,18 @@
+"""App factory: background warm-up belongs to the serving process only."""
+from app import create_app, warm_up
+from app.services import allocation_frontier, llm_gateway
+from config import Config
+
+
+class _TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+
+
+def test_create_app_does_not_warm(monkeypatch):
+    calls = []
+    monkeypatch.setattr(allocation_frontier, "warm", lambda: calls.append("frontier"))
+    monkeypatch.setattr(llm_gateway, "warm", lambda: calls.append("gemini"))
+    create_app(_TestConfig)
+    assert calls == []
+    warm_up()
+    assert calls == ["frontier", "gemini"]
@@ -0,0 +1,63 @@
+"""Cluster-wide assistant registry against an in-memory Valkey stand-in."""
+import pytest
+
+from app.services import assistant_registry
+from app.services.circuit_breaker import _LocalStore
+
+
+class _Valkey(_LocalStore):
+    def eval(self, script, numkeys, key, token):
+        if self.get(key) == token:
+            self.delete(key)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    store = _Valkey()
+    created = []
+
+    def create(api_key, name, system_prompt):
+        created.append(name)
+        return f"asst-{len(created)}"
+
+    monkeypatch.delenv("BACKBOARD_ASSISTANT_ID", raising=False)
+    monkeypatch.setattr(assistant_registry, "_local", {})
+    monkeypatch.setattr(assistant_registry, "get_redis", lambda: store)
+    monkeypatch.setattr(assistant_registry, "_create", create)
+    return store, created
+
+
+def test_abandoned_lock_is_taken_over_and_registered(registry, monkeypatch):
+    store, created = registry
+    monkeypatch.setattr(assistant_registry, "LOCK_WAIT_SECONDS", 5.0)
+    key = assistant_registry.registry_key("k", "coach", "prompt")
+    # A worker that died mid-create left its lock behind
+    store.set(f"{key}:lock", "dead-worker", nx=True, ex=1)
+    assert assistant_registry.resolve_assistant("k", "coach", "prompt") == "asst-1"
+    assert store.get(key) == "asst-1"
+    assert created == ["coach"]
+
+
+def test_waiter_timeout_adopts_registered_id(registry, monkeypatch):
+    store, created = registry
+    monkeypatch.setattr(assistant_registry, "LOCK_WAIT_SECONDS", 0.2)
+    key = assistant_registry.registry_key("k", "coach", "prompt")
+    store.set(f"{key}:lock", "slow-worker", nx=True, ex=30)
+    real_create = assistant_registry._create
+
+    def slow_create(*args):
+        # The lock holder registers its id while this waiter creates a spare
+        store.set(key, "asst-holder")
+        return real_create(*args)
+
+    monkeypatch.setattr(assistant_registry, "_create", slow_create)
+    assert assistant_registry.resolve_assistant("k", "coach", "prompt") == "asst-holder"
+    assert store.get(key) == "asst-holder"
+
+
+def test_registered_id_is_reused(registry):
+    store, created = registry
+    first = assistant_registry.resolve_assistant("k", "coach", "prompt")
+    assistant_registry._local.clear()
+    assert assistant_registry.resolve_assistant("k", "coach", "prompt") == first
+    assert created == ["coach"]
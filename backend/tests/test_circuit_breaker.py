@@ -0,0 +1,115 @@
+"""Breaker transitions on the per-process store, and ElevenLabs streaming records."""
+import time
+
+import pytest
+
+from app.services import circuit_breaker, eleven_service
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    store = circuit_breaker._LocalStore()
+    monkeypatch.setattr(circuit_breaker, "get_redis", lambda: None)
+    monkeypatch.setattr(circuit_breaker, "_local", store)
+    monkeypatch.setattr(circuit_breaker, "MIN_CALLS", 4)
+    return store
+
+
+def _expire_open(store, provider):
+    """Jump past OPEN_SECONDS."""
+    store.set(f"cb:{provider}:open_until", time.time() - 1)
+
+
+def test_errors_open_then_probe_closes(breaker):
+    for _ in range(3):
+        circuit_breaker.record("groq", False, 0.1)
+    assert circuit_breaker.state("groq") == "closed"
+    circuit_breaker.record("groq", False, 0.1)
+    assert circuit_breaker.state("groq") == "open"
+    assert circuit_breaker.is_open("groq")
+    assert not circuit_breaker.allow("groq")
+    with pytest.raises(circuit_breaker.CircuitOpen):
+        circuit_breaker.guard("groq")
+
+    _expire_open(breaker, "groq")
+    assert circuit_breaker.state("groq") == "half_open"
+    assert not circuit_breaker.is_open("groq")
+    # Exactly one probe goes out
+    assert circuit_breaker.allow("groq")
+    assert not circuit_breaker.allow("groq")
+    circuit_breaker.record("groq", True, 0.1)
+    assert circuit_breaker.state("groq") == "closed"
+    assert circuit_breaker.snapshot()["providers"]["groq"]["window"]["calls"] == 0
+
+
+def test_failed_or_slow_probe_reopens(breaker):
+    for ok, latency in ((False, 0.1), (True, 60.0)):
+        for _ in range(4):
+            circuit_breaker.record("gemini", False, 0.1)
+        _expire_open(breaker, "gemini")
+        assert circuit_breaker.allow("gemini")
+        circuit_breaker.record("gemini", ok, latency)
+        assert circuit_breaker.state("gemini") == "open"
+        circuit_breaker.reset("gemini")
+        assert circuit_breaker.state("gemini") == "closed"
+
+
+def test_slow_calls_open(breaker):
+    for _ in range(4):
+        circuit_breaker.record("groq", True, circuit_breaker.SLOW_CALL_SECONDS["groq"] + 1)
+    assert circuit_breaker.state("groq") == "open"
+
+
+class _Speech:
+    def __init__(self, chunks, pause=0.0, error=None):
+        self.chunks, self.pause, self.error = chunks, pause, error
+        self.calls = 0
+
+    def convert(self, **kwargs):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                time.sleep(self.pause)
+            yield chunk
+
+
+@pytest.fixture
+def tts(monkeypatch):
+    records = []
+    monkeypatch.setattr(eleven_service.circuit_breaker, "guard", lambda provider: None)
+    monkeypatch.setattr(eleven_service.circuit_breaker, "record", lambda *args: records.append(args))
+    monkeypatch.setattr(eleven_service, "RETRY_DELAY", 0)
+
+    def install(speech):
+        client = type("Client", (), {"text_to_speech": speech})()
+        monkeypatch.setattr(eleven_service, "_get_client", lambda: client)
+        return records
+
+    return install
+
+
+def test_stream_records_time_to_first_chunk(tts):
+    records = tts(_Speech([b"a", b"b", b"c"], pause=0.2))
+    assert b"".join(eleven_service.stream_speech("hello")) == b"abc"
+    assert len(records) == 1
+    provider, ok, latency = records[0]
+    assert ok and latency < 0.2
+
+
+def test_closed_stream_still_records(tts):
+    records = tts(_Speech([b"a", b"b"]))
+    stream = eleven_service.stream_speech("hello")
+    assert next(stream) == b"a"
+    stream.close()
+    assert [ok for _, ok, _ in records] == [True]
+
+
+def test_failed_stream_records_once(tts):
+    speech = _Speech([], error=RuntimeError("connection reset"))
+    records = tts(speech)
+    with pytest.raises(RuntimeError):
+        list(eleven_service.stream_speech("hello"))
+    assert speech.calls == eleven_service.MAX_RETRIES
+    assert [ok for _, ok, _ in records] == [False]
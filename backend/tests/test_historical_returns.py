@@ -0,0 +1,29 @@
+"""Rebuilding the returns dataset under a running reader."""
+import os
+
+import numpy as np
+
+from app.services.historical_returns import load_returns, sidecar_path, write_dataset
+
+
+def _data(value, months=36):
+    rng = np.random.default_rng(int(value * 1000))
+    return value + 0.01 * rng.standard_normal((months, 2))
+
+
+def test_rebuild_leaves_open_memmap_intact(tmp_path):
+    path = str(tmp_path / "returns.npy")
+    write_dataset(path, _data(0.01), ["stocks", "bonds"])
+    old = load_returns(path)
+    before = np.array(old.data)
+
+    write_dataset(path, _data(0.02, months=48), ["stocks", "bonds"], start="2000-01")
+    # The live mapping still sees the complete old file
+    np.testing.assert_array_equal(np.array(old.data), before)
+    load_returns.cache_clear()
+    new = load_returns(path)
+    assert new.months == 48
+    assert new.start == "2000-01"
+    assert new.version != old.version
+    assert sorted(os.listdir(tmp_path)) == ["returns.json", "returns.npy"]
+    assert os.stat(sidecar_path(path)).st_mode & 0o777 == 0o644
@@ -0,0 +1,118 @@
+"""Retry policy of the shared LLM gateway."""
+import asyncio
+import io
+import time
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from app.services import circuit_breaker, llm_gateway
+
+
+class _Session:
+    """Replays `outcomes` (status codes or exceptions), counting calls."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        r = requests.Response()
+        r.status_code = outcome
+        r.raw = io.BytesIO(b"")
+        return r
+
+
+@pytest.fixture
+def fake_session(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "_backoff", lambda attempt: 0)
+    monkeypatch.setattr(circuit_breaker, "guard", lambda provider: None)
+    monkeypatch.setattr(circuit_breaker, "record", lambda *args: None)
+
+    def install(outcomes):
+        s = _Session(outcomes)
+        monkeypatch.setattr(llm_gateway, "session", lambda provider: s)
+        return s
+
+    return install
+
+
+def _refused():
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "refused")))
+
+
+@pytest.mark.parametrize("status", [502, 504])
+def test_post_is_not_retried_after_gateway_error(fake_session, status):
+    s = fake_session([status, 200])
+    assert llm_gateway.request("groq", "POST", "https://x", retries=2).status_code == status
+    assert s.calls == 1
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_post_is_retried_when_not_accepted(fake_session, status):
+    s = fake_session([status, 200])
+    assert llm_gateway.request("groq", "POST", "https://x", retries=2).status_code == 200
+    assert s.calls == 2
+
+
+def test_post_is_not_retried_after_connection_drop(fake_session):
+    s = fake_session([requests.exceptions.ConnectionError("reset by peer"), 200])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        llm_gateway.request("groq", "POST", "https://x", retries=2)
+    assert s.calls == 1
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ConnectTimeout("slow"), _refused()])
+def test_post_is_retried_when_never_sent(fake_session, error):
+    s = fake_session([error, 200])
+    assert llm_gateway.request("groq", "POST", "https://x", retries=2).status_code == 200
+    assert s.calls == 2
+
+
+def test_get_retries_gateway_errors_and_drops(fake_session):
+    s = fake_session([502, requests.exceptions.ConnectionError("reset by peer"), 200])
+    assert llm_gateway.request("groq", "GET", "https://x", retries=2).status_code == 200
+    assert s.calls == 3
+
+
+class _Alive:
+    def is_alive(self):
+        return True
+
+
+@pytest.mark.parametrize("outcome, reused", [(200, True), (500, False), (requests.exceptions.ReadTimeout("slow"), False)])
+def test_failed_completion_discards_its_thread(monkeypatch, outcome, reused):
+    from app.services import backboard_threads
+
+    monkeypatch.setattr(backboard_threads, "_pools", {})
+    monkeypatch.setattr(backboard_threads, "_refresher", _Alive())
+    monkeypatch.setattr(backboard_threads, "MAX_USES", 5)
+    pool = backboard_threads._pool("k", "coach", "prompt")
+    pool.idle.append(backboard_threads.Lease("thread-1", time.monotonic()))
+
+    def send(api_key, thread_id, content, **fields):
+        if isinstance(outcome, Exception):
+            raise outcome
+        r = requests.Response()
+        r.status_code = outcome
+        r.raw = io.BytesIO(b'{"content": "ok"}')
+        return r
+
+    monkeypatch.setattr(llm_gateway, "backboard_send_message", send)
+    text = llm_gateway.backboard_completion("hi", "k", "coach", "prompt")
+    assert text == ("ok" if reused else None)
+    assert [lease.thread_id for lease in pool.idle] == (["thread-1"] if reused else [])
+
+
+def test_gemini_generate_returns_none_when_client_cannot_be_built(monkeypatch):
+    def broken():
+        raise AttributeError("module 'google.genai.types' has no attribute 'HttpRetryOptions'")
+
+    monkeypatch.setattr(llm_gateway, "gemini_client", broken)
+    assert llm_gateway.gemini_generate("hi") is None
+    assert asyncio.run(llm_gateway.gemini_generate_async("hi")) is None
@@ -0,0 +1,60 @@
+"""Queue time from X-Request-Start drives load shedding."""
+import time
+
+import pytest
+from flask import Blueprint, Flask
+
+from app.services import load_shedder
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(load_shedder, "_groups", {})
+    monkeypatch.setattr(load_shedder, "_queue", load_shedder._Group())
+    monkeypatch.setattr(load_shedder, "_in_flight", 0)
+    monkeypatch.setattr(load_shedder, "_level", 0)
+    monkeypatch.setattr(load_shedder, "_evaluated_at", 0.0)
+    app = Flask(__name__)
+    bp = Blueprint("bills", __name__)
+    bp.add_url_rule("/bills", "list", lambda: "ok")
+    app.register_blueprint(bp)
+    load_shedder.init_app(app)
+    return app.test_client()
+
+
+def test_queue_seconds_formats():
+    now = 1_700_000_000.0
+    started = now - 2
+    for header in (f"t={started:.3f}", f"{started:.3f}", f"t={started * 1000:.0f}", f"{started * 1e6:.0f}"):
+        assert load_shedder.queue_seconds(header, now) == pytest.approx(2.0)
+    assert load_shedder.queue_seconds("garbage", now) is None
+    assert load_shedder.queue_seconds(None, now) is None
+
+
+def test_skewed_stamp_is_ignored():
+    now = 1_700_000_000.0
+    assert load_shedder.queue_seconds(f"t={now + 30}", now) is None
+    assert load_shedder.queue_seconds(f"t={now - 3600}", now) is None
+    assert load_shedder.queue_seconds(f"t={now + 0.2}", now) == 0.0
+
+
+def test_backlog_wait_sheds_ai_features(client):
+    assert not load_shedder.should_shed("insights")
+    for _ in range(load_shedder.MIN_SAMPLES):
+        # Handled instantly, but each waited 2s in the backlog
+        stamp = f"t={time.time() - 2:.3f}"
+        assert client.get("/bills", headers={"X-Request-Start": stamp}).status_code == 200
+    load_shedder._evaluated_at = 0.0
+    assert load_shedder.should_shed("insights")
+    snap = load_shedder.snapshot()
+    assert snap["queue"]["p95_ms"] >= 2000
+    assert snap["groups"]["core"]["p95_ms"] >= 2000
+    assert snap["in_flight"] == 0
+
+
+def test_no_header_no_queue_pressure(client):
+    for _ in range(load_shedder.MIN_SAMPLES):
+        client.get("/bills")
+    load_shedder._evaluated_at = 0.0
+    assert not load_shedder.should_shed("insights")
+    assert load_shedder.snapshot()["queue"]["samples"] == 0
@@ -0,0 +1,52 @@
+"""Process-pool execution: same seed, same answer, whatever the pool size."""
+import os
+
+import pytest
+
+from app.services import mc_executor
+from app.services.mc_executor import EXACT_MAX_SIMULATIONS, SimulationBusy, run_job, run_regimes
+
+
+def _crash():
+    os._exit(1)
+
+
+def _add(a, b):
+    return a + b
+
+
+@pytest.fixture
+def pool_size(monkeypatch):
+    def set_size(workers: int):
+        mc_executor.shutdown()
+        monkeypatch.setattr(mc_executor, "POOL_WORKERS", workers)
+
+    yield set_size
+    mc_executor.shutdown()
+
+
+@pytest.mark.parametrize("simulations", [800, EXACT_MAX_SIMULATIONS + 3001])
+def test_results_identical_across_pool_sizes(pool_size, simulations):
+    kwargs = dict(regimes=["balanced", "bear"], simulations=simulations, seed=42, fan=True)
+    results = []
+    for workers in (0, 1, 3):
+        pool_size(workers)
+        results.append(run_regimes(300.0, 50.0, 3, **kwargs))
+    assert results[0] == results[1] == results[2]
+
+
+def test_sampled_mode_identical_inline_and_pooled(pool_size):
+    kwargs = dict(regimes=["bull"], simulations=1000, seed=5, sampling="antithetic")
+    pool_size(0)
+    inline = run_regimes(300.0, 50.0, 2, **kwargs)
+    pool_size(2)
+    assert run_regimes(300.0, 50.0, 2, **kwargs) == inline
+
+
+def test_broken_pool_is_busy_not_inline(pool_size):
+    pool_size(1)
+    with pytest.raises(SimulationBusy):
+        run_job(_crash, timeout=30)
+    # The pool is rebuilt for the next job and every slot was given back
+    assert run_job(_add, 2, 3) == 5
+    assert mc_executor._slots._value == mc_executor.MAX_PENDING_JOBS
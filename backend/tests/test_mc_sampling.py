@@ -0,0 +1,57 @@
+"""Sampling modes: path counts and the control-variate estimator."""
+import warnings
+
+import numpy as np
+import pytest
+
+from app.services.mc_sampling import SAMPLING_MODES, batch_normals, replicate_sizes, simulate_sampled
+
+
+@pytest.mark.parametrize("simulations", [100, 500, 2048, 5001])
+def test_replicate_sizes_sum_to_simulations(simulations):
+    sizes = replicate_sizes(simulations)
+    assert sum(sizes) == simulations
+    assert len(sizes) >= 4
+    assert max(sizes) - min(sizes) <= 1
+    assert max(sizes) <= 512
+
+
+@pytest.mark.parametrize("simulations", [100, 500, 516, 2048, 5000])
+def test_sobol_replicates_are_power_of_two_blocks(simulations):
+    sizes = replicate_sizes(simulations, "sobol")
+    size = sizes[0]
+    assert set(sizes) == {size}
+    assert size & (size - 1) == 0 and size <= 512
+    assert len(sizes) >= 4
+    assert simulations <= sum(sizes) < simulations + size
+
+
+@pytest.mark.parametrize("sampling", SAMPLING_MODES)
+def test_simulations_set_the_path_count(sampling):
+    expected = sum(replicate_sizes(300, sampling))
+    assert expected == (320 if sampling == "sobol" else 300)
+    result = simulate_sampled(500, 100, 5, ["balanced"], 300, sampling, seed=3)["balanced"]
+    assert result["sampling"]["paths"] == expected
+    assert result["assumptions"]["simulations"] == expected
+    assert sum(row["count"] for row in result["distribution"]) == pytest.approx(expected, abs=len(result["distribution"]))
+
+
+def test_sobol_draws_full_blocks_without_warnings():
+    with warnings.catch_warnings():
+        # scipy warns when a Sobol sequence is cut short of a power of two
+        warnings.simplefilter("error")
+        simulate_sampled(500, 100, 5, ["balanced"], 500, "sobol", seed=3, tolerance=0.001, max_simulations=2000)
+    with pytest.raises(ValueError):
+        batch_normals(np.random.SeedSequence(1), 125, 12, "sobol")
+
+
+@pytest.mark.parametrize("regime", ["balanced", "high_vol"])
+def test_control_variate_reduces_p50_spread(regime):
+    def spread(sampling):
+        p50s = [
+            simulate_sampled(500, 100, 10, [regime], 500, sampling, seed=s)[regime]["percentiles"]["p50"]
+            for s in range(40)
+        ]
+        return float(np.std(p50s))
+
+    assert spread("control_variate") < 0.85 * spread("standard")
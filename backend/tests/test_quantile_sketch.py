@@ -0,0 +1,84 @@
+"""Mergeable sketches: merges are exact and order independent."""
+import numpy as np
+
+from app.services.montecarlo import simulate_regimes_chunked
+from app.services.quantile_sketch import FanSketch, QuantileSketch, RunningMean
+
+
+def _values(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    # Mixed signs, zeros and a wide magnitude range
+    return np.concatenate([rng.normal(20_000, 40_000, n), np.zeros(50), rng.lognormal(3, 4, 200)])
+
+
+def _state(sketch: QuantileSketch):
+    return sketch.positive, sketch.negative, sketch.zero, sketch.count, sketch.min, sketch.max
+
+
+def test_quantile_sketch_merge_equals_single_pass():
+    values = _values()
+    whole = QuantileSketch()
+    whole.add(values)
+
+    parts = np.array_split(values, 7)
+    merged = QuantileSketch()
+    for part in parts:
+        piece = QuantileSketch()
+        piece.add(part)
+        merged.merge(piece)
+
+    reversed_merge = QuantileSketch()
+    for part in reversed(parts):
+        piece = QuantileSketch()
+        piece.add(part)
+        reversed_merge.merge(piece)
+
+    assert _state(merged) == _state(whole) == _state(reversed_merge)
+    probs = [0.01, 0.1, 0.5, 0.9, 0.99]
+    assert merged.quantiles(probs) == whole.quantiles(probs)
+    assert merged.histogram(20) == whole.histogram(20)
+
+
+def test_quantile_sketch_relative_accuracy():
+    values = np.random.default_rng(1).lognormal(10, 1, 20_000)
+    sketch = QuantileSketch()
+    sketch.add(values)
+    for p, estimate in zip([0.1, 0.5, 0.9], sketch.quantiles([0.1, 0.5, 0.9])):
+        exact = np.quantile(values, p, method="lower")
+        assert abs(estimate - exact) <= 2 * sketch.relative_accuracy * abs(exact)
+
+
+def test_running_mean_is_bit_identical_across_splits():
+    rng = np.random.default_rng(2)
+    blocks = [rng.normal(size=1000) for _ in range(6)]
+    single = RunningMean()
+    for i, block in enumerate(blocks):
+        single.add(block, i)
+
+    left, right = RunningMean(), RunningMean()
+    for i, block in enumerate(blocks):
+        (left if i % 2 else right).add(block, i)
+    assert right.merge(left).mean == single.mean
+
+
+def test_fan_sketch_merge_equals_single_pass():
+    rng = np.random.default_rng(3)
+    paths = rng.normal(5_000, 8_000, size=(3000, 24))
+    whole = FanSketch(24)
+    whole.add(paths)
+    merged = FanSketch(24)
+    for part in np.array_split(paths, 5)[::-1]:
+        piece = FanSketch(24)
+        piece.add(part)
+        merged.merge(piece)
+    assert np.array_equal(merged.counts, whole.counts)
+    assert np.array_equal(merged.quantiles([0.1, 0.5, 0.9]), whole.quantiles([0.1, 0.5, 0.9]))
+
+
+def test_chunked_run_is_reproducible_and_sized():
+    kwargs = dict(regimes=["balanced", "bear"], simulations=4500, seed=11, block_size=1000, fan=True)
+    a = simulate_regimes_chunked(500.0, 100.0, 5, **kwargs)
+    b = simulate_regimes_chunked(500.0, 100.0, 5, **kwargs)
+    assert a == b
+    assert a["balanced"]["assumptions"]["simulations"] == 4500
+    assert sum(row["count"] for row in a["bear"]["distribution"]) == 4500
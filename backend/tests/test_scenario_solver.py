@@ -0,0 +1,61 @@
+"""Inverse solver statuses and the returned contribution."""
+import pytest
+
+from app.services.montecarlo import draw_normals, regime_params, simulate
+from app.services.scenario_solver import CONTRIBUTION_TOLERANCE, MAX_CONTRIBUTION, SOLVE_FOR, solve_contribution
+
+
+def _p50(monthly_investment, extra_loan_payment, horizon_years=10, seed=7, simulations=500):
+    annual_return, annual_vol = regime_params("balanced")
+    normals = draw_normals(simulations, horizon_years * 12, seed)
+    result = simulate(
+        monthly_investment, extra_loan_payment, horizon_years, simulations, annual_return, annual_vol, normals=normals
+    )
+    return result["percentiles"]["p50"]
+
+
+@pytest.mark.parametrize(
+    "solve_for, horizon_years, monthly_investment, target",
+    [
+        ("monthly_investment", 10, 0.0, 150_000.0),
+        # Extra loan payments only move net worth while the loan is outstanding
+        ("extra_loan_payment", 1, 500.0, 3_000.0),
+    ],
+)
+def test_solved_is_the_smallest_contribution_meeting_target(solve_for, horizon_years, monthly_investment, target):
+    result = solve_contribution(
+        target, horizon_years, solve_for=solve_for, monthly_investment=monthly_investment, simulations=500, seed=7
+    )
+    assert result["status"] == "solved"
+    assert result["achieved"] >= target
+    # The solver's objective is the scenario's own p50 on the same draws
+    assert result["scenario"]["percentiles"]["p50"] == pytest.approx(result["achieved"], rel=1e-9)
+    args = [result["monthly_investment"], result["extra_loan_payment"]]
+    assert _p50(*args, horizon_years=horizon_years) >= target
+    args[SOLVE_FOR.index(solve_for)] -= CONTRIBUTION_TOLERANCE + 0.01
+    assert _p50(*args, horizon_years=horizon_years) < target
+
+
+def test_already_met():
+    result = solve_contribution(-1_000_000, 10, simulations=500, seed=7)
+    assert result["status"] == "already_met"
+    assert result["value"] == 0.0
+    assert result["iterations"] == 0
+
+
+def test_unreachable():
+    result = solve_contribution(1e12, 5, simulations=500, seed=7)
+    assert result["status"] == "unreachable"
+    assert result["value"] == MAX_CONTRIBUTION
+    assert result["achieved"] < 1e12
+
+
+def test_lower_quantile_needs_more():
+    median = solve_contribution(150_000, 10, quantile=0.5, simulations=500, seed=7)
+    cautious = solve_contribution(150_000, 10, quantile=0.1, simulations=500, seed=7)
+    assert cautious["value"] > median["value"]
+
+
+def test_unknown_solve_for():
+    with pytest.raises(ValueError):
+        solve_contribution(1000, 5, solve_for="salary")
@@ -0,0 +1,51 @@
+"""Request validation of the What-If routes: bad input is a 400, never a 500."""
+import pytest
+
+from app import create_app
+from app.routes.whatif import _scenario_inputs
+from config import Config
+
+
+class _TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    TESTING = True
+
+
+@pytest.fixture
+def client():
+    client = create_app(_TestConfig).test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+    return client
+
+
+@pytest.mark.parametrize("seed", [-1, "-5", "abc", 1.5, True, [1]])
+def test_scenario_rejects_bad_seed(client, seed):
+    r = client.post("/api/whatif/scenario", json={"seed": seed})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("seed, expected", [(None, None), (0, 0), (42, 42), ("7", 7), (3.0, 3), (2**70, 2**70)])
+def test_scenario_accepts_non_negative_seed(seed, expected):
+    assert _scenario_inputs({"seed": seed})["seed"] == expected
+
+
+@pytest.mark.parametrize("seed", [-1, "abc", 2.5])
+def test_solve_rejects_bad_seed(client, seed):
+    r = client.post("/api/whatif/solve", json={"target": 100000, "seed": seed})
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("field", ["monthlyInvestment", "extraLoanPayment", "horizonYears", "simulations", "tolerance"])
+@pytest.mark.parametrize("raw", ["1e309", "-1e309", "Infinity", "NaN"])
+def test_scenario_rejects_non_finite_numbers(client, field, raw):
+    body = '{"%s": %s}' % (field, raw)
+    r = client.post("/api/whatif/scenario", data=body, content_type="application/json")
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("field", ["target", "monthlyInvestment", "extraLoanPayment", "probability", "percentile"])
+def test_solve_rejects_non_finite_numbers(client, field):
+    body = '{"target": 100000, "%s": 1e309}' % field
+    r = client.post("/api/whatif/solve", data=body, content_type="application/json")
+    assert r.status_code == 400
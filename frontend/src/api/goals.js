@@ -40,3 +40,10 @@ export async function deleteGoal(id) {
   const res = await fetch(`${API}/api/goals/${id}`, { method: 'DELETE', ...credentials() })
   if (!res.ok) throw new Error('Failed to delete goal')
 }
+
+export async function getGoalForecast(params = {}) {
+  const query = new URLSearchParams(params).toString()
+  const res = await fetch(`${API}/api/goals/forecast${query ? `?${query}` : ''}`, credentials())
+  if (!res.ok) throw new Error('Failed to load goal forecast')
+  return res.json()
+}
@@ -17,3 +17,8 @@ export async function optimizeAllocation(payload) {
   return res.json()
 }
 
+export async function getAllocationFrontier() {
+  const res = await fetch(`${API}/api/optimizer/frontier`, credentials())
+  if (!res.ok) throw new Error('Failed to load allocation frontier')
+  return res.json()
+}
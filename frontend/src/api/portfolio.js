@@ -93,3 +93,44 @@ export async function portfolioChat(messageOrPayload, mode, messages = null) {
   return data
 }
 
+
+/**
+ * Streaming assistant chat over Server-Sent Events. onEvent(name, data) is
+ * called for each "token" ({ text }) as it arrives, an optional "error", and a
+ * final "done" carrying the same { text, action } body as portfolioChat.
+ */
+export async function portfolioChatStream(payload, onEvent) {
+  const res = await fetch(`${API}/api/assistant/chat/stream`, {
+    ...credentials(),
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify(payload),
+  })
+  if (!res.ok || !res.body) {
+    const data = await res.json().catch(() => ({}))
+    throw new Error(data.error || res.statusText || 'Chat failed')
+  }
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, sep)
+      buffer = buffer.slice(sep + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      onEvent(event, data ? JSON.parse(data) : {})
+    }
+  }
+}
@@ -22,3 +22,66 @@ export async function getWhatIfConfig() {
   if (!res.ok) throw new Error('Failed to load scenario config')
   return res.json()
 }
+
+export async function getScenarioGrid(payload) {
+  const res = await fetch(`${API}/api/whatif/grid`, {
+    ...credentials(),
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(payload),
+  })
+  if (!res.ok) throw new Error('Failed to load scenario grid')
+  return res.json()
+}
+
+export async function solveScenario(payload) {
+  const res = await fetch(`${API}/api/whatif/solve`, {
+    ...credentials(),
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(payload),
+  })
+  if (!res.ok) throw new Error('Failed to solve scenario')
+  return res.json()
+}
+
+/**
+ * Staged scenario over Server-Sent Events. onEvent(name, data) is called for
+ * "core", "comparisons", "coach" and "done" as each stage arrives.
+ */
+export async function streamScenarioIntelligence(payload, onEvent) {
+  const res = await fetch(`${API}/api/whatif/scenario/stream`, {
+    ...credentials(),
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify(payload),
+  })
+  if (!res.ok || !res.body) throw new Error('Failed to load scenario intelligence')
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, sep)
+      buffer = buffer.slice(sep + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) data += line.slice(5).trim()
+      }
+      onEvent(event, data ? JSON.parse(data) : {})
+    }
+  }
+}
@@ -193,7 +193,9 @@ export default function Experiences() {
                       ? 'No experiences generated. Add BACKBOARD_API_KEY to the project root .env (Docker) or backend/.env (local), then restart the backend.'
                       : data?.ai_status === 'api_error'
                         ? 'Suggestions temporarily unavailable. Check backend logs for details (e.g. Backboard API error).'
-                        : 'No experiences generated. Add BACKBOARD_API_KEY to the backend .env to enable AI suggestions.'
+                        : data?.ai_status === 'degraded'
+                          ? 'Suggestions are paused while the app is busy. Try again in a minute.'
+                          : 'No experiences generated. Add BACKBOARD_API_KEY to the backend .env to enable AI suggestions.'
                     : 'No experiences in this tier.'}
                 </p>
               ) : (
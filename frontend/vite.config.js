@@ -14,6 +14,12 @@ export default defineConfig({
         target: apiTarget,
         changeOrigin: true,
         secure: false,
+        // Lets the backend's load shedder see how long requests wait for a gunicorn worker
+        configure: (proxy) => {
+          proxy.on('proxyReq', (proxyReq) => {
+            proxyReq.setHeader('X-Request-Start', `t=${(Date.now() / 1000).toFixed(3)}`)
+          })
+        },
       },
     },
   },